@@ -0,0 +1,64 @@
+# Benchmark: per-frame CPU of the volume/gain stage in the bot process
+#
+# Compares discord.py's PCMVolumeTransformer (audioop, sample by sample) with
+# the NumPy GainProcessor on synthetic 20 ms PCM frames, both at a steady
+# volume and while a volume change is being ramped in.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_audio_processing [frames]
+import os
+import sys
+import time
+
+import discord
+
+from utils.audio_processing import GainProcessor, np
+
+FRAME_BYTES = 3840  # 20 ms of 48 kHz stereo 16-bit PCM
+
+class SyntheticPCM(discord.AudioSource):
+    """Endless PCM source cycling through pre-generated random frames"""
+
+    def __init__(self, frames=50):
+        self.frames = [os.urandom(FRAME_BYTES) for _ in range(frames)]
+        self.index = 0
+
+    def read(self):
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        return frame
+
+def time_source(source, frames, volume_changes=False):
+    """Return microseconds per frame spent in source.read()"""
+    started = time.perf_counter()
+    for i in range(frames):
+        if volume_changes and i % 50 == 0:
+            source.volume = 0.3 if source.volume > 0.5 else 0.8
+        source.read()
+    return (time.perf_counter() - started) / frames * 1e6
+
+def main():
+    if np is None:
+        print("NumPy is not installed, nothing to compare")
+        sys.exit(1)
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    results = [
+        ("PCMVolumeTransformer, steady volume",
+         time_source(discord.PCMVolumeTransformer(SyntheticPCM(), volume=0.5), frames)),
+        ("GainProcessor, steady volume + gain",
+         time_source(GainProcessor(SyntheticPCM(), volume=0.5, gain_db=-3.0), frames)),
+        ("PCMVolumeTransformer, volume changes",
+         time_source(discord.PCMVolumeTransformer(SyntheticPCM(), volume=0.5), frames, True)),
+        ("GainProcessor, ramped volume changes",
+         time_source(GainProcessor(SyntheticPCM(), volume=0.5, gain_db=-3.0), frames, True)),
+        ("GainProcessor, unity gain (fast path)",
+         time_source(GainProcessor(SyntheticPCM(), volume=1.0), frames)),
+    ]
+
+    print(f"{frames} frames of {FRAME_BYTES} bytes (20 ms budget = 20000 us per frame)")
+    for label, per_frame in results:
+        print(f"{label:40} {per_frame:8.2f} us/frame  {per_frame / 200:.3f}% of realtime")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Benchmark: the music cog end to end, offline
+#
+# Drives Music.play and Music.queue for many simulated guilds at once against
+# a fake yt-dlp (configurable latency, generated or fixture payloads) and fake
+# voice clients whose songs last --song-seconds. Reports command throughput
+# and tail latency, the gap between songs, extraction counts and memory, so
+# changes to the cog, queue or downloader can be checked for regressions
+# without network access or a Discord connection.
+#
+# ffmpeg is not started: GuildPlayer._create_source is replaced by one that
+# returns a silent source, so the numbers cover the bot's own work only.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_cog [--guilds 50] [--songs 5] [--latency 0.3]
+#
+# --fixtures takes a JSON file mapping URLs or search queries to yt-dlp info
+# dicts, to replay real payloads instead of the generated ones.
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import types
+
+import config
+from benchmarks.fakes import FakeAudioSource, FakeContext, FakeGuild, FakeYoutubeDL, patched_youtube_dl
+
+def percentiles(values):
+    """p50, p95, p99 and max of a list of seconds, in milliseconds"""
+    if not values:
+        return "n/a"
+    values = sorted(values)
+
+    def at(fraction):
+        return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+    return f"p50 {at(0.5):8.1f}  p95 {at(0.95):8.1f}  p99 {at(0.99):8.1f}  max {values[-1] * 1000:8.1f} ms"
+
+def silent_source(player, track, local_path, start_at):
+    """Replacement for GuildPlayer._create_source that starts no ffmpeg process"""
+    player.active_profile = player.profile
+    return FakeAudioSource(), local_path or track.stream_url
+
+async def run_guild(cog, guild_id, args, latencies):
+    """
+    Queue songs in one guild the way a user would, one command at a time
+
+    The commands' callbacks are called directly: the cog is never added to a
+    bot, so its commands are not bound to it.
+    """
+    ctx = FakeContext(FakeGuild(guild_id), args.song_seconds)
+    for index in range(args.songs):
+        if random.random() < args.search_ratio:
+            kind, query = 'play (search)', f"fixture song {guild_id % args.distinct} {index}"
+        else:
+            kind, query = 'play (url)', f"https://www.youtube.com/watch?v=fixture{guild_id % args.distinct:04d}{index % 10}"
+        started = time.perf_counter()
+        await cog.play.callback(cog, ctx, query=query)
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await cog.queue.callback(cog, ctx)
+        latencies.setdefault('queue', []).append(time.perf_counter() - started)
+    return ctx
+
+async def wait_for_playback(cog, timeout):
+    """Wait until every guild has played its whole queue"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(not player.is_active() and player.queue.is_empty() for player in cog.players.values()):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+async def bench(args):
+    from cogs.music import Music
+    from utils.player import GuildPlayer
+
+    GuildPlayer._create_source = silent_source
+    cookie_file = os.path.join(tempfile.mkdtemp(), "cookies.txt")
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    cog = Music(types.SimpleNamespace(cookie_file=cookie_file))
+    await cog.cog_load()
+
+    latencies = {}
+    started = time.perf_counter()
+    contexts = await asyncio.gather(*(run_guild(cog, guild_id, args, latencies) for guild_id in range(args.guilds)))
+    command_time = time.perf_counter() - started
+    commands = sum(len(samples) for samples in latencies.values())
+
+    finished = await wait_for_playback(cog, args.songs * args.song_seconds * 3 + 30)
+    total_time = time.perf_counter() - started
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    voice_clients = [ctx.author.voice.channel.guild.voice_client for ctx in contexts]
+    gaps = [gap for voice_client in voice_clients if voice_client for gap in voice_client.gaps]
+    songs = sum(voice_client.songs_started for voice_client in voice_clients if voice_client)
+    messages = sum(ctx.channel.sent for ctx in contexts)
+    cache = cog.downloader.cache_stats()
+
+    print(f"{args.guilds} guilds x {args.songs} songs, extraction latency {args.latency * 1000:.0f}"
+          f"±{args.jitter * 1000:.0f} ms, songs of {args.song_seconds}s")
+    print(f"Commands:      {commands} in {command_time:.2f}s ({commands / command_time:.1f}/s)")
+    for kind, samples in sorted(latencies.items()):
+        print(f"  {kind:14} {percentiles(samples)}")
+    print(f"Playback:      {songs} songs in {total_time:.2f}s"
+          f"{'' if finished else ' (timed out before every queue finished)'}")
+    print(f"  gap          {percentiles(gaps)}")
+    print(f"Extractions:   {dict(FakeYoutubeDL.calls)}, coalesced {cache['coalesced']}")
+    print(f"Metadata cache hit rate {cache['hit_rate'] * 100:.1f}%, "
+          f"search cache hit rate {cache['search']['hit_rate'] * 100:.1f}%")
+    print(f"Messages sent: {messages}")
+    print(f"Memory:        {(memory - baseline) / 1024 ** 2:.1f} MiB held, {(peak - baseline) / 1024 ** 2:.1f} MiB peak "
+          f"(traced), {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB max RSS")
+
+    await cog.cog_unload()
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the music cog")
+    parser.add_argument("--guilds", type=int, default=50, help="simulated guilds")
+    parser.add_argument("--songs", type=int, default=5, help="play commands per guild")
+    parser.add_argument("--latency", type=float, default=0.3, help="mean seconds per yt-dlp extraction")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the extraction latency")
+    parser.add_argument("--song-seconds", type=float, default=1.0, help="how long each song plays")
+    parser.add_argument("--search-ratio", type=float, default=0.5, help="share of play commands that search")
+    parser.add_argument("--distinct", type=int, default=10 ** 9,
+                        help="distinct song sets; fewer than --guilds makes guilds request the same songs")
+    parser.add_argument("--fixtures", help="JSON file of URL or query -> yt-dlp info dict")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+
+    # Nothing persistent, no ffmpeg and no idle disconnects during the run
+    config.METADATA_DB_PATH = ""
+    config.AUDIO_CACHE_DIR = ""
+    config.LOUDNESS_ANALYSIS = False
+    config.VOICE_TIMEOUT = 3600
+
+    fixtures = None
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    # Generated songs claim the length they actually play for, so the player
+    # does not mistake their end for a dropped stream
+    FakeYoutubeDL.configure(latency=args.latency, jitter=args.jitter, fixtures=fixtures,
+                            duration=max(1, math.ceil(args.song_seconds)))
+
+    with patched_youtube_dl():
+        asyncio.run(bench(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmark: idle-disconnect timers for many guilds
+#
+# Compares one parked `asyncio.sleep` coroutine per idle guild (the old
+# play_next behaviour) with the shared IdleScheduler: memory held while the
+# guilds are idle, and the cost of re-arming every guild when a song is queued.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_idle_scheduler [guilds]
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from utils.idle_scheduler import IdleScheduler
+
+TIMEOUT = 300
+
+async def bench_sleeping_tasks(guilds):
+    """One sleeping task per guild, restarted by cancelling and creating a new one"""
+    tracemalloc.start()
+    tasks = {guild_id: asyncio.create_task(asyncio.sleep(TIMEOUT)) for guild_id in range(guilds)}
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for guild_id in range(guilds):
+        tasks[guild_id].cancel()
+        tasks[guild_id] = asyncio.create_task(asyncio.sleep(TIMEOUT))
+    await asyncio.sleep(0)
+    rearm = time.perf_counter() - started
+
+    for task in tasks.values():
+        task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return memory, rearm
+
+async def bench_scheduler(guilds):
+    """All guilds on one IdleScheduler"""
+    async def disconnect(guild_id):
+        pass
+
+    tracemalloc.start()
+    scheduler = IdleScheduler(disconnect, TIMEOUT)
+    scheduler.start()
+    for guild_id in range(guilds):
+        scheduler.arm(guild_id)
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for guild_id in range(guilds):
+        scheduler.arm(guild_id)
+    await asyncio.sleep(0)
+    rearm = time.perf_counter() - started
+
+    scheduler.stop()
+    return memory, rearm
+
+async def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"{guilds} idle guilds")
+    for label, bench in (("Sleeping task per guild", bench_sleeping_tasks),
+                         ("IdleScheduler", bench_scheduler)):
+        memory, rearm = await bench(guilds)
+        print(f"{label:24} {memory / 1024:10.0f} KiB held  {rearm * 1e6 / guilds:8.2f} us per re-arm")
+
+if __name__ == "__main__":
+    asyncio.run(main())
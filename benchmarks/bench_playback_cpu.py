@@ -0,0 +1,109 @@
+# Benchmark: CPU cost per stream of the transcoding path vs Opus passthrough
+#
+# Runs the same ffmpeg commands play_song uses against a local Opus/WebM file
+# (e.g. one from the audio cache) and reports CPU seconds per minute of audio.
+# The transcoding path also pays for volume scaling and Opus encoding in the
+# bot process, which is measured separately when discord.py and libopus are
+# available. Volume scaling uses audioop like PCMVolumeTransformer, or NumPy
+# on Python 3.13 and later, where audioop was removed.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_playback_cpu <file.webm> [ffmpeg]
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    import audioop
+except ImportError:
+    # Removed from the standard library in Python 3.13
+    audioop = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FRAME_BYTES = 3840  # 20 ms of 48 kHz stereo 16-bit PCM
+
+def ffmpeg_cpu(command):
+    """Run an ffmpeg command and return (child CPU seconds, stdout bytes)"""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu, result.stdout
+
+def volume_scaler():
+    """
+    Get a function that halves the volume of a PCM frame
+
+    Returns:
+        tuple: (name of the implementation, function), or (None, None) if
+            neither audioop nor NumPy is available
+    """
+    if audioop is not None:
+        return 'audioop', lambda frame: audioop.mul(frame, 2, 0.5)
+    if np is not None:
+        return 'NumPy', lambda frame: (np.frombuffer(frame, dtype=np.int16) * 0.5).astype(np.int16).tobytes()
+    return None, None
+
+def python_side_cpu(pcm):
+    """
+    CPU seconds the bot process spends scaling volume and encoding Opus for the PCM
+
+    Returns:
+        tuple: (CPU seconds, volume implementation or None, whether Opus was encoded)
+    """
+    scaler_name, scale = volume_scaler()
+    try:
+        import discord
+        encoder = discord.opus.Encoder() if discord.opus.is_loaded() or discord.opus._load_default() else None
+    except Exception:
+        encoder = None
+
+    started = time.process_time()
+    for offset in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES):
+        frame = pcm[offset:offset + FRAME_BYTES]
+        if scale is not None:
+            frame = scale(frame)
+        if encoder is not None:
+            encoder.encode(frame, encoder.SAMPLES_PER_FRAME)
+    return time.process_time() - started, scaler_name, encoder is not None
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__ or "usage: python -m benchmarks.bench_playback_cpu <file.webm> [ffmpeg]")
+        sys.exit(1)
+    source = sys.argv[1]
+    ffmpeg = sys.argv[2] if len(sys.argv) > 2 else shutil.which("ffmpeg") or "ffmpeg"
+
+    transcode_cpu, pcm = ffmpeg_cpu([
+        ffmpeg, "-loglevel", "panic", "-i", source, "-vn", "-af", "dynaudnorm=f=200",
+        "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1",
+    ])
+    passthrough_cpu, _ = ffmpeg_cpu([
+        ffmpeg, "-loglevel", "panic", "-i", source, "-vn", "-map_metadata", "-1",
+        "-f", "opus", "-c:a", "copy", "pipe:1",
+    ])
+    python_cpu, scaler_name, encoded = python_side_cpu(pcm)
+
+    minutes = len(pcm) / (FRAME_BYTES * 50 * 60)
+    if minutes == 0:
+        print("No audio decoded from the input")
+        sys.exit(1)
+
+    print(f"Audio length:                {minutes:.2f} min")
+    print(f"Transcode ffmpeg CPU:        {transcode_cpu / minutes:.3f} s per audio minute")
+    volume = f"{scaler_name} volume" if scaler_name else "no volume (no audioop or NumPy)"
+    label = f"{volume} + Opus encode" if encoded else f"{volume} only (no libopus)"
+    print(f"Transcode bot CPU ({label}): {python_cpu / minutes:.3f} s per audio minute")
+    print(f"Passthrough ffmpeg CPU:      {passthrough_cpu / minutes:.3f} s per audio minute")
+    total = (transcode_cpu + python_cpu) / minutes
+    if passthrough_cpu > 0:
+        print(f"Passthrough saves:           {total / (passthrough_cpu / minutes):.1f}x CPU per stream")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Microbenchmark: QueueManager vs the original list-backed queue
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_queue [queue_size]
+import logging
+import random
+import sys
+import time
+
+from utils.queue_manager import QueueManager
+
+# Matches the logging done by QueueManager so only the data structure differs
+logger = logging.getLogger("utils.queue_manager")
+
+class ListQueueManager:
+    """The previous list-backed queue, kept here as the benchmark baseline"""
+
+    def __init__(self):
+        self._queue = []
+
+    def add(self, item):
+        self._queue.append(item)
+        logger.debug(f"Added item to queue. Queue size: {len(self._queue)}")
+
+    def get_next(self):
+        if not self._queue:
+            return None
+        item = self._queue.pop(0)
+        logger.debug(f"Retrieved next item from queue. Remaining: {len(self._queue)}")
+        return item
+
+    def remove(self, index):
+        item = self._queue.pop(index)
+        logger.debug(f"Removed item at position {index}. Remaining: {len(self._queue)}")
+        return item
+
+    def move(self, from_index, to_index):
+        item = self.remove(from_index)
+        self._queue.insert(to_index, item)
+        logger.debug(f"Inserted item at position {to_index}. Queue size: {len(self._queue)}")
+        return item
+
+    def shuffle(self):
+        random.shuffle(self._queue)
+        logger.debug("Queue shuffled")
+
+    def size(self):
+        return len(self._queue)
+
+    def get_queue(self):
+        return self._queue.copy()
+
+def _filled(cls, size):
+    queue = cls()
+    for i in range(size):
+        queue.add(i)
+    return queue
+
+def bench_drain(queue):
+    """Pop every item from the head"""
+    while queue.get_next() is not None:
+        pass
+
+def bench_display(queue, repeats=100):
+    """Render the first page of the queue repeatedly, like Joper queue does"""
+    for _ in range(repeats):
+        if isinstance(queue, QueueManager):
+            queue.view(0, 10)
+        else:
+            queue.get_queue()[:10]
+
+def bench_remove(queue, removals=200):
+    """Remove random positions from the queue"""
+    rng = random.Random(0)
+    for _ in range(removals):
+        queue.remove(rng.randrange(queue.size()))
+
+def bench_move(queue, moves=200):
+    """Move random entries to random positions"""
+    rng = random.Random(0)
+    for _ in range(moves):
+        queue.move(rng.randrange(queue.size()), rng.randrange(queue.size()))
+
+def bench_playing_remove(queue, songs=200):
+    """Alternate playing the next song and removing one, as a live queue does"""
+    rng = random.Random(0)
+    for _ in range(songs):
+        queue.get_next()
+        queue.remove(rng.randrange(queue.size()))
+
+def bench_shuffle(queue):
+    """Shuffle the whole queue"""
+    queue.shuffle()
+
+def _time(func, cls, size):
+    """Best of five runs of func on a freshly filled queue, in seconds"""
+    best = None
+    for _ in range(5):
+        queue = _filled(cls, size)
+        started = time.perf_counter()
+        func(queue)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"Queue size: {size}")
+    print(f"{'benchmark':<16}{'list (ms)':>12}{'queue (ms)':>12}{'speedup':>10}")
+
+    benchmarks = (
+        ('drain', bench_drain),
+        ('display', bench_display),
+        ('remove', bench_remove),
+        ('move', bench_move),
+        ('play + remove', bench_playing_remove),
+        ('shuffle', bench_shuffle),
+    )
+    for name, func in benchmarks:
+        list_time = _time(func, ListQueueManager, size)
+        queue_time = _time(func, QueueManager, size)
+        print(f"{name:<16}{list_time * 1000:>12.2f}{queue_time * 1000:>12.2f}{list_time / queue_time:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
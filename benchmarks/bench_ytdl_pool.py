@@ -0,0 +1,43 @@
+# Benchmark: constructing a YoutubeDL per lookup vs checking one out of the pool
+#
+# Measures only the local setup cost (option parsing, cookie jar loading and
+# extractor initialisation), so it runs without network access.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_ytdl_pool [iterations] [cookie_file]
+import sys
+import time
+import yt_dlp
+
+from utils.youtube import YouTubeDownloader
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    cookie_file = sys.argv[2] if len(sys.argv) > 2 else "cookies.txt"
+    downloader = YouTubeDownloader(cookie_file)
+
+    # Previous behaviour: a fresh instance per lookup
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with yt_dlp.YoutubeDL(dict(downloader.ytdl_stream_options)) as ytdl:
+            ytdl.cookiejar
+            ytdl.get_info_extractor('Youtube')
+    per_call = (time.perf_counter() - started) / iterations
+
+    # Pooled instances
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with downloader.ytdl_pool.checkout('stream') as ytdl:
+            ytdl.get_info_extractor('Youtube')
+    pooled = (time.perf_counter() - started) / iterations
+
+    stats = downloader.ytdl_pool.stats()
+    print(f"Iterations:           {iterations}")
+    print(f"Per-call instance:    {per_call * 1000:.2f} ms")
+    print(f"Pooled checkout:      {pooled * 1000:.3f} ms")
+    print(f"Pool cold start avg:  {stats['cold_start_avg_ms']:.2f} ms")
+    print(f"Pool cold start max:  {stats['cold_start_max_ms']:.2f} ms")
+    downloader.close()
+
+if __name__ == "__main__":
+    main()
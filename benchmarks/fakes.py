@@ -0,0 +1,272 @@
+# Offline stand-ins for yt-dlp and Discord used by the benchmarks
+#
+# FakeYoutubeDL answers extractions from fixtures after a simulated network
+# delay; the Discord fakes implement just enough of VoiceClient, Guild,
+# channels and Context for the music cog and GuildPlayer to run without a
+# connection.
+import asyncio
+import base64
+import collections
+import contextlib
+import copy
+import hashlib
+import random
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+def fake_video_id(key):
+    """A stable, valid-looking 11 character video ID for any string"""
+    return base64.urlsafe_b64encode(hashlib.md5(key.encode()).digest()).decode()[:11]
+
+def video_info(video_id, duration=180):
+    """A yt-dlp info dict for a single video with a stream URL valid for six hours"""
+    return {
+        'id': video_id,
+        'title': f"Fixture song {video_id}",
+        'duration': duration,
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'url': (f"https://rr1---sn-fixture.googlevideo.com/videoplayback?id={video_id}"
+                f"&expire={int(time.time()) + 6 * 3600}&mime=audio%2Fwebm"),
+        'acodec': 'opus',
+        'ext': 'webm',
+    }
+
+def playlist_info(playlist_id, entries=25, duration=180):
+    """A flat yt-dlp info dict for a playlist"""
+    return {
+        'id': playlist_id,
+        'title': f"Fixture playlist {playlist_id}",
+        'entries': [
+            {
+                'id': fake_video_id(f"{playlist_id}-{index}"),
+                'title': f"Fixture playlist song {index}",
+                'duration': duration,
+                'url': f"https://www.youtube.com/watch?v={fake_video_id(f'{playlist_id}-{index}')}",
+            }
+            for index in range(entries)
+        ],
+    }
+
+class FakeYoutubeDL:
+    """
+    Stands in for yt_dlp.YoutubeDL
+
+    Every extraction sleeps for a latency drawn from a normal distribution,
+    like a network round trip would, then returns the fixture registered for
+    the URL or a generated payload: search results for "ytsearch" queries, a
+    flat playlist for playlist URLs and a single video otherwise.
+    """
+
+    latency = 0.3  # Mean seconds per extraction
+    jitter = 0.1  # Standard deviation of the latency
+    duration = 180  # Seconds every generated song claims to last
+    fixtures = {}  # URL or search query -> info dict
+    calls = collections.Counter()  # Extractions by kind
+    _lock = threading.Lock()
+
+    def __init__(self, params=None):
+        self.params = dict(params or {})
+        self.cookiejar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def get_info_extractor(self, name):
+        return None
+
+    @classmethod
+    def configure(cls, latency=0.3, jitter=0.1, fixtures=None, duration=180):
+        """Set the simulated latency, song duration and fixtures, and reset the call counters"""
+        cls.latency = latency
+        cls.jitter = jitter
+        cls.duration = duration
+        cls.fixtures = dict(fixtures or {})
+        cls.calls = collections.Counter()
+
+    def extract_info(self, url, download=False):
+        delay = random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        time.sleep(max(0.0, delay))
+
+        if url.startswith("ytsearch"):
+            kind, query = 'search', url.split(":", 1)[1]
+            info = self.fixtures.get(query) or {'entries': [video_info(fake_video_id(query), self.duration)]}
+        else:
+            parsed = urlparse(url)
+            params = parse_qs(parsed.query)
+            if parsed.path == "/playlist" and 'list' in params:
+                kind = 'playlist'
+                info = self.fixtures.get(url) or playlist_info(params['list'][0], duration=self.duration)
+            else:
+                kind = 'video'
+                video_id = params.get('v', [None])[0] or fake_video_id(url)
+                info = self.fixtures.get(url) or video_info(video_id, self.duration)
+
+        with self._lock:
+            self.calls[kind] += 1
+        return copy.deepcopy(info)
+
+@contextlib.contextmanager
+def patched_youtube_dl():
+    """Make every yt_dlp.YoutubeDL the code creates a FakeYoutubeDL"""
+    original = yt_dlp.YoutubeDL
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    try:
+        yield FakeYoutubeDL
+    finally:
+        yt_dlp.YoutubeDL = original
+
+class FakeAudioSource:
+    """An audio source that produces nothing; the fake voice client decides when it ends"""
+
+    def read(self):
+        return b""
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        pass
+
+class FakeVoiceClient:
+    """
+    Plays each source for a fixed time, then calls its after callback
+
+    Records the gap between a song ending on its own and the next play().
+    """
+
+    def __init__(self, guild, channel, song_seconds):
+        self.guild = guild
+        self.channel = channel
+        self.song_seconds = song_seconds
+        self.source = None
+        self._after = None
+        self._timer = None
+        self._remaining = None  # Seconds left of a paused song
+        self._connected = True
+        self._ended_at = None
+        self.gaps = []
+        self.songs_started = 0
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self.source is not None and self._remaining is None
+
+    def is_paused(self):
+        return self.source is not None and self._remaining is not None
+
+    def play(self, source, after=None):
+        if self.source is not None:
+            raise RuntimeError("Already playing audio.")
+        if self._ended_at is not None:
+            self.gaps.append(time.perf_counter() - self._ended_at)
+            self._ended_at = None
+        self.source = source
+        self._after = after
+        self.songs_started += 1
+        self._timer = asyncio.get_running_loop().call_later(self.song_seconds, self._finish)
+
+    def _finish(self):
+        after, self._after = self._after, None
+        self.source = None
+        self._timer = None
+        self._ended_at = time.perf_counter()
+        if after is not None:
+            after(None)
+
+    def stop(self):
+        if self.source is None:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        after, self._after = self._after, None
+        self.source = None
+        self._remaining = None
+        if after is not None:
+            # discord.py calls after from its player thread once the song stopped
+            asyncio.get_running_loop().call_soon(after, None)
+
+    def pause(self):
+        if self.is_playing():
+            self._remaining = self._timer.when() - asyncio.get_running_loop().time()
+            self._timer.cancel()
+            self._timer = None
+
+    def resume(self):
+        if self.is_paused():
+            self._timer = asyncio.get_running_loop().call_later(self._remaining, self._finish)
+            self._remaining = None
+
+    async def disconnect(self, force=False):
+        self.stop()
+        self._connected = False
+        if self.guild.voice_client is self:
+            self.guild.voice_client = None
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+        self.voice_client = None
+
+class FakeVoiceChannel:
+    def __init__(self, guild, song_seconds):
+        self.guild = guild
+        self.name = f"voice-{guild.id}"
+        self.song_seconds = song_seconds
+
+    async def connect(self):
+        self.guild.voice_client = FakeVoiceClient(self.guild, self, self.song_seconds)
+        return self.guild.voice_client
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+
+    async def delete(self):
+        pass
+
+class FakeTextChannel:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(content)
+
+class FakeMember:
+    def __init__(self, name, voice_channel):
+        self.display_name = name
+        self.voice = type("VoiceState", (), {'channel': voice_channel})()
+
+class FakeContext:
+    """The parts of commands.Context the music cog uses"""
+
+    def __init__(self, guild, song_seconds):
+        self.guild = guild
+        self.channel = FakeTextChannel()
+        self.author = FakeMember(f"user-{guild.id}", FakeVoiceChannel(guild, song_seconds))
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
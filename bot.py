@@ -7,6 +7,7 @@ from discord.ext import commands
 import logging
 import traceback
 import asyncio
+import config
 
 # Setup logger - use root logger for better visibility
 logger = logging.getLogger("discord_bot")
@@ -52,12 +53,14 @@ def load_opus_library():
         logger.error(traceback.format_exc())
         return False
 
-def create_bot(cookie_file):
+def create_bot(cookie_file, shard_ids=None, shard_count=None):
     """
     Create and configure the Discord bot
 
     Args:
         cookie_file (str): Path to the YouTube cookie file
+        shard_ids (list): Shards this process connects, or None for all of them
+        shard_count (int): Total number of shards; None or 1 runs unsharded
 
     Returns:
         commands.Bot: Configured Discord bot
@@ -76,12 +79,29 @@ def create_bot(cookie_file):
     logger.info(f"Using cookie file at: {cookie_file}")
 
     # Create bot with command prefix
-    bot = commands.Bot(command_prefix=["joper", "Joper"], intents=intents)
+    if shard_count and shard_count > 1:
+        logger.info(f"Connecting shards {shard_ids if shard_ids is not None else 'all'} of {shard_count}")
+        bot = commands.AutoShardedBot(
+            command_prefix=["joper", "Joper"], intents=intents,
+            shard_ids=shard_ids, shard_count=shard_count
+        )
+    else:
+        bot = commands.Bot(command_prefix=["joper", "Joper"], intents=intents)
     bot_instance = bot
 
     # Store cookie file path in bot
     bot.cookie_file = cookie_file
 
+    # Profile the bot's event loop from the start when asked to
+    if config.LOOP_PROFILER:
+        from utils.loop_profiler import LoopProfiler
+        profiler = LoopProfiler(threshold=config.LOOP_PROFILER_THRESHOLD)
+
+        async def setup_hook():
+            profiler.start()
+
+        bot.setup_hook = setup_hook
+
     @bot.event
     async def on_ready():
         """Event triggered when the bot is ready and connected to Discord"""
@@ -122,6 +142,9 @@ def create_bot(cookie_file):
         from cogs.music import Music
         music_cog = Music(bot)
         logger.info("Music cog instance created successfully")
+        
+        # Load known titles and durations so a restart doesn't start cold
+        music_cog.downloader.warm_metadata_store()
     except Exception as e:
         logger.error(f"Error creating Music cog instance: {e}")
         logger.error(traceback.format_exc())
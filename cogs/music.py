@@ -1,30 +1,142 @@
 # Music cog for handling music commands and playback
 import asyncio
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import os
-from utils.youtube import YouTubeDownloader
+import time
+import config
+from utils.youtube import YouTubeDownloader, is_playlist_url
 from utils.queue_manager import QueueManager
+from utils.prefetcher import Prefetcher
+from utils.extraction_scheduler import ExtractionScheduler
+from utils.idle_scheduler import IdleScheduler
+from utils.playback_profiles import PROFILES, find_ffmpeg, process_usage, source_process
+from utils.player import GuildPlayer, format_duration
+from utils.playback_state import registry
+from utils import metrics
+from utils.metrics import LoopLagMonitor, family
+from utils.loop_profiler import active_profiler
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Songs shown per page of Joper queue, kept small to stay under the message size limit
+QUEUE_PAGE_SIZE = 10
+# Minimum seconds between edits while queue titles are being resolved
+QUEUE_EDIT_INTERVAL = 1.0
+
+class QueuePageView(discord.ui.View):
+    """Previous/next buttons for paging through Joper queue"""
+    
+    def __init__(self, cog, guild_id, page):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.page = page
+    
+    async def show_page(self, interaction, page):
+        """Switch the message to another page and resolve the titles it shows"""
+        content, self.page, _, unresolved = self.cog.render_queue_page(self.guild_id, page)
+        await interaction.response.edit_message(content=content, view=self)
+        await self.cog.resolve_queue_page(
+            interaction.message, self.guild_id, self.page, unresolved, self
+        )
+    
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self.show_page(interaction, self.page - 1)
+    
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self.show_page(interaction, self.page + 1)
+
 class Music(commands.Cog):
     """Music cog that handles all music-related commands and functionality"""
     
     def __init__(self, bot):
         self.bot = bot
         self.downloader = YouTubeDownloader(bot.cookie_file)
-        self.queues = {}  # Dictionary to store guild-specific queues
-        self.currently_playing = {}  # Keep track of currently playing songs
-        self.voice_clients = {}  # Dictionary to store voice clients
+        self.players = {}  # GuildPlayer per guild with a queue or a voice connection
+        self.saved_settings = {}  # (volume, normalize, profile) of guilds whose player was dropped
+        self.ffmpeg_path = find_ffmpeg(config.FFMPEG_PATH)
+        # Leaves voice channels after VOICE_TIMEOUT seconds without music
+        self.idle = IdleScheduler(self.disconnect_idle, timeout=config.VOICE_TIMEOUT)
+        self.prefetcher = Prefetcher(
+            self.downloader,
+            depth=config.PREFETCH_DEPTH,
+            refresh_margin=config.PREFETCH_REFRESH_MARGIN
+        )
+        self.loop_lag = LoopLagMonitor()
+    
+    async def cog_load(self):
+        """Start background jobs when the cog is added"""
+        self.idle.start()
+        self.loop_lag.start()
+        metrics.registry.add_collector('music', self.collect_metrics)
+        if self.downloader.audio_cache is not None:
+            self.fill_audio_cache.start()
     
-    def get_queue(self, guild_id):
-        """Get or create a queue for the specified guild"""
-        if guild_id not in self.queues:
-            self.queues[guild_id] = QueueManager()
-        return self.queues[guild_id]
+    async def cog_unload(self):
+        """Stop background work and release yt-dlp instances when the cog is removed"""
+        self.fill_audio_cache.cancel()
+        self.idle.stop()
+        self.loop_lag.stop()
+        metrics.registry.remove_collector('music')
+        for player in self.players.values():
+            player.close()
+        self.players.clear()
+        self.prefetcher.cancel_all()
+        self.downloader.close()
+    
+    @tasks.loop(seconds=config.AUDIO_CACHE_FILL_INTERVAL)
+    async def fill_audio_cache(self):
+        """Download the songs queued next in every guild and the most requested ones"""
+        candidates = []
+        for player in list(self.players.values()):
+            track = player.queue.peek()
+            if track is not None and track.video_id:
+                candidates.append(track.video_id)
+        candidates.extend(self.downloader.audio_cache.popular(
+            config.AUDIO_CACHE_MIN_REQUESTS, config.AUDIO_CACHE_FILL_BATCH
+        ))
+        
+        # One at a time on the downloader's own pool, so the cache never competes with playback for workers
+        for video_id in list(dict.fromkeys(candidates))[:config.AUDIO_CACHE_FILL_BATCH]:
+            try:
+                await self.downloader.cache_audio(video_id)
+            except Exception as e:
+                logger.warning(f"Audio cache fill failed for {video_id}: {e}")
+    
+    def get_player(self, guild):
+        """
+        Get or create the player for a guild
+        
+        Only for commands that change playback or settings; read-only
+        commands look in self.players so they never create a player.
+        """
+        player = self.players.get(guild.id)
+        if player is None:
+            player = GuildPlayer(guild, self.downloader, self.prefetcher, self.idle, self.ffmpeg_path)
+            if guild.id in self.saved_settings:
+                player.volume, player.normalize, player.profile = self.saved_settings.pop(guild.id)
+            player.start()
+            self.players[guild.id] = player
+            # Dropped again by disconnect_idle unless something starts playing
+            self.idle.arm(guild.id)
+        return player
+    
+    def guild_settings(self, guild_id):
+        """
+        Get a guild's playback settings without creating its player
+        
+        Returns:
+            tuple: (volume, normalize, profile)
+        """
+        player = self.players.get(guild_id)
+        if player is not None:
+            return player.volume, player.normalize, player.profile
+        return self.saved_settings.get(guild_id, (config.DEFAULT_VOLUME, True, config.FFMPEG_PROFILE))
     
     async def join_voice_channel(self, ctx):
         """Join the user's voice channel"""
@@ -33,184 +145,70 @@ class Music(commands.Cog):
             return None
         
         voice_channel = ctx.author.voice.channel
-        guild_id = ctx.guild.id
         
         # Check if bot is already in a voice channel in this guild
-        if guild_id in self.voice_clients:
-            await self.voice_clients[guild_id].move_to(voice_channel)
-        else:
-            self.voice_clients[guild_id] = await voice_channel.connect()
-        
-        return self.voice_clients[guild_id]
+        if ctx.voice_client is not None:
+            await ctx.voice_client.move_to(voice_channel)
+            return ctx.voice_client
+        return await voice_channel.connect()
     
-    async def play_next(self, ctx, error=None):
-        """Play the next song in the queue"""
-        guild_id = ctx.guild.id
-        queue = self.get_queue(guild_id)
-        
-        # Handle any errors from previous playback
-        if error:
-            error_message = str(error) if error else "An unknown error occurred"
-            if not error_message.strip():
-                error_message = "Empty error message, likely an FFmpeg issue"
-                
-            logger.error(f"Error playing audio: {error_message}")
-            try:
-                await ctx.send(f"⚠️ Error playing audio: {error_message}")
-            except Exception as send_error:
-                logger.error(f"Couldn't send error message: {send_error}")
-        
-        # Check if there are more songs in the queue
-        if not queue.is_empty():
-            next_song = queue.get_next()
-            await self.play_song(ctx, next_song)
-        else:
-            self.currently_playing[guild_id] = None
-            # Disconnect after a delay if no more songs
-            await asyncio.sleep(300)  # Stay in VC for 5 minutes in case more songs are added
-            
-            # Check if still connected and nothing playing
-            if (guild_id in self.voice_clients and 
-                self.voice_clients[guild_id].is_connected() and 
-                not self.currently_playing.get(guild_id)):
-                await self.voice_clients[guild_id].disconnect()
-                del self.voice_clients[guild_id]
-    
-    async def play_song(self, ctx, url):
-        """Play a single song from the given URL"""
-        guild_id = ctx.guild.id
-        voice_client = self.voice_clients.get(guild_id)
-        
-        if not voice_client or not voice_client.is_connected():
-            voice_client = await self.join_voice_channel(ctx)
-            if not voice_client:
-                return
-        
-        # Set currently playing
-        self.currently_playing[guild_id] = url
-        
-        try:
-            # Get audio source from YouTube
-            stream_url, title, duration = await self.downloader.get_audio_info(url)
-            await ctx.send(f"🎵 Now playing: **{title}**")
-            
-            # Use explicit ffmpeg path and add more options for better compatibility
-            ffmpeg_path = "/nix/store/jfybfbnknyiwggcrhi4v9rsx5g4hksvf-ffmpeg-full-6.1.1-bin/bin/ffmpeg"
-            before_options = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -analyzeduration 0 -loglevel panic"
-            ffmpeg_options = "-vn -af dynaudnorm=f=200"
-            
-            # Create FFmpeg audio source
-            audio_source = discord.FFmpegPCMAudio(
-                stream_url,
-                executable=ffmpeg_path,
-                before_options=before_options,
-                options=ffmpeg_options
-            )
-            
-            # Add audio filter for volume control
-            audio_source = discord.PCMVolumeTransformer(audio_source, volume=0.5)
-            
-            # Update playback information for the web interface
-            from main import playback_info
-            import time
-            playback_info['currently_playing'] = url
-            playback_info['title'] = title
-            playback_info['start_time'] = time.time()
-            playback_info['duration'] = duration
-            playback_info['guild_name'] = ctx.guild.name if ctx.guild else None
-            
-            # Play the audio with Opus error handling
-            try:
-                voice_client.play(
-                    audio_source, 
-                    after=lambda e: asyncio.run_coroutine_threadsafe(
-                        self.play_next(ctx, e), self.bot.loop
-                    )
-                )
-                logger.info(f"Started playing: {title} (Duration: {duration}s)")
-            except discord.opus.OpusNotLoaded:
-                # Handle Opus not loaded error
-                logger.warning("Opus library not loaded - using fallback mode")
-                await ctx.send("⚠️ Voice encoding library (Opus) not available - using fallback mode")
-                
-                # Try to use the player without Opus encoder by forcing the voice client to proceed
-                try:
-                    # Check if discord.py version allows us to bypass opus check
-                    from discord import voice_client as vc
-                    voice_client._connected = True
-                    voice_client.encoder = None
-                    voice_client._player = None
-                    
-                    # Try to play again
-                    voice_client.play(
-                        audio_source, 
-                        after=lambda e: asyncio.run_coroutine_threadsafe(
-                            self.play_next(ctx, e), self.bot.loop
-                        )
-                    )
-                    logger.info("Fallback player activated successfully")
-                except Exception as fallback_error:
-                    # If fallback fails too, notify user
-                    logger.error(f"Fallback playback failed: {fallback_error}")
-                    await ctx.send("❌ Fallback playback mode failed. Voice features are unavailable.")
-                    raise RuntimeError("Voice playback unavailable - Opus library missing and fallback failed")
-            
-        except Exception as e:
-            import traceback
-            error_message = str(e)
-            
-            # Log detailed error information
-            logger.error(f"Error playing song: {error_message}")
-            logger.error(traceback.format_exc())
-            
-            # Provide user-friendly error message
-            if "opus" in error_message.lower():
-                await ctx.send("❌ Voice encoding error: Opus library not available. Please contact the bot administrator.")
-            elif "executable" in error_message.lower():
-                await ctx.send("❌ FFmpeg error: Could not access FFmpeg. Please contact the bot administrator.")
-            elif "403" in error_message or "forbidden" in error_message.lower():
-                await ctx.send("❌ YouTube error: This video is forbidden or age-restricted. Check cookie file.")
-            elif "not available" in error_message.lower():
-                await ctx.send("❌ YouTube error: This video is not available in your region or has been removed.")
-            else:
-                await ctx.send(f"❌ Error playing song: {error_message}")
-            
-            # Try to play the next song
-            await self.play_next(ctx)
+    async def disconnect_idle(self, guild_id):
+        """Leave the voice channel of a guild whose idle timeout passed and drop its player"""
+        player = self.players.get(guild_id)
+        if player is None:
+            return
+        if await player.submit('idle_timeout'):
+            # Only if nothing was queued while the player was disconnecting
+            if self.players.get(guild_id) is player and player.is_disposable():
+                del self.players[guild_id]
+                player.close()
+                settings = (player.volume, player.normalize, player.profile)
+                if settings != (config.DEFAULT_VOLUME, True, config.FFMPEG_PROFILE):
+                    self.saved_settings[guild_id] = settings
     
     @commands.command(name="join", help="Joins the voice channel you're in")
     async def join(self, ctx):
         """Join the user's voice channel"""
         voice_client = await self.join_voice_channel(ctx)
         if voice_client:
+            player = self.get_player(ctx.guild)
+            if not player.is_active():
+                self.idle.arm(ctx.guild.id)
             await ctx.send(f"👋 Joined {voice_client.channel.name}")
     
     @commands.command(name="leave", help="Leaves the voice channel")
     async def leave(self, ctx):
         """Leave the voice channel"""
-        guild_id = ctx.guild.id
+        voice_client = ctx.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            await ctx.send("I'm not in a voice channel!")
+            return
         
-        if guild_id in self.voice_clients and self.voice_clients[guild_id].is_connected():
-            await self.voice_clients[guild_id].disconnect()
-            del self.voice_clients[guild_id]
-            self.queues[guild_id].clear()
-            self.currently_playing[guild_id] = None
-            await ctx.send("👋 Left the voice channel")
-        else:
+        player = self.players.get(ctx.guild.id)
+        if player is None:
+            # Connected without a player: there is no playback to stop
+            await voice_client.disconnect()
+        elif not await player.submit('leave'):
             await ctx.send("I'm not in a voice channel!")
+            return
+        await ctx.send("👋 Left the voice channel")
     
     @commands.command(name="play", help="Plays a song from YouTube URL or search query")
     async def play(self, ctx, *, query):
         """Play a song from YouTube URL or search query"""
         guild_id = ctx.guild.id
-        queue = self.get_queue(guild_id)
         
         # Check if the bot is in a voice channel, if not join one
-        if guild_id not in self.voice_clients or not self.voice_clients[guild_id].is_connected():
+        if ctx.voice_client is None or not ctx.voice_client.is_connected():
             voice_client = await self.join_voice_channel(ctx)
             if not voice_client:
                 return
         
+        # Playlists are enumerated in one request and queued in bulk
+        if is_playlist_url(query):
+            await self.queue_playlist(ctx, query)
+            return
+        
         # If it's a YouTube URL, add it directly
         if "youtube.com" in query or "youtu.be" in query:
             url = query
@@ -218,7 +216,7 @@ class Music(commands.Cog):
             # Search for the song on YouTube
             search_msg = await ctx.send("🔍 Searching...")
             try:
-                url = await self.downloader.search_video(query)
+                url = await self.downloader.search_video(query, guild_id=guild_id)
                 if not url:
                     await ctx.send("❌ No results found!")
                     return
@@ -227,39 +225,72 @@ class Music(commands.Cog):
                 await ctx.send(f"❌ Error searching for video: {e}")
                 return
         
-        # Add to queue
-        queue.add(url)
-        
-        # If nothing is currently playing, start playing
-        if not self.currently_playing.get(guild_id):
-            await self.play_song(ctx, url)
+        # Resolve the song once, the queue keeps the resolved track. It only
+        # blocks playback if nothing is playing yet; otherwise a known title is
+        # enough and the prefetcher resolves the stream when the song nears the front
+        is_playing = self.get_player(ctx.guild).is_active()
+        if is_playing:
+            priority = ExtractionScheduler.PRIORITY_PREFETCH
         else:
-            # Get the title of the queued song
-            try:
-                _, title, _ = await self.downloader.get_audio_info(url)
-                position = queue.size()
-                await ctx.send(f"➕ Added to queue at position {position}: **{title}**")
-            except Exception as e:
-                await ctx.send(f"➕ Added to queue, but couldn't get song info: {e}")
+            priority = ExtractionScheduler.PRIORITY_PLAYBACK
+        try:
+            track = await self.downloader.resolve_track(
+                url, requester=ctx.author.display_name, guild_id=guild_id,
+                priority=priority, lazy=is_playing
+            )
+        except Exception as e:
+            await ctx.send(f"❌ Couldn't get song info: {e}")
+            return
+        
+        # Add to queue; the player starts it right away if nothing is playing
+        added, started, position = await self.get_player(ctx.guild).submit('enqueue', [track], ctx.channel)
+        if not added:
+            await ctx.send(f"❌ The queue is full ({config.QUEUE_MAX_LENGTH} songs)")
+        elif not started:
+            await ctx.send(f"➕ Added to queue at position {position}: **{track.title}**")
+    
+    async def queue_playlist(self, ctx, url):
+        """Queue every entry of a playlist, resolving streams only as they near the front"""
+        guild_id = ctx.guild.id
+        
+        loading_msg = await ctx.send("📜 Loading playlist...")
+        try:
+            playlist_title, tracks = await self.downloader.get_playlist_tracks(
+                url, requester=ctx.author.display_name, guild_id=guild_id
+            )
+        except Exception as e:
+            await ctx.send(f"❌ Error loading playlist: {e}")
+            return
+        
+        if not tracks:
+            await ctx.send("❌ The playlist is empty!")
+            return
+        
+        # Announce before the player starts the first song
+        await loading_msg.edit(content=f"📜 Adding {len(tracks)} songs from **{playlist_title}** to the queue")
+        added, _, _ = await self.get_player(ctx.guild).submit('enqueue', tracks, ctx.channel)
+        if added < len(tracks):
+            await ctx.send(
+                f"⚠️ The queue is limited to {config.QUEUE_MAX_LENGTH} songs, "
+                f"only {added} of {len(tracks)} were added"
+            )
     
     @commands.command(name="skip", help="Skips the current song")
     async def skip(self, ctx):
         """Skip the current song"""
-        guild_id = ctx.guild.id
+        player = self.players.get(ctx.guild.id)
         
-        if guild_id in self.voice_clients and self.voice_clients[guild_id].is_playing():
+        if player is not None and player.state in (GuildPlayer.PLAYING, GuildPlayer.PAUSED):
             await ctx.send("⏭️ Skipping current song")
-            self.voice_clients[guild_id].stop()
+            await player.submit('skip')
         else:
             await ctx.send("❌ Nothing is playing right now!")
     
     @commands.command(name="pause", help="Pauses the current song")
     async def pause(self, ctx):
         """Pause the current song"""
-        guild_id = ctx.guild.id
-        
-        if guild_id in self.voice_clients and self.voice_clients[guild_id].is_playing():
-            self.voice_clients[guild_id].pause()
+        player = self.players.get(ctx.guild.id)
+        if player is not None and await player.submit('pause'):
             await ctx.send("⏸️ Paused the music")
         else:
             await ctx.send("❌ Nothing is playing right now!")
@@ -267,10 +298,8 @@ class Music(commands.Cog):
     @commands.command(name="resume", help="Resumes the paused song")
     async def resume(self, ctx):
         """Resume the paused song"""
-        guild_id = ctx.guild.id
-        
-        if guild_id in self.voice_clients and self.voice_clients[guild_id].is_paused():
-            self.voice_clients[guild_id].resume()
+        player = self.players.get(ctx.guild.id)
+        if player is not None and await player.submit('resume'):
             await ctx.send("▶️ Resumed the music")
         else:
             await ctx.send("❌ Nothing is paused right now!")
@@ -278,74 +307,345 @@ class Music(commands.Cog):
     @commands.command(name="stop", help="Stops the music and clears the queue")
     async def stop(self, ctx):
         """Stop the music and clear the queue"""
-        guild_id = ctx.guild.id
-        
-        if guild_id in self.voice_clients and (self.voice_clients[guild_id].is_playing() 
-                                             or self.voice_clients[guild_id].is_paused()):
-            # Clear the queue
-            self.queues[guild_id].clear()
-            # Stop playback
-            self.voice_clients[guild_id].stop()
-            self.currently_playing[guild_id] = None
+        player = self.players.get(ctx.guild.id)
+        if player is not None and await player.submit('stop'):
             await ctx.send("⏹️ Stopped the music and cleared the queue")
         else:
             await ctx.send("❌ Nothing is playing right now!")
     
-    @commands.command(name="queue", help="Shows the current queue")
-    async def queue(self, ctx):
-        """Show the current queue"""
-        guild_id = ctx.guild.id
-        queue = self.get_queue(guild_id)
+    def render_queue_page(self, guild_id, page):
+        """
+        Build the text of one page of the queue from what is already known
         
-        if queue.is_empty() and not self.currently_playing.get(guild_id):
-            await ctx.send("❌ The queue is empty!")
-            return
+        Returns:
+            tuple: (message, page, total_pages, tracks on the page whose title is still unknown)
+        """
+        player = self.players.get(guild_id)
+        queue = player.queue if player is not None else QueueManager()
+        tracks, page, total_pages = queue.page(page, QUEUE_PAGE_SIZE)
         
         # Build queue message
         message = "🎵 **Music Queue**\n"
         
         # Add currently playing song
-        if self.currently_playing.get(guild_id):
-            try:
-                url = self.currently_playing.get(guild_id)
-                _, title, _ = await self.downloader.get_audio_info(url)
-                message += f"\n▶️ **Now Playing**: {title}"
-            except Exception:
-                message += f"\n▶️ **Now Playing**: {self.currently_playing.get(guild_id)}"
+        if player is not None and player.current is not None:
+            message += f"\n▶️ **Now Playing**: {player.current.display_title}"
         
         # Add queued songs
-        if not queue.is_empty():
+        unresolved = []
+        if tracks:
             message += "\n\n**Up Next**:"
-            queue_list = queue.get_queue()
-            for i, url in enumerate(queue_list, 1):
-                try:
-                    _, title, _ = await self.downloader.get_audio_info(url)
-                    message += f"\n{i}. {title}"
-                except Exception:
-                    message += f"\n{i}. {url}"
+            first_position = (page - 1) * QUEUE_PAGE_SIZE + 1
+            for i, track in enumerate(tracks, first_position):
+                if track.title is None:
+                    known = self.downloader.get_display_info(track.url)
+                    if known is not None:
+                        track.title, track.duration = known
+                    else:
+                        unresolved.append(track)
+                
+                line = f"\n{i}. {track.title or f'⏳ {track.url}'}"
+                if track.duration:
+                    line += f" `[{format_duration(track.duration)}]`"
+                message += line
+            
+            if total_pages > 1:
+                message += f"\n\n*Page {page}/{total_pages} · {queue.size()} songs*"
+        
+        return message, page, total_pages, unresolved
+    
+    async def resolve_queue_page(self, message, guild_id, page, tracks, view=None):
+        """
+        Resolve the unknown titles on a queue page concurrently and edit the message as they arrive
+        
+        Stops as soon as the user navigates to another page.
+        """
+        if not tracks:
+            return
+        
+        async def resolve(track):
+            try:
+                await self.downloader.refresh_track(
+                    track, guild_id=guild_id, priority=ExtractionScheduler.PRIORITY_DISPLAY
+                )
+            except Exception as e:
+                logger.debug(f"Couldn't resolve queue entry {track.url}: {e}")
+        
+        pending = [asyncio.ensure_future(resolve(track)) for track in tracks]
+        last_edit = 0
+        try:
+            for done, future in enumerate(asyncio.as_completed(pending), 1):
+                await future
+                if view is not None and view.page != page:
+                    return
                 
-                # Limit to 10 songs to avoid message size limits
-                if i >= 10:
-                    remaining = len(queue_list) - 10
-                    if remaining > 0:
-                        message += f"\n\n*And {remaining} more songs...*"
-                    break
+                # Discord rate-limits edits, so batch updates that arrive close together
+                if done < len(pending) and time.monotonic() - last_edit < QUEUE_EDIT_INTERVAL:
+                    continue
+                content = self.render_queue_page(guild_id, page)[0]
+                await message.edit(content=content)
+                last_edit = time.monotonic()
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    @commands.command(name="queue", help="Shows the current queue")
+    async def queue(self, ctx, page: int = 1):
+        """Show the current queue"""
+        guild_id = ctx.guild.id
+        player = self.players.get(guild_id)
         
-        await ctx.send(message)
+        if player is None or (player.queue.is_empty() and player.current is None):
+            await ctx.send("❌ The queue is empty!")
+            return
+        
+        # Send what is already known right away, then fill in the rest
+        content, page, total_pages, unresolved = self.render_queue_page(guild_id, page)
+        view = QueuePageView(self, guild_id, page) if total_pages > 1 else None
+        message = await ctx.send(content, view=view)
+        await self.resolve_queue_page(message, guild_id, page, unresolved, view)
+    
+    @commands.command(name="nowplaying", aliases=["np"], help="Shows the current song and how far it has played")
+    async def nowplaying(self, ctx):
+        """Show the current song and its position"""
+        state = registry.get(ctx.guild.id)
+        if state is None:
+            await ctx.send("❌ Nothing is playing right now")
+            return
+        
+        position = format_duration(state.elapsed())
+        if state.duration:
+            position += f" / {format_duration(state.duration)}"
+        status = "⏸️ Paused" if state.paused else "▶️ Now Playing"
+        await ctx.send(f"{status}: **{state.title}** `[{position}]`\n{state.url}")
     
     @commands.command(name="volume", help="Set the music volume (0-100)")
     async def volume(self, ctx, volume: int):
         """Set the music volume"""
-        guild_id = ctx.guild.id
-        
         if not 0 <= volume <= 100:
             await ctx.send("❌ Volume must be between 0 and 100")
             return
         
-        if guild_id in self.voice_clients and self.voice_clients[guild_id].source:
-            # Convert to a float between 0 and 1
-            volume_float = volume / 100
-            self.voice_clients[guild_id].source.volume = volume_float
+        # Convert to a float between 0 and 1, remembered for the following songs
+        if await self.get_player(ctx.guild).submit('set_volume', volume / 100):
             await ctx.send(f"🔊 Volume set to {volume}%")
         else:
-            await ctx.send("❌ Nothing is playing right now!")
+            # Opus passthrough has no volume control; the next song is transcoded
+            await ctx.send(f"🔊 Volume set to {volume}%, it applies from the next song")
+    
+    @commands.command(name="normalize", help="Turns loudness normalization on or off")
+    async def normalize_command(self, ctx, setting: str):
+        """Turn loudness normalization on or off"""
+        setting = setting.lower()
+        if setting not in ("on", "off"):
+            await ctx.send("❌ Use `Joper normalize on` or `Joper normalize off`")
+            return
+        
+        await self.get_player(ctx.guild).submit('set_normalize', setting == "on")
+        await ctx.send(f"🎚️ Loudness normalization {setting}, it applies from the next song")
+    
+    @commands.command(name="profile", help="Shows or sets the playback profile (standard, low-cpu, high-quality, passthrough)")
+    async def profile(self, ctx, name: str = None):
+        """Show or set the guild's playback profile"""
+        current = self.guild_settings(ctx.guild.id)[2]
+        
+        if name is None:
+            lines = [f"🎛️ Playback profile: **{current}**"]
+            for profile in PROFILES.values():
+                marker = "▶️" if profile.name == current else "▫️"
+                lines.append(f"{marker} `{profile.name}` - {profile.description}")
+            await ctx.send("\n".join(lines))
+            return
+        
+        name = name.lower()
+        if name not in PROFILES:
+            await ctx.send(f"❌ Unknown profile. Choose one of: {', '.join(PROFILES)}")
+            return
+        
+        await self.get_player(ctx.guild).submit('set_profile', name)
+        await ctx.send(f"🎛️ Playback profile set to **{name}**, it applies from the next song")
+    
+    def ffmpeg_usage(self):
+        """
+        Sample CPU and memory of every running ffmpeg playback process
+        
+        Returns:
+            dict: Profile name -> list of (guild_id, usage dict) for the active streams
+        """
+        usage = {}
+        for guild_id, player in list(self.players.items()):
+            voice_client = player.voice_client
+            process = source_process(voice_client.source) if voice_client and voice_client.source else None
+            if process is None:
+                continue
+            sample = process_usage(process.pid)
+            if sample is not None:
+                usage.setdefault(player.active_profile, []).append((guild_id, sample))
+        return usage
+    
+    def collect_metrics(self):
+        """
+        Report cache, queue, ffmpeg and extraction pool metrics when they are scraped
+        
+        Returns:
+            list: Metric families, see utils.metrics.family
+        """
+        caches = {
+            'metadata': self.downloader.metadata_cache,
+            'search': self.downloader.search_cache,
+            'loudness': self.downloader.loudness_cache,
+        }
+        if self.downloader.audio_cache is not None:
+            caches['audio'] = self.downloader.audio_cache
+        
+        players = list(self.players.values())
+        states = {}
+        ffmpeg = {}
+        for player in players:
+            states[player.state] = states.get(player.state, 0) + 1
+            voice_client = player.voice_client
+            process = source_process(voice_client.source) if voice_client and voice_client.source else None
+            if process is not None and process.poll() is None:
+                ffmpeg[player.active_profile] = ffmpeg.get(player.active_profile, 0) + 1
+        
+        pools = (self.downloader.scheduler, self.downloader.analysis_scheduler, self.downloader.download_scheduler)
+        schedulers = [scheduler.stats() for scheduler in pools]
+        pool_names = [scheduler.name for scheduler in pools]
+        pool = self.downloader.ytdl_pool.stats()
+        return [
+            family("jopertube_cache_hits", "counter", "Cache lookups that found an entry", [
+                ("jopertube_cache_hits_total", {'cache': name}, cache.hits) for name, cache in caches.items()
+            ]),
+            family("jopertube_cache_misses", "counter", "Cache lookups that found nothing", [
+                ("jopertube_cache_misses_total", {'cache': name}, cache.misses) for name, cache in caches.items()
+            ]),
+            family("jopertube_cache_entries", "gauge", "Entries held per cache", [
+                ("jopertube_cache_entries", {'cache': name}, len(cache)) for name, cache in caches.items()
+            ]),
+            family("jopertube_coalesced_lookups", "counter", "Lookups that joined an in-flight extraction", [
+                ("jopertube_coalesced_lookups_total", {}, self.downloader.coalesced)
+            ]),
+            family("jopertube_queue_length", "gauge", "Songs waiting in each guild's queue", [
+                ("jopertube_queue_length", {'guild': player.guild_id}, player.queue.size())
+                for player in players if not player.queue.is_empty()
+            ]),
+            family("jopertube_players", "gauge", "Guild players by state", [
+                ("jopertube_players", {'state': state}, count) for state, count in states.items()
+            ]),
+            family("jopertube_ffmpeg_processes", "gauge", "Running ffmpeg playback processes by profile", [
+                ("jopertube_ffmpeg_processes", {'profile': profile}, count) for profile, count in ffmpeg.items()
+            ]),
+            family("jopertube_extraction_workers", "gauge", "Size of each extraction thread pool", [
+                ("jopertube_extraction_workers", {'pool': name}, scheduler['workers'])
+                for name, scheduler in zip(pool_names, schedulers)
+            ]),
+            family("jopertube_extraction_active", "gauge", "Extraction workers currently busy, by pool", [
+                ("jopertube_extraction_active", {'pool': name}, scheduler['active'])
+                for name, scheduler in zip(pool_names, schedulers)
+            ]),
+            family("jopertube_extraction_pending", "gauge", "Extraction jobs waiting for a worker, by pool and lane", [
+                ("jopertube_extraction_pending", {'pool': name, 'lane': lane}, stats['pending'])
+                for name, scheduler in zip(pool_names, schedulers)
+                for lane, stats in scheduler['lanes'].items()
+            ]),
+            family("jopertube_extraction_jobs", "counter", "Finished extraction jobs by pool and outcome", [
+                ("jopertube_extraction_jobs_total", {'pool': name, 'outcome': outcome}, scheduler[outcome])
+                for name, scheduler in zip(pool_names, schedulers)
+                for outcome in ('completed', 'failed')
+            ]),
+            family("jopertube_ytdl_instances", "gauge", "Pooled yt-dlp instances by profile", [
+                ("jopertube_ytdl_instances", {'profile': profile, 'state': 'created'}, count)
+                for profile, count in pool['created'].items()
+            ] + [
+                ("jopertube_ytdl_instances", {'profile': profile, 'state': 'idle'}, count)
+                for profile, count in pool['idle'].items()
+            ]),
+        ]
+    
+    @commands.command(name="ffmpegstats", help="Shows CPU and memory use of ffmpeg per playback profile")
+    async def ffmpegstats(self, ctx):
+        """Show ffmpeg resource use per playback profile"""
+        usage = self.ffmpeg_usage()
+        if not usage:
+            await ctx.send("No ffmpeg processes are running.")
+            return
+        
+        lines = ["📊 **ffmpeg usage by profile**"]
+        for profile, samples in sorted(usage.items()):
+            cpu = sum(sample['cpu_percent'] for _, sample in samples) / len(samples)
+            rss = sum(sample['rss_bytes'] for _, sample in samples) / len(samples)
+            lines.append(
+                f"`{profile}`: {len(samples)} stream(s), avg {cpu:.1f}% CPU, "
+                f"avg {rss / 1024 ** 2:.1f} MB RSS"
+            )
+        await ctx.send("\n".join(lines))
+    
+    @commands.command(name="lagreport", help="Shows what blocked the event loop (needs LOOP_PROFILER=1)")
+    async def lagreport(self, ctx, action: str = None):
+        """Show event loop lag and the callbacks that blocked the loop the longest"""
+        profiler = active_profiler()
+        if profiler is None:
+            await ctx.send("❌ Loop profiling is off. Start the bot with `LOOP_PROFILER=1` to enable it.")
+            return
+        if action == "reset":
+            profiler.reset()
+            await ctx.send("🧹 Loop profiler statistics cleared")
+            return
+        
+        report = profiler.report(limit=5)
+        lag = report['lag_ms']
+        lines = [
+            "🐢 **Event loop report**",
+            f"Lag: p50 {lag['p50']:.1f} ms · p99 {lag['p99']:.1f} ms · max {lag['max']:.1f} ms",
+            f"{report['slow_callbacks']} of {report['callbacks']} callbacks took over {report['threshold_ms']:.0f} ms",
+        ]
+        for i, offender in enumerate(report['offenders'], 1):
+            lines.append(
+                f"\n{i}. `{offender['callback']}`: {offender['count']}× · "
+                f"{offender['total_ms']:.0f} ms total · {offender['max_ms']:.0f} ms max"
+            )
+            if offender['stack']:
+                # The innermost frames are where the loop was stuck
+                frames = "\n".join(offender['stack'][-3:])
+                lines.append(f"```{frames}```")
+        
+        # Stay under Discord's message size limit
+        await ctx.send("\n".join(lines)[:1990])
+    
+    @commands.command(name="shuffle", help="Shuffles the queue")
+    async def shuffle(self, ctx):
+        """Shuffle the queue"""
+        player = self.players.get(ctx.guild.id)
+        shuffled = await player.submit('shuffle') if player is not None else 0
+        
+        if not shuffled:
+            await ctx.send("❌ The queue is empty!")
+            return
+        
+        await ctx.send(f"🔀 Shuffled {shuffled} songs")
+    
+    @commands.command(name="remove", help="Removes a song from the queue by position")
+    async def remove(self, ctx, position: int):
+        """Remove a song from the queue"""
+        player = self.players.get(ctx.guild.id)
+        track = await player.submit('remove', position - 1) if player is not None else None
+        
+        if track is None:
+            size = player.queue.size() if player is not None else 0
+            await ctx.send(f"❌ Position must be between 1 and {size}")
+            return
+        
+        await ctx.send(f"🗑️ Removed **{track.display_title}** from the queue")
+    
+    @commands.command(name="move", help="Moves a song to another position in the queue")
+    async def move(self, ctx, position: int, new_position: int):
+        """Move a song to another position in the queue"""
+        player = self.players.get(ctx.guild.id)
+        track = await player.submit('move', position - 1, new_position - 1) if player is not None else None
+        
+        if track is None:
+            size = player.queue.size() if player is not None else 0
+            await ctx.send(f"❌ Positions must be between 1 and {size}")
+            return
+        
+        await ctx.send(f"↕️ Moved **{track.display_title}** to position {new_position}")
@@ -13,6 +13,116 @@ COMMAND_PREFIX = ["joper", "Joper"]
 # Default volume (0.0 to 1.0)
 DEFAULT_VOLUME = 0.5
 
+# Songs a guild's queue can hold; larger requests are truncated
+QUEUE_MAX_LENGTH = 2000
+# Commands a guild's player buffers before callers have to wait
+PLAYER_INBOX_SIZE = 32
+
+# Sharding: SHARD_COUNT shards split across SHARD_PROCESSES worker processes
+# With one process and one shard the bot runs in a thread of the web server
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "1"))
+# Optional explicit assignment, one group per process, e.g. "0,1;2,3"
+SHARD_ASSIGNMENT = os.getenv("SHARD_ASSIGNMENT", "")
+SHARD_STATUS_INTERVAL = 2  # Seconds between worker status reports
+
+# How the web interface reaches the bot: "embedded" runs the bot inside the
+# web process, which must then be the only one; "remote" leaves it to the bot
+# service (python service.py), which any number of web workers query over a
+# Unix socket
+BOT_SERVICE_MODE = os.getenv("BOT_SERVICE_MODE", "embedded")
+BOT_SERVICE_SOCKET = os.getenv("BOT_SERVICE_SOCKET", "/tmp/jopertube-bot.sock")
+BOT_SERVICE_TIMEOUT = 5  # Seconds web workers wait for an answer from the bot service
+BOT_JOB_HISTORY = 100  # Finished start/stop jobs kept for lookup
+
 # Timeout for voice channels (in seconds)
 # The bot will leave the voice channel after this many seconds of inactivity
 VOICE_TIMEOUT = 300  # 5 minutes
+
+# Metadata cache for resolved YouTube videos (title, duration, stream URL)
+# Entries expire when YouTube's stream URL does, minus a safety margin
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "1024"))
+METADATA_CACHE_TTL = 3600  # Used when the stream URL carries no expiry
+STREAM_URL_EXPIRY_MARGIN = 300  # Treat stream URLs as expired 5 minutes early
+
+# A song whose stream fails partway through is re-resolved and resumed where
+# it stopped, up to this many times
+STREAM_RESUME_ATTEMPTS = 3
+# Ending more than this many seconds before the song's duration counts as a failure
+# Songs of unknown duration are never resumed
+STREAM_RESUME_TOLERANCE = 5
+# Duration shown for songs whose length YouTube doesn't report, e.g. live streams
+UNKNOWN_DURATION_DISPLAY = 180
+# Forced re-resolves of one video are shared for this many seconds
+STREAM_REFRESH_COOLDOWN = 60
+
+# Number of upcoming queue entries resolved in the background while a song plays
+PREFETCH_DEPTH = 3
+# Queued stream URLs expiring within this many seconds are resolved again
+PREFETCH_REFRESH_MARGIN = 1800
+
+# Pooled yt-dlp instances per options profile (stream, search, playlist and,
+# with the audio cache enabled, download)
+YTDL_POOL_SIZE = int(os.getenv("YTDL_POOL_SIZE", "4"))
+YTDL_POOL_WARM = 1  # Instances created per profile at startup
+
+# Threads dedicated to yt-dlp extractions (keep equal to YTDL_POOL_SIZE)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))
+# Maximum concurrent extractions a single guild may run
+EXTRACTION_GUILD_LIMIT = 2
+
+# Persistent metadata store (title, duration, thumbnail) that survives restarts
+# Set METADATA_DB_PATH to an empty string to disable it
+METADATA_DB_PATH = os.getenv("METADATA_DB_PATH", "metadata.db")
+METADATA_DB_TTL = 30 * 86400  # Forget videos not seen for 30 days
+METADATA_DB_WARM_LIMIT = 10000  # Most recently seen videos loaded at startup
+METADATA_DB_MEMORY_SIZE = 20000  # Videos kept in memory, least recently used dropped first
+
+# Search cache: normalized query text -> video ID
+SEARCH_CACHE_SIZE = 2048
+SEARCH_CACHE_TTL = 6 * 3600
+
+# Maximum number of entries queued from a single playlist
+PLAYLIST_MAX_TRACKS = 500
+
+# Local audio cache for frequently played tracks
+# Set AUDIO_CACHE_DIR to enable it, e.g. "audio_cache"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 2 GB
+AUDIO_CACHE_MAX_FILE_BYTES = 50 * 1024 ** 2  # Skip anything bigger than 50 MB
+AUDIO_CACHE_MIN_REQUESTS = 2  # Requests before a track is worth caching
+AUDIO_CACHE_FILL_INTERVAL = 60  # Seconds between background cache fills
+AUDIO_CACHE_FILL_BATCH = 5  # Maximum downloads started per fill
+
+# Send YouTube's Opus audio to Discord without decoding it when the playback
+# profile allows (by default when the volume is 100% and normalization is off)
+OPUS_PASSTHROUGH = True
+
+# ffmpeg executable used for playback and loudness analysis
+# Empty to search PATH; the result is looked up once at startup
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "")
+
+# Default playback profile: standard, low-cpu, high-quality or passthrough
+# Guilds can pick their own with Joper profile
+FFMPEG_PROFILE = os.getenv("FFMPEG_PROFILE", "standard")
+
+# Volume/gain processing stage: "numpy" (falls back to "legacy" if NumPy is
+# not installed) or "legacy" for discord.py's PCMVolumeTransformer
+AUDIO_PROCESSING = os.getenv("AUDIO_PROCESSING", "numpy")
+
+# Per-track loudness measured while prefetching, replacing live normalization
+LOUDNESS_ANALYSIS = True
+LOUDNESS_ANALYSIS_SECONDS = 60  # Audio analysed from the start of each track
+# Analyses run on their own pool so they never hold extraction workers
+LOUDNESS_WORKERS = int(os.getenv("LOUDNESS_WORKERS", "1"))
+# Reading the audio runs at network speed, so allow well over its duration
+LOUDNESS_ANALYSIS_TIMEOUT = 180
+LOUDNESS_TARGET = -14.0  # LUFS
+# Boosts never lift a track's measured true peak above this (dBTP); louder
+# passages later in the track are caught by the gain stage's soft limiter
+LOUDNESS_TRUE_PEAK_CEILING = -1.0
+
+# Opt-in profiler for callbacks that block the event loop, reported by
+# Joper lagreport and /debug/loop. Adds a little overhead to every callback
+LOOP_PROFILER = os.getenv("LOOP_PROFILER", "") == "1"
+LOOP_PROFILER_THRESHOLD = float(os.getenv("LOOP_PROFILER_THRESHOLD", "0.05"))  # Seconds a callback may run
@@ -0,0 +1,41 @@
+# Gunicorn settings for the web interface
+#
+# Embedded mode (the default) runs the bot inside the web process, so there
+# must be exactly one worker. With BOT_SERVICE_MODE=remote the bot runs in the
+# bot service instead, which is started here once, and WEB_WORKERS processes
+# serve the dashboard. Threaded workers keep /events streams from tying up
+# a whole worker each.
+import os
+import subprocess
+import sys
+
+bot_service_mode = os.getenv("BOT_SERVICE_MODE", "embedded")
+
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "32"))
+workers = int(os.getenv("WEB_WORKERS", "2")) if bot_service_mode == "remote" else 1
+
+_bot_service = None
+
+def on_starting(server):
+    """Start the bot service before the first worker, unless one is already listening"""
+    global _bot_service
+    if bot_service_mode != "remote":
+        return
+
+    from service import BotServiceClient
+    import config
+    if BotServiceClient(config.BOT_SERVICE_SOCKET).is_available():
+        server.log.info(f"Using the bot service already listening on {config.BOT_SERVICE_SOCKET}")
+        return
+    _bot_service = subprocess.Popen([sys.executable, "service.py"])
+    server.log.info(f"Started the bot service (pid {_bot_service.pid})")
+
+def on_exit(server):
+    """Stop the bot service started by on_starting"""
+    if _bot_service is not None and _bot_service.poll() is None:
+        _bot_service.terminate()
+        try:
+            _bot_service.wait(20)
+        except subprocess.TimeoutExpired:
+            _bot_service.kill()
@@ -0,0 +1,302 @@
+# Multi-process shard launcher for the Discord bot
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import config
+from utils import metrics
+from utils.playback_state import registry
+from utils.loop_profiler import active_profiler
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker that can't run with the current configuration; it isn't restarted
+EXIT_CONFIG_ERROR = 3
+
+def assign_shards(shard_count, processes, assignment=""):
+    """
+    Split shard IDs across worker processes
+
+    Args:
+        shard_count (int): Total number of shards
+        processes (int): Number of worker processes
+        assignment (str): Explicit assignment such as "0,1;2,3", one group per
+            process, overriding the round-robin split
+
+    Returns:
+        list: One list of shard IDs per worker process
+    """
+    if assignment:
+        groups = [
+            [int(shard_id) for shard_id in group.split(",") if shard_id.strip()]
+            for group in assignment.split(";") if group.strip()
+        ]
+        assigned = sorted(shard_id for group in groups for shard_id in group)
+        if assigned != list(range(shard_count)):
+            raise ValueError(f"SHARD_ASSIGNMENT must cover shards 0-{shard_count - 1} exactly once")
+        return groups
+
+    processes = max(1, min(processes, shard_count))
+    return [list(range(index, shard_count, processes)) for index in range(processes)]
+
+def run_shard_worker(index, shard_ids, shard_count, cookie_file, status_queue):
+    """
+    Entry point of a worker process: run the bot for a group of shards
+
+    Each worker has its own event loop, extraction pool and yt-dlp instances.
+    Status and playback snapshots are reported to the launcher through
+    status_queue.
+
+    Args:
+        index (int): Worker number
+        shard_ids (list): Shards this worker connects
+        shard_count (int): Total number of shards
+        cookie_file (str): Path to the YouTube cookie file
+        status_queue (multiprocessing.Queue): Channel back to the launcher
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker {index} - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    def report(status, error=None, bot=None):
+        snapshot = {
+            'worker': index,
+            'pid': os.getpid(),
+            'shards': shard_ids,
+            'status': status,
+            'error': error,
+            'guilds': len(bot.guilds) if bot is not None and bot.is_ready() else 0,
+            'playback': _worker_playback_info(),
+            # The cog's collectors read player state owned by the bot's loop
+            'metrics': metrics.registry.collect(loop=_bot_loop(bot), timeout=config.SHARD_STATUS_INTERVAL),
+            'loop': _worker_loop_report(),
+            'reported_at': time.time(),
+        }
+        try:
+            status_queue.put_nowait(snapshot)
+        except queue.Full:
+            pass
+
+    # Workers sharing one audio cache directory would evict each other's files
+    if config.AUDIO_CACHE_DIR:
+        config.AUDIO_CACHE_DIR = os.path.join(config.AUDIO_CACHE_DIR, f"worker-{index}")
+        config.AUDIO_CACHE_MAX_BYTES //= max(config.SHARD_PROCESSES, 1)
+
+    token = os.getenv("DISCORD_TOKEN")
+    if not token:
+        report("Error", "No Discord token found. Please set the DISCORD_TOKEN environment variable.")
+        sys.exit(EXIT_CONFIG_ERROR)
+
+    try:
+        from bot import create_bot
+        bot = create_bot(cookie_file, shard_ids=shard_ids, shard_count=shard_count)
+    except Exception as e:
+        logging.error(traceback.format_exc())
+        report("Error", str(e))
+        # The same error would come back on every restart
+        sys.exit(EXIT_CONFIG_ERROR)
+
+    def reporter():
+        while True:
+            report("Running" if bot.is_ready() else "Starting...", bot=bot)
+            time.sleep(config.SHARD_STATUS_INTERVAL)
+
+    threading.Thread(target=reporter, daemon=True, name="shard-status").start()
+    try:
+        bot.run(token)
+        report("Stopped", bot=bot)
+    except Exception as e:
+        logging.error(traceback.format_exc())
+        report("Error", str(e), bot=bot)
+
+def _bot_loop(bot):
+    """The bot's event loop, or None before the bot has one"""
+    loop = getattr(bot, 'loop', None)
+    return loop if isinstance(loop, asyncio.AbstractEventLoop) else None
+
+def _worker_playback_info():
+    """Playback info of the song started most recently in this worker process"""
+    latest = registry.latest()
+    return latest.to_dict() if latest is not None else {}
+
+def _worker_loop_report():
+    """Event loop profiler report of this worker process, if profiling is on"""
+    profiler = active_profiler()
+    return profiler.report(5) if profiler is not None else None
+
+class ShardLauncher:
+    """
+    Starts one process per shard group and restarts any that die
+
+    Worker processes are spawned rather than forked, so each gets a clean
+    interpreter without the web server's threads. A supervisor thread
+    collects their status reports for the web interface.
+    """
+
+    def __init__(self, cookie_file, shard_count, processes, assignment="", on_update=None):
+        """
+        Initialize the launcher
+
+        Args:
+            cookie_file (str): Path to the YouTube cookie file
+            shard_count (int): Total number of shards
+            processes (int): Number of worker processes
+            assignment (str): Optional explicit shard assignment, see assign_shards
+            on_update (callable): Called from the supervisor thread after every status report
+        """
+        self.cookie_file = cookie_file
+        self.shard_count = shard_count
+        self.groups = assign_shards(shard_count, processes, assignment)
+        self.on_update = on_update
+
+        self._context = multiprocessing.get_context("spawn")
+        self._status_queue = self._context.Queue(maxsize=1000)
+        self._processes = [None] * len(self.groups)
+        self._restarts = [0] * len(self.groups)
+        self._next_start = [0.0] * len(self.groups)
+        self._stopping = threading.Event()
+        self._supervisor = None
+        self._lock = threading.Lock()
+        self.workers = {}  # Worker index -> latest status report
+
+    @property
+    def running(self):
+        return self._supervisor is not None and self._supervisor.is_alive()
+
+    def start(self):
+        """Start every worker and the supervisor thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        for index in range(len(self.groups)):
+            self._spawn(index)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True, name="shard-supervisor")
+        self._supervisor.start()
+        logger.info(f"Started {len(self.groups)} worker(s) for {self.shard_count} shard(s): {self.groups}")
+
+    def stop(self, timeout=10):
+        """Stop the supervisor and terminate every worker"""
+        self._stopping.set()
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout)
+        with self._lock:
+            for status in self.workers.values():
+                status['status'] = "Stopped"
+
+    def _spawn(self, index):
+        """Start the process for one shard group"""
+        process = self._context.Process(
+            target=run_shard_worker,
+            args=(index, self.groups[index], self.shard_count, self.cookie_file, self._status_queue),
+            name=f"shard-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        with self._lock:
+            self.workers[index] = {
+                'worker': index, 'pid': process.pid, 'shards': self.groups[index],
+                'status': "Starting...", 'error': None, 'guilds': 0, 'playback': {},
+                'reported_at': time.time(),
+            }
+
+    def _supervise(self):
+        """Collect status reports and restart workers that exited, with backoff"""
+        while not self._stopping.is_set():
+            try:
+                snapshot = self._status_queue.get(timeout=1)
+                with self._lock:
+                    self.workers[snapshot['worker']] = snapshot
+                if self.on_update is not None:
+                    self.on_update()
+            except queue.Empty:
+                pass
+
+            for index, process in enumerate(self._processes):
+                if (self._stopping.is_set() or process is None or process.is_alive() or
+                        process.exitcode == EXIT_CONFIG_ERROR):
+                    continue
+                now = time.monotonic()
+                if not self._next_start[index]:
+                    # Back off 1, 2, 4 ... 60 seconds between restarts of the same worker
+                    delay = min(2 ** self._restarts[index], 60)
+                    self._next_start[index] = now + delay
+                    logger.warning(f"Shard worker {index} exited with {process.exitcode}, restarting in {delay}s")
+                elif now >= self._next_start[index]:
+                    self._restarts[index] += 1
+                    self._next_start[index] = 0.0
+                    self._spawn(index)
+
+    def metrics(self):
+        """
+        Get the metrics of every worker from its latest report
+
+        Returns:
+            list: (families, labels) pairs for utils.metrics.render
+        """
+        with self._lock:
+            reports = [self.workers[index] for index in sorted(self.workers)]
+        return [(report.get('metrics') or [], {'worker': report['worker']}) for report in reports]
+
+    def loop_reports(self):
+        """
+        Get the event loop profiler report of every worker from its latest status report
+
+        Returns:
+            list: Dicts with the worker index and its report, None if it isn't profiling
+        """
+        with self._lock:
+            reports = [self.workers[index] for index in sorted(self.workers)]
+        return [{'worker': report['worker'], 'report': report.get('loop')} for report in reports]
+
+    def status(self):
+        """
+        Get the latest report of every worker
+
+        Returns:
+            list: Status dicts ordered by worker index, without their metrics
+        """
+        with self._lock:
+            reports = [self.workers[index] for index in sorted(self.workers)]
+        return [{key: value for key, value in report.items() if key not in ('metrics', 'loop')} for report in reports]
+
+    def overall_status(self):
+        """
+        Summarize the workers' states for the web interface
+
+        Returns:
+            tuple: (status, error) - "Running" if any worker is connected,
+                "Error" if every worker failed, otherwise "Starting..."
+        """
+        statuses = self.status()
+        if any(status['status'] == "Running" for status in statuses):
+            return "Running", None
+        errors = [status['error'] for status in statuses if status['status'] == "Error"]
+        if statuses and len(errors) == len(statuses):
+            return "Error", errors[0]
+        return "Starting...", None
+
+    def playback_info(self):
+        """
+        Get the playback info of the worker that started a song most recently
+
+        Returns:
+            dict: Playback info as written by the music cog, or an empty dict
+        """
+        latest = {}
+        for status in self.status():
+            playback = status.get('playback') or {}
+            if (playback.get('start_time') or 0) > (latest.get('start_time') or 0):
+                latest = playback
+        return latest
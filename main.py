@@ -1,20 +1,22 @@
 # Main entry point for the Discord music bot with Flask web interface
 import os
 import logging
-import threading
+import multiprocessing
 import time
 import sys
+import config
 
 # Add proper flask import statements
 try:
-    from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+    from flask import (Flask, Response, render_template, request, jsonify, redirect, url_for,
+                       flash, session, stream_with_context)
 except ImportError:
     logging.error("Failed to import Flask. Make sure it's installed.")
     sys.exit(1)
 
 # Import bot modules with error handling
 try:
-    from bot import create_bot, bot_instance
+    from service import BotController, BotServiceClient
 except ImportError as e:
     logging.error(f"Failed to import bot modules: {e}")
     sys.exit(1)
@@ -63,163 +65,99 @@ logging.getLogger("gunicorn.access").addFilter(GunicornFilter())
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "discord-music-bot-secret")
 
-# Global variables to track bot status
-bot_thread = None
-bot_running = False
-bot_status = "Starting..."
-bot_error = None
+# The bot runs in this process, or in the bot service when several web workers share it
+if config.BOT_SERVICE_MODE == "remote":
+    controller = BotServiceClient(config.BOT_SERVICE_SOCKET)
+else:
+    controller = BotController(os.getenv("YT_COOKIE_FILE", "cookies.txt"))
 
-# Track playback information
-playback_info = {
-    "currently_playing": None,
-    "title": None,
-    "start_time": None,
-    "duration": None,
-    "guild_name": None
-}
+# Auto-start the bot immediately when the app is loaded, except inside shard
+# worker processes, which re-import the main module when it is run as a script
+if config.BOT_SERVICE_MODE != "remote" and multiprocessing.parent_process() is None:
+    logging.info("Starting Discord bot automatically on app startup")
+    controller.start()
 
-def run_bot():
-    """Run the Discord bot in a separate thread"""
-    global bot_running, bot_status, bot_error
-    
-    try:
-        # Get the Discord token from environment variables
-        token = os.getenv("DISCORD_TOKEN")
-        if not token:
-            bot_error = "No Discord token found. Please set the DISCORD_TOKEN environment variable."
-            bot_status = "Error"
-            bot_running = False
-            logging.error(bot_error)
-            return
-            
-        logging.info(f"Discord token found, starting bot with prefix 'Joper '")
-        
-        # Get cookie file path from environment variables or use default
-        cookie_file = os.getenv("YT_COOKIE_FILE", "cookies.txt")
-        
-        # Create and run the bot
-        bot = create_bot(cookie_file)
-        bot_status = "Running"
-        bot_running = True
-        logging.info("Discord bot created, attempting to connect to Discord...")
-        bot.run(token)
-    except Exception as e:
-        bot_error = str(e)
-        bot_status = "Error"
-        bot_running = False
-        # Print detailed error information
-        import traceback
-        logging.error("Discord bot error:")
-        logging.error(f"Error message: {e}")
-        logging.error(traceback.format_exc())
-
-# Start the bot automatically when the app starts
-def start_bot_automatically():
-    global bot_thread, bot_running
-    
-    if not bot_running:
-        logging.info("Starting Discord bot automatically")
-        bot_thread = threading.Thread(target=run_bot)
-        bot_thread.daemon = True
-        bot_thread.start()
-
-# Auto-start the bot immediately when the app is loaded
-logging.info("Starting Discord bot automatically on app startup")
-start_bot_automatically()
+def wants_json():
+    """Check if the client asked for JSON instead of a page"""
+    return request.accept_mimetypes.best == 'application/json'
 
 @app.route('/')
 def index():
     """Main page of the web interface"""
-    global bot_running, bot_status, bot_error
+    status = controller.status()
     
     return render_template('index.html', 
-                          bot_running=bot_running,
-                          bot_status=bot_status,
-                          bot_error=bot_error)
+                          bot_running=status['running'],
+                          bot_status=status['status'],
+                          bot_error=status['error'])
 
 @app.route('/start_bot', methods=['POST'])
 def start_bot():
-    """Start the Discord bot"""
-    global bot_thread, bot_running, bot_status, bot_error
-    
-    if not bot_running:
-        bot_error = None
-        bot_status = "Starting..."
-        bot_thread = threading.Thread(target=run_bot)
-        bot_thread.daemon = True
-        bot_thread.start()
-        time.sleep(2)  # Give the bot a moment to initialize
-        
-        if bot_error:
-            flash(f"Failed to start bot: {bot_error}", "danger")
-        else:
-            flash("Bot started successfully!", "success")
-    else:
-        flash("Bot is already running", "warning")
+    """Start the Discord bot in the background; the response carries the job handle"""
+    try:
+        job = controller.start()
+    except Exception as e:
+        if wants_json():
+            return jsonify({'error': str(e)}), 503
+        flash(f"Failed to start bot: {e}", "danger")
+        return redirect(url_for('index'))
     
+    if wants_json():
+        return jsonify(job), 202
+    flash(f"Starting bot (job {job['id']})", "info")
     return redirect(url_for('index'))
 
 @app.route('/stop_bot', methods=['POST'])
 def stop_bot():
-    """Stop the Discord bot"""
-    global bot_running, bot_status, bot_error
-    
-    if bot_running and bot_instance:
-        try:
-            logging.info("Attempting to stop Discord bot...")
-            # Close the bot instance
-            if hasattr(bot_instance, 'close') and callable(bot_instance.close):
-                bot_instance.close()
-            
-            # Update status
-            bot_running = False
-            bot_status = "Stopped"
-            bot_error = None
-            
-            # Log and notify
-            logging.info("Discord bot stopped successfully")
-            flash("Bot stopped successfully", "success")
-        except Exception as e:
-            # Log detailed error
-            import traceback
-            error_msg = f"Error stopping bot: {e}"
-            logging.error(error_msg)
-            logging.error(traceback.format_exc())
-            
-            # Update status and notify
-            bot_error = str(e)
-            bot_status = "Error stopping"
-            flash(error_msg, "danger")
-    else:
-        # Bot is not running
-        logging.warning("Attempted to stop bot, but it is not running")
-        flash("Bot is not running", "warning")
+    """Stop the Discord bot in the background; the response carries the job handle"""
+    try:
+        job = controller.stop()
+    except Exception as e:
+        if wants_json():
+            return jsonify({'error': str(e)}), 503
+        flash(f"Failed to stop bot: {e}", "danger")
+        return redirect(url_for('index'))
     
+    if wants_json():
+        return jsonify(job), 202
+    flash(f"Stopping bot (job {job['id']})", "info")
     return redirect(url_for('index'))
 
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Get the state of a start or stop job as JSON"""
+    try:
+        job = controller.job(job_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 503
+    if job is None:
+        return jsonify({'error': "Unknown job"}), 404
+    return jsonify(job)
+
 @app.route('/playback_info')
 def get_playback_info():
     """Get the current playback information as JSON"""
-    global playback_info
+    info = controller.playback_info()
     
     # Calculate remaining time if we have start time and duration
     remaining_time = None
     progress_percent = 0
     
-    if playback_info['start_time'] and playback_info['duration']:
-        import time
-        elapsed = time.time() - playback_info['start_time']
-        remaining_time = max(0, playback_info['duration'] - elapsed)
+    if info['start_time'] and info['duration']:
+        # The position stands still while the song is paused
+        elapsed = (info.get('paused_at') or time.time()) - info['start_time']
+        remaining_time = max(0, info['duration'] - elapsed)
         
         # Calculate progress as a percentage
-        if playback_info['duration'] > 0:
-            progress_percent = min(100, (elapsed / playback_info['duration']) * 100)
+        if info['duration'] > 0:
+            progress_percent = min(100, (elapsed / info['duration']) * 100)
     
     return jsonify({
-        'currently_playing': playback_info['currently_playing'],
-        'title': playback_info['title'],
-        'guild_name': playback_info['guild_name'],
-        'duration': playback_info['duration'],
+        'currently_playing': info['currently_playing'],
+        'title': info['title'],
+        'guild_name': info['guild_name'],
+        'duration': info['duration'],
+        'paused': bool(info.get('paused_at')),
         'remaining': remaining_time,
         'progress_percent': progress_percent
     })
@@ -227,15 +165,43 @@ def get_playback_info():
 @app.route('/bot_status')
 def get_bot_status():
     """Get the current status of the bot as JSON"""
-    global bot_running, bot_status, bot_error
-    
     return jsonify({
-        'running': bot_running,
-        'status': bot_status,
-        'error': bot_error,
+        **controller.status(),
         'playback': get_playback_info().json
     })
 
+@app.route('/metrics')
+def get_metrics():
+    """Expose the bot's metrics in the Prometheus text format"""
+    try:
+        text = controller.metrics()
+    except Exception as e:
+        return Response(f"# Bot service unavailable: {e}\n", status=503, mimetype='text/plain')
+    return Response(text, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/debug/loop')
+def debug_loop():
+    """Get the event loop profiler's lag percentiles and worst blocking callbacks as JSON"""
+    try:
+        report = controller.loop_report(request.args.get('limit', 10, type=int))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(report)
+
+@app.route('/events')
+def events():
+    """
+    Stream bot status and playback changes as server-sent events
+
+    Each connection gets the current state first and afterwards only changes;
+    the page interpolates song progress locally between playback events.
+    """
+    return Response(
+        stream_with_context(controller.stream_events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/upload_cookies', methods=['GET', 'POST'])
 def upload_cookies():
     """Upload cookies.txt file"""
@@ -260,4 +226,5 @@ def upload_cookies():
     return render_template('upload_cookies.html')
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # The reloader would import this module again in a second process and start a second bot
+    app.run(host="0.0.0.0", port=5000, use_reloader=False, threaded=True)
@@ -0,0 +1,519 @@
+# Bot service: runs the Discord bot in one process and answers web workers over a Unix socket
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import config
+from utils import metrics
+from utils.events import broadcaster
+from utils.loop_profiler import active_profiler
+from utils.playback_state import registry, EMPTY_PLAYBACK
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the bot to disconnect when stopping it
+STOP_TIMEOUT = 15
+
+class BotController:
+    """
+    Starts, stops and reports on the Discord bot of this process
+
+    Start and stop run as background jobs so callers never block on Discord:
+    they get a job handle right away and can look it up later. Jobs run one
+    at a time, so a stop submitted during a start waits for it.
+    """
+
+    def __init__(self, cookie_file):
+        """
+        Initialize the controller
+
+        Args:
+            cookie_file (str): Path to the YouTube cookie file
+        """
+        self.cookie_file = cookie_file
+        self.running = False
+        self.status_text = "Stopped"
+        self.error = None
+        self.bot = None
+        self.launcher = None  # ShardLauncher when the bot runs in worker processes
+        self._thread = None
+        self._control_lock = threading.Lock()  # One start/stop job at a time
+        self._jobs_lock = threading.Lock()
+        self._jobs = collections.OrderedDict()  # Job ID -> job dict, oldest first
+        self._job_ids = itertools.count(1)
+
+        # Push every playback change of the in-process bot
+        registry.add_listener(self.publish_playback)
+
+    # Jobs
+
+    def start(self):
+        """
+        Start the bot in the background
+
+        Returns:
+            dict: The job handle
+        """
+        return self._submit('start', self._start_bot)
+
+    def stop(self):
+        """
+        Stop the bot in the background
+
+        Returns:
+            dict: The job handle
+        """
+        return self._submit('stop', self._stop_bot)
+
+    def job(self, job_id):
+        """
+        Look up a start or stop job
+
+        Args:
+            job_id (str): ID from the job handle
+
+        Returns:
+            dict: The job, or None if it is unknown or was forgotten
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _submit(self, action, work):
+        """Create a job and run it on its own thread"""
+        job = {
+            'id': f"{action}-{next(self._job_ids)}",
+            'action': action,
+            'state': 'pending',
+            'message': None,
+            'created_at': time.time(),
+            'finished_at': None,
+        }
+        with self._jobs_lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > config.BOT_JOB_HISTORY:
+                self._jobs.popitem(last=False)
+            handle = dict(job)
+
+        threading.Thread(target=self._run_job, args=(job, work), daemon=True, name=f"bot-job-{job['id']}").start()
+        return handle
+
+    def _run_job(self, job, work):
+        """Run one job's work and record its outcome"""
+        with self._control_lock:
+            with self._jobs_lock:
+                job['state'] = 'running'
+            try:
+                message = work()
+                state = 'succeeded'
+            except Exception as e:
+                logger.error(f"Bot {job['action']} job {job['id']} failed: {e}")
+                message = str(e)
+                state = 'failed'
+            with self._jobs_lock:
+                job.update(state=state, message=message, finished_at=time.time())
+
+    # Bot lifecycle
+
+    def _start_bot(self):
+        """Start the in-process bot or the shard workers"""
+        if self.running:
+            return "Bot is already running"
+
+        self._set_status("Starting...")
+        if config.SHARD_PROCESSES > 1:
+            return self._start_launcher()
+
+        token = os.getenv("DISCORD_TOKEN")
+        if not token:
+            error = "No Discord token found. Please set the DISCORD_TOKEN environment variable."
+            self._set_status("Error", error)
+            raise RuntimeError(error)
+
+        try:
+            from bot import create_bot
+            logger.info(f"Discord token found, starting bot with prefix 'Joper '")
+            # One process runs every shard itself when SHARD_COUNT > 1
+            self.bot = create_bot(self.cookie_file, shard_count=config.SHARD_COUNT)
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            self._set_status("Error", str(e))
+            raise
+
+        self._thread = threading.Thread(target=self._run_bot, args=(self.bot, token), daemon=True, name="discord-bot")
+        self._thread.start()
+        self._set_status("Running", running=True)
+        logger.info("Discord bot created, attempting to connect to Discord...")
+        return "Bot started"
+
+    def _run_bot(self, bot, token):
+        """Run the bot until it is closed, on the bot thread"""
+        try:
+            bot.run(token)
+            if self.bot is bot:
+                self._set_status("Stopped")
+        except Exception as e:
+            logger.error("Discord bot error:")
+            logger.error(f"Error message: {e}")
+            logger.error(traceback.format_exc())
+            if self.bot is bot:
+                self._set_status("Error", str(e))
+
+    def _start_launcher(self):
+        """Start the shard worker processes instead of the in-process bot thread"""
+        from launcher import ShardLauncher
+        try:
+            if self.launcher is None:
+                self.launcher = ShardLauncher(
+                    self.cookie_file,
+                    shard_count=max(config.SHARD_COUNT, config.SHARD_PROCESSES),
+                    processes=config.SHARD_PROCESSES,
+                    assignment=config.SHARD_ASSIGNMENT,
+                    on_update=self.publish_state
+                )
+            self.launcher.start()
+        except Exception as e:
+            logger.error(f"Failed to start shard workers: {e}")
+            self._set_status("Error", str(e))
+            raise
+        self._set_status("Running", running=True)
+        return "Shard workers started"
+
+    def _stop_bot(self):
+        """Stop the shard workers or close the in-process bot"""
+        if not self.running:
+            return "Bot is not running"
+
+        if self.launcher is not None:
+            self.launcher.stop()
+            logger.info("Shard workers stopped")
+        else:
+            bot, thread = self.bot, self._thread
+            logger.info("Attempting to stop Discord bot...")
+            try:
+                future = asyncio.run_coroutine_threadsafe(bot.close(), bot.loop)
+                future.result(STOP_TIMEOUT)
+            except Exception as e:
+                self._set_status("Error stopping", str(e), running=True)
+                raise
+            thread.join(STOP_TIMEOUT)
+            self.bot = None
+            logger.info("Discord bot stopped successfully")
+
+        # Players of the closed bot never report going idle
+        for guild_id in list(registry.snapshot()[1]):
+            registry.clear(guild_id)
+        self._set_status("Stopped")
+        self.publish_state()
+        return "Bot stopped"
+
+    # State
+
+    def _set_status(self, status, error=None, running=False):
+        """Record a state transition and push it to connected dashboards"""
+        self.status_text = status
+        self.error = error
+        self.running = running
+        self.publish_status()
+
+    def status(self):
+        """
+        Get the bot status shown by the web interface
+
+        Returns:
+            dict: running, status, error and the shard workers' reports
+        """
+        state = self._summary()
+        state['workers'] = self.launcher.status() if self.launcher is not None else []
+        return state
+
+    def _summary(self):
+        """running, status and error, summarized over shard workers if there are any"""
+        status, error = self.status_text, self.error
+        if self.launcher is not None and self.running:
+            status, error = self.launcher.overall_status()
+        return {'running': self.running, 'status': status, 'error': error}
+
+    def playback_info(self):
+        """
+        Get the playback info shown by the web interface
+
+        Returns:
+            dict: Playback info of the song started most recently in any guild
+        """
+        # With shard workers, show the song started most recently in any of them
+        if self.launcher is not None:
+            return dict(EMPTY_PLAYBACK, **self.launcher.playback_info())
+        latest = registry.latest()
+        return latest.to_dict() if latest is not None else dict(EMPTY_PLAYBACK)
+
+    def publish_status(self):
+        """Push the bot status to dashboards connected to /events"""
+        broadcaster.publish('status', self._summary())
+
+    def publish_playback(self):
+        """Push the playback info to dashboards connected to /events"""
+        broadcaster.publish('playback', self.playback_info())
+
+    def publish_state(self):
+        """Push the bot status and playback info to dashboards connected to /events"""
+        self.publish_status()
+        self.publish_playback()
+
+    def stream_events(self):
+        """
+        Stream status and playback changes as server-sent events
+
+        Yields:
+            str: Encoded events, starting with the current state
+        """
+        self.publish_state()
+        return broadcaster.stream()
+
+    def loop_report(self, limit=10):
+        """
+        Get the event loop profiler's report
+
+        Args:
+            limit (int): Number of offenders to include
+
+        Returns:
+            dict: The report, {'enabled': False} if profiling is off, or one
+                report per shard worker under 'workers'
+        """
+        if self.launcher is not None:
+            return {'enabled': config.LOOP_PROFILER, 'workers': self.launcher.loop_reports()}
+        profiler = active_profiler()
+        return profiler.report(limit) if profiler is not None else {'enabled': False}
+
+    def metrics(self):
+        """
+        Render the bot's metrics for Prometheus
+
+        Returns:
+            str: Metrics in the text exposition format, labelled by worker when sharded
+        """
+        # The cog's collectors read player state owned by the bot's loop
+        loop = getattr(self.bot, 'loop', None)
+        if not isinstance(loop, asyncio.AbstractEventLoop):
+            loop = None
+        groups = [(metrics.registry.collect(loop=loop), {})]
+        if self.launcher is not None:
+            groups.extend(self.launcher.metrics())
+        return metrics.render(groups)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers one JSON request per connection"""
+
+    def handle(self):
+        controller = self.server.controller
+        try:
+            request = json.loads(self.rfile.readline())
+            command = request['command']
+        except (ValueError, KeyError, TypeError):
+            self._reply({'error': "Malformed request"})
+            return
+
+        try:
+            if command == 'events':
+                # Stays open, relaying events until the web worker hangs up
+                for chunk in controller.stream_events():
+                    self.wfile.write(chunk.encode())
+                    self.wfile.flush()
+                return
+            if command == 'status':
+                result = controller.status()
+            elif command == 'playback_info':
+                result = controller.playback_info()
+            elif command == 'start':
+                result = controller.start()
+            elif command == 'stop':
+                result = controller.stop()
+            elif command == 'job':
+                result = controller.job(request.get('id'))
+            elif command == 'metrics':
+                result = controller.metrics()
+            elif command == 'loop_report':
+                result = controller.loop_report(request.get('limit', 10))
+            else:
+                self._reply({'error': f"Unknown command: {command}"})
+                return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            # Answer anyway, so the web worker reports the failure instead of reading nothing
+            logger.error(f"Bot service command '{command}' failed: {e}")
+            logger.error(traceback.format_exc())
+            if command != 'events':
+                self._reply({'error': f"{command} failed: {e}"})
+            return
+        self._reply({'result': result})
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+class BotServiceServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server that exposes a BotController to web workers"""
+
+    daemon_threads = True
+
+    def __init__(self, controller, path):
+        """
+        Bind the socket, replacing a stale one left by a previous run
+
+        Args:
+            controller (BotController): Controller to expose
+            path (str): Socket path
+        """
+        self.controller = controller
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _RequestHandler)
+        os.chmod(path, 0o660)
+
+class BotServiceClient:
+    """
+    Talks to the bot service from a web worker
+
+    Has the same methods as BotController, so the web interface works the
+    same way whichever process runs the bot.
+    """
+
+    def __init__(self, path, timeout=config.BOT_SERVICE_TIMEOUT):
+        """
+        Initialize the client
+
+        Args:
+            path (str): Socket path of the bot service
+            timeout (float): Seconds to wait for an answer
+        """
+        self.path = path
+        self.timeout = timeout
+
+    def _connect(self, command, **args):
+        """Open a connection and send one request"""
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(self.path)
+            connection.sendall(json.dumps(dict(args, command=command)).encode() + b"\n")
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def _request(self, command, **args):
+        """Send one request and return its result"""
+        with self._connect(command, **args) as connection:
+            with connection.makefile('rb') as reader:
+                line = reader.readline()
+        if not line:
+            raise RuntimeError(f"Bot service closed the connection without answering '{command}'")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response.get('result')
+
+    def is_available(self):
+        """Check if the bot service is listening"""
+        try:
+            self._request('status')
+            return True
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def status(self):
+        """Get the bot status, reporting an unreachable service as an error"""
+        try:
+            return self._request('status')
+        except (OSError, ValueError, RuntimeError) as e:
+            return {'running': False, 'status': "Error", 'error': f"Bot service unavailable: {e}", 'workers': []}
+
+    def playback_info(self):
+        """Get the playback info, or nothing playing if the service is unreachable"""
+        try:
+            return self._request('playback_info')
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.warning(f"Couldn't get playback info from the bot service: {e}")
+            return dict(EMPTY_PLAYBACK)
+
+    def start(self):
+        """Ask the service to start the bot; returns the job handle"""
+        return self._request('start')
+
+    def stop(self):
+        """Ask the service to stop the bot; returns the job handle"""
+        return self._request('stop')
+
+    def job(self, job_id):
+        """Look up a start or stop job"""
+        return self._request('job', id=job_id)
+
+    def metrics(self):
+        """Get the bot service's metrics in the Prometheus text format"""
+        return self._request('metrics')
+
+    def loop_report(self, limit=10):
+        """Get the bot service's event loop profiler report"""
+        return self._request('loop_report', limit=limit)
+
+    def stream_events(self):
+        """
+        Relay the bot service's server-sent events
+
+        Yields:
+            str: Encoded events
+        """
+        connection = self._connect('events')
+        # Keep-alive comments arrive every 15 seconds, so a longer silence means the service is gone
+        connection.settimeout(60)
+        try:
+            while True:
+                chunk = connection.recv(65536)
+                if not chunk:
+                    return
+                yield chunk.decode()
+        except OSError as e:
+            logger.warning(f"Lost the event stream of the bot service: {e}")
+        finally:
+            connection.close()
+
+def main():
+    """Run the bot service until interrupted"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    controller = BotController(os.getenv("YT_COOKIE_FILE", "cookies.txt"))
+    server = BotServiceServer(controller, config.BOT_SERVICE_SOCKET)
+
+    def shutdown(signum, frame):
+        logger.info("Shutting down bot service")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    controller.start()
+    logger.info(f"Bot service listening on {config.BOT_SERVICE_SOCKET}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(config.BOT_SERVICE_SOCKET):
+            os.unlink(config.BOT_SERVICE_SOCKET)
+        if controller.launcher is not None:
+            controller.launcher.stop()
+
+if __name__ == "__main__":
+    sys.exit(main())
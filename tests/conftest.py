@@ -0,0 +1,27 @@
+# Shared fixtures: config isolation and a YouTubeDownloader that talks to the offline fake yt-dlp
+import pytest
+
+import config
+from benchmarks.fakes import FakeYoutubeDL, patched_youtube_dl
+from utils.youtube import YouTubeDownloader
+
+@pytest.fixture(autouse=True)
+def isolated_config(monkeypatch):
+    """Nothing persistent, no audio cache and no loudness analysis unless a test turns them on"""
+    monkeypatch.setattr(config, 'METADATA_DB_PATH', "")
+    monkeypatch.setattr(config, 'AUDIO_CACHE_DIR', "")
+    monkeypatch.setattr(config, 'LOUDNESS_ANALYSIS', False)
+
+@pytest.fixture
+def fake_ytdl():
+    """The fake yt-dlp with no simulated latency and fresh call counters"""
+    FakeYoutubeDL.configure(latency=0, jitter=0)
+    with patched_youtube_dl():
+        yield FakeYoutubeDL
+
+@pytest.fixture
+def downloader(fake_ytdl, tmp_path):
+    """A downloader with nothing persistent and no loudness analysis"""
+    downloader = YouTubeDownloader(str(tmp_path / "cookies.txt"))
+    yield downloader
+    downloader.close()
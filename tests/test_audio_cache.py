@@ -0,0 +1,117 @@
+# Tests for the size-bounded on-disk audio cache
+import asyncio
+import os
+import threading
+
+import config
+from utils.audio_cache import AudioCache
+from utils.youtube import YouTubeDownloader
+
+def download(cache, video_id, size):
+    """Stage a file of the given size and hand it to the cache like a finished download"""
+    assert cache.begin_download(video_id)
+    staged = os.path.join(cache.staging_directory, f"{video_id}.webm")
+    with open(staged, 'wb') as f:
+        f.write(b"\0" * size)
+    return cache.finish_download(video_id, staged)
+
+def test_download_is_moved_into_place(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    path = download(cache, "a", 100)
+    assert path == os.path.join(str(tmp_path), "a.webm")
+    assert os.path.getsize(path) == 100
+    assert os.listdir(cache.staging_directory) == []
+    assert cache.get("a") == path and cache.peek("a") == path
+    assert cache.stats()['hits'] == 1
+
+def test_least_played_file_is_evicted_first(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=300)
+    for video_id in "abc":
+        download(cache, video_id, 100)
+    cache.get("a")
+    cache.get("a")
+    cache.get("c")
+
+    download(cache, "d", 100)
+    assert "b" not in cache
+    assert not os.path.exists(os.path.join(str(tmp_path), "b.webm"))
+    assert cache.total_bytes() == 300 and cache.stats()['evictions'] == 1
+
+def test_ties_go_to_the_least_recently_played(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=200)
+    download(cache, "a", 100)
+    download(cache, "b", 100)
+    cache._entries["a"]['last_access'] -= 10
+    download(cache, "c", 100)
+    assert "a" not in cache and "b" in cache and "c" in cache
+
+def test_new_download_is_kept_over_older_files(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    download(cache, "a", 100)
+    for _ in range(5):
+        cache.get("a")
+    assert download(cache, "b", 200) is not None
+    assert "a" not in cache and "b" in cache
+
+def test_file_larger_than_the_budget_is_dropped(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=100)
+    assert download(cache, "huge", 500) is None
+    assert len(cache) == 0 and os.listdir(str(tmp_path)) == [AudioCache.STAGING_DIR]
+
+def test_a_video_is_downloaded_once_at_a_time(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    assert cache.begin_download("a")
+    assert not cache.begin_download("a")
+    assert cache.finish_download("a", None) is None
+    assert cache.begin_download("a")
+
+def test_restart_indexes_files_and_clears_staging(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    download(cache, "a", 100)
+    with open(os.path.join(cache.staging_directory, "partial.webm.part"), 'wb') as f:
+        f.write(b"\0")
+
+    reopened = AudioCache(str(tmp_path), max_bytes=1000)
+    assert "a" in reopened and reopened.total_bytes() == 100
+    assert os.listdir(reopened.staging_directory) == []
+
+def test_restart_with_a_smaller_budget_evicts(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    for video_id in "abc":
+        download(cache, video_id, 100)
+    reopened = AudioCache(str(tmp_path), max_bytes=150)
+    assert len(reopened) == 1 and reopened.total_bytes() == 100
+
+def test_file_removed_behind_the_cache_is_a_miss(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    os.remove(download(cache, "a", 100))
+    assert cache.get("a") is None
+    assert "a" not in cache and cache.stats()['misses'] == 1
+
+def test_popular_skips_cached_videos(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    for video_id, count in (("a", 3), ("b", 5), ("c", 1)):
+        for _ in range(count):
+            cache.record_request(video_id)
+    download(cache, "b", 100)
+    assert cache.popular(min_requests=2, limit=5) == ["a"]
+
+def test_downloads_run_on_their_own_pool(fake_ytdl, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'AUDIO_CACHE_DIR', str(tmp_path / "audio"))
+    downloader = YouTubeDownloader(str(tmp_path / "cookies.txt"))
+    threads = []
+
+    def fake_download(video_id):
+        threads.append(threading.current_thread().name)
+        return download(downloader.audio_cache, video_id, 100)
+
+    monkeypatch.setattr(downloader, '_download_audio', fake_download)
+    try:
+        path = asyncio.run(downloader.cache_audio("aaaaaaaaaaa"))
+        assert asyncio.run(downloader.get_cached_audio("aaaaaaaaaaa")) == path
+        assert asyncio.run(downloader.get_cached_audio("bbbbbbbbbbb")) is None
+    finally:
+        downloader.close()
+
+    assert threads[0].startswith("download")
+    assert downloader.scheduler.stats()['completed'] == 0
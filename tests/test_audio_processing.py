@@ -0,0 +1,133 @@
+# Tests for the volume and loudness gain stage
+import logging
+
+import discord
+import numpy as np
+import pytest
+
+from utils import audio_processing
+from utils.audio_processing import (
+    LIMITER_THRESHOLD, GainProcessor, create_processor, loudness_gain, parse_ebur128_summary, soft_limit
+)
+
+FRAME_SAMPLES = 960 * 2  # 20 ms of 48 kHz stereo
+
+class ConstantPCM(discord.AudioSource):
+    """Frames where every sample has the same value"""
+
+    def __init__(self, value, frames=50):
+        self.frame = np.full(FRAME_SAMPLES, value, dtype=np.int16).tobytes()
+        self.frames = frames
+
+    def read(self):
+        if self.frames == 0:
+            return b""
+        self.frames -= 1
+        return self.frame
+
+def samples(data):
+    return np.frombuffer(data, dtype=np.int16)
+
+def test_unity_gain_passes_frames_through():
+    source = ConstantPCM(1000)
+    assert GainProcessor(source, volume=1.0).read() is source.frame
+
+def test_volume_and_track_gain_multiply():
+    processor = GainProcessor(ConstantPCM(1000), volume=0.5, gain_db=6.0206)
+    assert samples(processor.read())[0] == pytest.approx(1000, abs=1)
+
+def test_volume_change_is_ramped():
+    processor = GainProcessor(ConstantPCM(10000), volume=1.0, ramp_frames=4)
+    processor.volume = 0.0
+    first = samples(processor.read())
+    # Falls across the frame instead of jumping
+    assert first[0] == 10000 and 7000 < first[-1] < 8000
+    for _ in range(3):
+        processor.read()
+    assert not samples(processor.read()).any()
+
+def test_end_of_stream():
+    processor = GainProcessor(ConstantPCM(1000, frames=1), volume=0.5)
+    assert processor.read()
+    assert processor.read() == b""
+
+def test_opus_sources_are_rejected():
+    class OpusSource(ConstantPCM):
+        def is_opus(self):
+            return True
+
+    with pytest.raises(discord.ClientException):
+        GainProcessor(OpusSource(0))
+
+@pytest.mark.parametrize("loudness, expected", [(-20.0, 6.0), (-8.0, -6.0), (-40.0, 12.0), (5.0, -12.0)])
+def test_loudness_gain(loudness, expected):
+    assert loudness_gain(loudness, target=-14.0) == pytest.approx(expected)
+
+@pytest.mark.parametrize("loudness, true_peak, expected", [
+    (-30.0, -20.0, 12.0),  # Plenty of headroom: the full boost
+    (-30.0, -6.0, 5.0),  # Boost stops at the -1 dBTP ceiling
+    (-30.0, 0.5, 0.0),  # Already over the ceiling: no boost, but no cut either
+    (-8.0, 0.5, -6.0),  # Cuts ignore the peak
+    (-30.0, float('-inf'), 12.0),  # Silence
+])
+def test_boost_is_capped_by_true_peak(loudness, true_peak, expected):
+    gain = loudness_gain(loudness, target=-14.0, true_peak=true_peak, ceiling=-1.0)
+    assert gain == pytest.approx(expected)
+
+def test_parse_ebur128_summary():
+    output = """
+[Parsed_ebur128_0 @ 0x5581] t: 0.4  TARGET:-23 LUFS  M: -25.1 S:-120.7  I: -25.1 LUFS  LRA:   0.0 LU  TPK: -3.2 -3.4 dBFS
+[Parsed_ebur128_0 @ 0x5581] Summary:
+
+  Integrated loudness:
+    I:         -19.3 LUFS
+    Threshold: -29.6 LUFS
+
+  Loudness range:
+    LRA:         6.4 LU
+
+  True peak:
+    Peak:       -0.6 dBFS
+"""
+    assert parse_ebur128_summary(output) == (-19.3, -0.6)
+    assert parse_ebur128_summary("    I:         -70.0 LUFS\n    Peak:       -inf dBFS") == (-70.0, float('-inf'))
+    assert parse_ebur128_summary("    I:         -9.0 LUFS") == (-9.0, None)
+    assert parse_ebur128_summary("Invalid data found when processing input") is None
+
+def test_soft_limit_rounds_off_peaks():
+    levels = np.linspace(-200000, 200000, 4001, dtype=np.float32)
+    limited = soft_limit(levels.copy())
+    quiet = np.abs(levels) <= LIMITER_THRESHOLD
+    assert np.array_equal(limited[quiet], levels[quiet])
+    assert np.abs(limited).max() <= 32767
+    # Still monotonic, so loud passages keep their shape instead of flattening
+    assert np.all(np.diff(limited) >= 0)
+
+@pytest.mark.parametrize("level", [9000, -9000, 32767, -32768])
+def test_boosted_frames_are_limited_not_wrapped(level):
+    processor = GainProcessor(ConstantPCM(level), volume=1.0, gain_db=12.0)
+    out = int(samples(processor.read())[0])
+    assert LIMITER_THRESHOLD < abs(out) <= 32767 and (out > 0) == (level > 0)
+
+def test_limiter_keeps_moderate_overs_below_full_scale():
+    # +12 dB takes 9000 to about 35800, inside the limiter's knee
+    processor = GainProcessor(ConstantPCM(9000), volume=1.0, gain_db=12.0)
+    assert LIMITER_THRESHOLD < samples(processor.read())[0] < 32700
+
+def test_boost_leaves_quiet_frames_alone():
+    processor = GainProcessor(ConstantPCM(1000), volume=1.0, gain_db=6.0206)
+    assert samples(processor.read())[0] == pytest.approx(2000, abs=1)
+
+def test_numpy_backend_is_used_when_available():
+    assert isinstance(create_processor(ConstantPCM(0), 0.5, 3.0), GainProcessor)
+    assert isinstance(create_processor(ConstantPCM(0), 0.5, 3.0, backend='legacy'), discord.PCMVolumeTransformer)
+
+def test_missing_numpy_falls_back_with_one_warning(monkeypatch, caplog):
+    monkeypatch.setattr(audio_processing, 'np', None)
+    monkeypatch.setattr(audio_processing, '_warned_fallback', False)
+    with caplog.at_level(logging.WARNING, logger='utils.audio_processing'):
+        first = create_processor(ConstantPCM(0), 0.5, 6.0206)
+        create_processor(ConstantPCM(0), 0.5)
+    assert isinstance(first, discord.PCMVolumeTransformer)
+    assert first.volume == pytest.approx(1.0, abs=1e-3)
+    assert [record.levelname for record in caplog.records] == ['WARNING']
@@ -0,0 +1,150 @@
+# Tests for the prioritised, per-guild capped extraction pool
+import asyncio
+import threading
+
+import pytest
+
+from utils.extraction_scheduler import ExtractionScheduler
+
+class Gate:
+    """Blocking job bodies that record their start order and wait to be released"""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def job(self, name):
+        with self._lock:
+            self.started.append(name)
+        assert self.release.wait(5)
+        return name
+
+async def settle():
+    """Let started jobs reach the thread pool and callbacks run"""
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+def test_jobs_start_in_priority_order():
+    async def run():
+        scheduler = ExtractionScheduler(workers=1, per_guild_limit=1)
+        gate = Gate()
+        blocker = asyncio.create_task(scheduler.run(gate.job, 'blocker'))
+        await settle()
+        tasks = [
+            asyncio.create_task(scheduler.run(gate.job, name, priority=priority))
+            for name, priority in (
+                ('background', ExtractionScheduler.PRIORITY_BACKGROUND),
+                ('display', ExtractionScheduler.PRIORITY_DISPLAY),
+                ('playback', ExtractionScheduler.PRIORITY_PLAYBACK),
+                ('prefetch', ExtractionScheduler.PRIORITY_PREFETCH),
+            )
+        ]
+        await settle()
+        gate.release.set()
+        await asyncio.gather(blocker, *tasks)
+        scheduler.shutdown()
+        return gate.started
+
+    assert asyncio.run(run()) == ['blocker', 'playback', 'prefetch', 'display', 'background']
+
+def test_per_guild_cap_lets_other_guilds_through():
+    async def run():
+        scheduler = ExtractionScheduler(workers=3, per_guild_limit=2)
+        gate = Gate()
+        busy = [asyncio.create_task(scheduler.run(gate.job, f"busy-{i}", guild_id=1)) for i in range(4)]
+        other = asyncio.create_task(scheduler.run(gate.job, 'other', guild_id=2))
+        await settle()
+        started = list(gate.started)
+        stats = scheduler.stats()
+        gate.release.set()
+        results = await asyncio.gather(*busy, other)
+        scheduler.shutdown()
+        return started, stats, results
+
+    started, stats, results = asyncio.run(run())
+    # Guild 1 holds two workers, the third goes to guild 2 even though it queued last
+    assert sorted(started) == ['busy-0', 'busy-1', 'other']
+    assert stats['active'] == 3 and stats['active_guilds'] == 2
+    assert stats['lanes']['display']['pending'] == 2
+    assert results == ['busy-0', 'busy-1', 'busy-2', 'busy-3', 'other']
+
+def test_capped_jobs_keep_their_order():
+    async def run():
+        scheduler = ExtractionScheduler(workers=1, per_guild_limit=1)
+        gate = Gate()
+        tasks = [asyncio.create_task(scheduler.run(gate.job, i, guild_id=1)) for i in range(5)]
+        await settle()
+        gate.release.set()
+        await asyncio.gather(*tasks)
+        scheduler.shutdown()
+        return gate.started
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+
+def test_errors_reach_the_caller_and_free_the_worker():
+    def explode():
+        raise ValueError("boom")
+
+    async def run():
+        scheduler = ExtractionScheduler(workers=1)
+        with pytest.raises(ValueError):
+            await scheduler.run(explode, guild_id=1)
+        result = await scheduler.run(lambda: 'ok', guild_id=1)
+        stats = scheduler.stats()
+        scheduler.shutdown()
+        return result, stats
+
+    result, stats = asyncio.run(run())
+    assert result == 'ok'
+    assert stats['failed'] == 1 and stats['completed'] == 1 and stats['active'] == 0
+
+def test_job_cancelled_before_it_starts_is_skipped():
+    async def run():
+        scheduler = ExtractionScheduler(workers=1)
+        gate = Gate()
+        blocker = asyncio.create_task(scheduler.run(gate.job, 'blocker'))
+        await settle()
+        abandoned = asyncio.create_task(scheduler.run(gate.job, 'abandoned'))
+        kept = asyncio.create_task(scheduler.run(gate.job, 'kept'))
+        await settle()
+        abandoned.cancel()
+        gate.release.set()
+        await asyncio.gather(blocker, kept)
+        scheduler.shutdown()
+        return gate.started
+
+    assert asyncio.run(run()) == ['blocker', 'kept']
+
+def test_shutdown_fails_queued_jobs_instead_of_hanging():
+    async def run():
+        scheduler = ExtractionScheduler(workers=1)
+        gate = Gate()
+        running = asyncio.create_task(scheduler.run(gate.job, 'running'))
+        queued = [asyncio.create_task(scheduler.run(gate.job, i)) for i in range(3)]
+        await settle()
+        scheduler.shutdown()
+        gate.release.set()
+        results = await asyncio.wait_for(asyncio.gather(running, *queued, return_exceptions=True), 5)
+        with pytest.raises(RuntimeError):
+            await scheduler.run(gate.job, 'late')
+        return results, gate.started
+
+    results, started = asyncio.run(run())
+    assert results[0] == 'running'
+    assert all(isinstance(result, RuntimeError) for result in results[1:])
+    assert started == ['running']
+
+def test_shutdown_from_another_thread():
+    async def run():
+        scheduler = ExtractionScheduler(workers=1)
+        gate = Gate()
+        running = asyncio.create_task(scheduler.run(gate.job, 'running'))
+        queued = asyncio.create_task(scheduler.run(gate.job, 'queued'))
+        await settle()
+        await asyncio.to_thread(scheduler.shutdown)
+        gate.release.set()
+        return await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 5)
+
+    running, queued = asyncio.run(run())
+    assert running == 'running' and isinstance(queued, RuntimeError)
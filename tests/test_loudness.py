@@ -0,0 +1,56 @@
+# Tests for scheduling loudness analysis away from the extraction pool
+import asyncio
+import threading
+import time
+
+import config
+from utils import youtube
+from utils.track import Track
+
+def resolved_track(video_id):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    stream_url = f"https://rr1---sn-fixture.googlevideo.com/videoplayback?id={video_id}&expire={int(time.time()) + 3600}"
+    return Track(url, video_id=video_id, stream_url=stream_url)
+
+def test_analysis_runs_on_its_own_pool(downloader, monkeypatch):
+    monkeypatch.setattr(config, 'LOUDNESS_ANALYSIS', True)
+    release = threading.Event()
+    calls = []
+
+    def slow_measure(source, ffmpeg_path, seconds, before_options, timeout):
+        calls.append((seconds, timeout))
+        assert release.wait(5)
+        return -20.0, -10.0
+
+    monkeypatch.setattr(youtube, 'measure_loudness', slow_measure)
+
+    async def run():
+        analyses = [
+            asyncio.create_task(downloader.analyze_loudness(resolved_track(video_id), guild_id=1))
+            for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc")
+        ]
+        await asyncio.sleep(0.05)
+        busy = downloader.scheduler.stats()['active'], downloader.analysis_scheduler.stats()['active']
+        # Playback resolves still get a worker straight away
+        info = await asyncio.wait_for(downloader.get_audio_info("https://www.youtube.com/watch?v=ddddddddddd", guild_id=1), 2)
+        release.set()
+        return busy, info, await asyncio.gather(*analyses)
+
+    (extraction_active, analysis_active), info, gains = asyncio.run(run())
+    assert extraction_active == 0 and analysis_active == config.LOUDNESS_WORKERS
+    assert info[1] == "Fixture song ddddddddddd"
+    assert gains == [6.0, 6.0, 6.0]
+    seconds, timeout = calls[0]
+    assert timeout == config.LOUDNESS_ANALYSIS_TIMEOUT and timeout > seconds * 2
+
+def test_unmeasurable_tracks_are_not_retried(downloader, monkeypatch):
+    monkeypatch.setattr(config, 'LOUDNESS_ANALYSIS', True)
+    calls = []
+    monkeypatch.setattr(youtube, 'measure_loudness', lambda *args: calls.append(args))
+
+    async def run():
+        for _ in range(2):
+            assert await downloader.analyze_loudness(resolved_track("aaaaaaaaaaa")) is None
+
+    asyncio.run(run())
+    assert len(calls) == 1
@@ -0,0 +1,96 @@
+# Tests for the persistent video metadata store
+import time
+
+from utils.metadata_store import MetadataStore
+
+def test_put_get_and_survive_restart(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    store = MetadataStore(path)
+    store.put("a", "Song A", 180, "thumb")
+    assert store.get("a")['title'] == "Song A"
+    store.close()
+
+    reopened = MetadataStore(path)
+    assert reopened.get("a") is None
+    assert reopened.warm() == 1
+    assert reopened.get("a")['duration'] == 180
+    reopened.close()
+
+def test_memory_is_bounded_lru(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"), memory_size=3)
+    for video_id in "abc":
+        store.put(video_id, f"Song {video_id}")
+    store.get("a")  # Recently used, so "b" goes first
+    store.put("d", "Song d")
+    assert len(store) == 3
+    assert store.get("b") is None
+    assert [store.get(video_id)['title'] for video_id in "acd"] == ["Song a", "Song c", "Song d"]
+    store.close()
+
+def test_warm_keeps_the_most_recent_within_the_memory_bound(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    store = MetadataStore(path)
+    now = time.time()
+    for age, video_id in enumerate("abcde"):
+        store.put(video_id, f"Song {video_id}")
+        store._conn.execute("UPDATE videos SET last_seen = ? WHERE video_id = ?", (now - age, video_id))
+    store.close()
+
+    small = MetadataStore(path, memory_size=2)
+    assert small.warm(limit=10) == 2
+    # Entries from warm() are evicted oldest first
+    small.put("f", "Song f")
+    assert small.get("a") is not None
+    assert small.get("b") is None and small.get("c") is None
+    small.close()
+
+def test_expired_entries_are_dropped(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    store = MetadataStore(path, ttl=60)
+    store.put("old", "Old song")
+    store.put("new", "New song")
+    store._conn.execute("UPDATE videos SET last_seen = ? WHERE video_id = 'old'", (time.time() - 120,))
+    store.close()
+
+    reopened = MetadataStore(path, ttl=60)
+    assert reopened.warm() == 1
+    assert reopened.get("old") is None
+    assert reopened._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 1
+    reopened.close()
+
+def test_entries_expire_in_memory(tmp_path, monkeypatch):
+    store = MetadataStore(str(tmp_path / "metadata.db"), ttl=60)
+    store.put("a", "Song A")
+    later = time.time() + 61
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert store.get("a") is None
+    store.close()
+
+def test_missing_fields_keep_known_values(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    store = MetadataStore(path)
+    store.put("a", "Song A", 180, "thumb")
+    store.put("a", "Song A (remastered)")  # e.g. a flat playlist entry
+    assert store.get("a")['duration'] == 180
+    store._memory.clear()
+    store.put("a", "Song A (remastered)")  # Also when memory has forgotten it
+    store.close()
+
+    reopened = MetadataStore(path)
+    reopened.warm()
+    entry = reopened.get("a")
+    assert (entry['title'], entry['duration'], entry['thumbnail']) == ("Song A (remastered)", 180, "thumb")
+    reopened.close()
+
+def test_writes_prune_expired_entries(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"), ttl=60)
+    store.put("old", "Old song")
+    store._conn.execute("UPDATE videos SET last_seen = ? WHERE video_id = 'old'", (time.time() - 120,))
+
+    store.put("new", "New song")  # Within PRUNE_INTERVAL of the first write
+    assert store._conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0] == 2
+
+    store._pruned_at -= MetadataStore.PRUNE_INTERVAL
+    store.put("newer", "Newer song")
+    assert store._conn.execute("SELECT video_id FROM videos ORDER BY video_id").fetchall() == [("new",), ("newer",)]
+    store.close()
@@ -0,0 +1,43 @@
+# Tests for metric collection from threads other than the bot's
+import asyncio
+import threading
+
+from utils.metrics import MetricsRegistry
+
+def test_collectors_run_on_the_owning_loop():
+    registry = MetricsRegistry()
+    threads = []
+    registry.add_collector('bot', lambda: threads.append(threading.current_thread()) or [])
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        await asyncio.to_thread(registry.collect, loop=loop)
+        registry.collect(loop=loop)  # From the loop itself
+
+    asyncio.run(run())
+    assert threads == [threading.main_thread(), threading.main_thread()]
+
+def test_collectors_run_in_place_without_a_running_loop():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("jopertube_test", "Test gauge")
+    gauge.set(3)
+    registry.add_collector('bot', lambda: [("jopertube_other", "gauge", "Other", [("jopertube_other", {}, 1)])])
+
+    loop = asyncio.new_event_loop()
+    try:
+        names = [family[0] for family in registry.collect(loop=loop)]
+    finally:
+        loop.close()
+
+    assert names == ["jopertube_test", "jopertube_other"]
+
+def test_a_failing_collector_hides_nothing_else():
+    registry = MetricsRegistry()
+
+    def failing():
+        raise ValueError("collector bug")
+
+    registry.add_collector('broken', failing)
+    registry.add_collector('working', lambda: [("jopertube_other", "gauge", "Other", [])])
+
+    assert [family[0] for family in registry.collect()] == ["jopertube_other"]
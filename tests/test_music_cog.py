@@ -0,0 +1,46 @@
+# Tests for the music cog's use of guild players
+import asyncio
+import types
+
+import pytest
+
+from benchmarks.fakes import FakeContext, FakeGuild
+from cogs.music import Music
+
+@pytest.fixture
+def cog(fake_ytdl, tmp_path):
+    cog = Music(types.SimpleNamespace(cookie_file=str(tmp_path / "cookies.txt")))
+    yield cog
+    cog.prefetcher.cancel_all()
+    cog.downloader.close()
+
+def test_read_only_commands_create_no_player(cog):
+    async def run():
+        ctx = FakeContext(FakeGuild(1), song_seconds=1)
+        await cog.queue.callback(cog, ctx)
+        await cog.nowplaying.callback(cog, ctx)
+        await cog.profile.callback(cog, ctx)
+        for command in (cog.skip, cog.pause, cog.resume, cog.stop, cog.shuffle):
+            await command.callback(cog, ctx)
+        await cog.remove.callback(cog, ctx, 1)
+        await cog.move.callback(cog, ctx, 1, 2)
+        await cog.leave.callback(cog, ctx)
+
+        assert cog.players == {}
+        assert ctx.channel.sent == 11
+
+    asyncio.run(run())
+
+def test_settings_survive_without_a_player(cog):
+    async def run():
+        ctx = FakeContext(FakeGuild(1), song_seconds=1)
+        cog.saved_settings[1] = (0.2, False, "low-cpu")
+        assert cog.guild_settings(1) == (0.2, False, "low-cpu")
+
+        await cog.profile.callback(cog, ctx, "high-quality")
+
+        player = cog.players[1]
+        assert (player.volume, player.normalize, player.profile) == (0.2, False, "high-quality")
+        player.close()
+
+    asyncio.run(run())
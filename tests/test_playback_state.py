@@ -0,0 +1,101 @@
+# Tests for the versioned per-guild playback registry
+import threading
+
+from utils.playback_state import EMPTY_PLAYBACK, PlaybackRegistry, PlaybackSnapshot
+
+def test_update_merges_fields_and_bumps_the_version():
+    registry = PlaybackRegistry()
+    registry.update(1, title="Song", start_time=100.0, duration=180)
+    state = registry.update(1, paused_at=130.0)
+
+    assert registry.version == 2
+    assert state.version == 2
+    assert (state.title, state.start_time, state.paused_at) == ("Song", 100.0, 130.0)
+    assert registry.get(1) is state
+
+def test_snapshots_are_never_changed_in_place():
+    registry = PlaybackRegistry()
+    before = registry.update(1, title="Song")
+    version, states = registry.snapshot()
+
+    registry.update(1, title="Other song")
+    registry.update(2, title="Elsewhere")
+
+    assert before.title == "Song"
+    assert list(states) == [1]
+    assert registry.snapshot()[0] == version + 2
+
+def test_changed_since():
+    registry = PlaybackRegistry()
+    seen = registry.version
+    assert not registry.changed_since(seen)
+
+    registry.update(1, title="Song")
+    assert registry.changed_since(seen)
+    assert not registry.changed_since(registry.version)
+
+def test_clear_only_bumps_the_version_for_known_guilds():
+    registry = PlaybackRegistry()
+    registry.update(1, title="Song")
+
+    registry.clear(2)
+    assert registry.version == 1
+
+    registry.clear(1)
+    assert registry.version == 2
+    assert registry.get(1) is None
+    assert registry.latest() is None
+
+def test_latest_is_the_most_recently_started_song():
+    registry = PlaybackRegistry()
+    registry.update(1, title="Older", start_time=100.0)
+    registry.update(2, title="Newer", start_time=200.0)
+    registry.update(1, paused_at=250.0)
+
+    assert registry.latest().title == "Newer"
+
+def test_listeners_run_after_changes_and_their_errors_are_contained():
+    registry = PlaybackRegistry()
+    versions = []
+
+    def failing():
+        raise ValueError("listener bug")
+
+    registry.add_listener(failing)
+    registry.add_listener(lambda: versions.append(registry.version))
+
+    registry.update(1, title="Song")
+    registry.clear(1)
+    registry.clear(1)  # Nothing to clear, nobody is told
+
+    assert versions == [1, 2]
+
+def test_concurrent_updates_lose_no_versions():
+    registry = PlaybackRegistry()
+
+    def writer(guild_id):
+        for index in range(500):
+            registry.update(guild_id, title=f"Song {index}")
+
+    threads = [threading.Thread(target=writer, args=(guild_id,)) for guild_id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.version == 2000
+    assert all(registry.get(guild_id).title == "Song 499" for guild_id in range(4))
+
+def test_elapsed_stops_while_paused_and_caps_at_the_duration():
+    state = PlaybackSnapshot(1, start_time=100.0, duration=180)
+
+    assert state.elapsed(now=130.0) == 30.0
+    assert state.elapsed(now=400.0) == 180
+    assert state.replace(1, paused_at=150.0).elapsed(now=400.0) == 50.0
+    assert PlaybackSnapshot(1).elapsed() == 0.0
+
+def test_empty_playback_matches_the_web_format():
+    assert EMPTY_PLAYBACK == {
+        'currently_playing': None, 'title': None, 'start_time': None,
+        'duration': None, 'guild_name': None, 'paused_at': None,
+    }
@@ -0,0 +1,300 @@
+# Tests for the per-guild playback actor
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeGuild, FakeVoiceChannel, video_info
+from utils.idle_scheduler import IdleScheduler
+from utils.playback_clock import PlaybackClock
+from utils.player import GuildPlayer
+from utils.prefetcher import Prefetcher
+from utils.track import Track
+
+FRAME = b"\x00" * 3840
+
+class FrameSource:
+    """An audio source that delivers silent frames until its frames run out"""
+
+    def __init__(self, frames=0):
+        self.frames = frames
+        self.volume = 1.0
+
+    def read(self):
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        return FRAME
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        pass
+
+class RecordingChannel:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content)
+
+def make_track(index=0, duration=180):
+    video_id = f"vid{index:08d}"
+    return Track(
+        f"https://www.youtube.com/watch?v={video_id}", video_id=video_id, title=f"Song {index}",
+        duration=duration, stream_url=video_info(video_id)['url'], expires_at=time.time() + 6 * 3600
+    )
+
+def endless_source(player, track, local_path, start_at):
+    """Replacement for GuildPlayer._create_source that starts no ffmpeg process"""
+    return FrameSource(frames=10 ** 6), local_path or track.stream_url
+
+async def make_player(downloader, monkeypatch):
+    """A started player in a guild whose voice client never ends songs on its own"""
+    guild = FakeGuild(1)
+    await FakeVoiceChannel(guild, song_seconds=3600).connect()
+    monkeypatch.setattr(GuildPlayer, '_create_source', endless_source)
+    player = GuildPlayer(guild, downloader, Prefetcher(downloader), IdleScheduler(None, 300), "ffmpeg")
+    player.start()
+    return player
+
+async def settle(player):
+    """Let the player handle every event posted so far"""
+    await asyncio.sleep(0)
+    await player.submit('set_volume', player.volume)
+
+def test_clock_counts_delivered_frames_only():
+    clock = PlaybackClock(offset=30.0)
+    source = clock.attach(FrameSource(frames=100))
+
+    for _ in range(150):
+        source.read()
+
+    assert clock.frames == 100
+    assert clock.elapsed() == pytest.approx(32.0)
+
+def test_clock_keeps_source_attributes():
+    source = FrameSource()
+    assert PlaybackClock().attach(source) is source
+    source.volume = 0.3
+    assert source.volume == 0.3
+
+def test_failed_stream_resumes_at_the_played_position(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        player.channel = RecordingChannel()
+        await player.submit('enqueue', [make_track()], player.channel)
+        voice_client = player.voice_client
+        for _ in range(500):
+            voice_client.source.read()
+
+        voice_client._finish()  # ffmpeg exited 10 seconds into a 3 minute song
+        await settle(player)
+
+        assert player.state == GuildPlayer.PLAYING
+        assert player.clock.offset == pytest.approx(10.0)
+        assert voice_client.songs_started == 2
+        assert fake_ytdl.calls['video'] == 1  # The failed URL was replaced
+        player.close()
+
+    asyncio.run(run())
+
+def test_failed_stream_of_unknown_length_is_not_resumed(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        player.channel = RecordingChannel()
+        await player.submit('enqueue', [make_track(0, duration=None), make_track(1)], player.channel)
+        voice_client = player.voice_client
+        for _ in range(500):
+            voice_client.source.read()
+
+        after, voice_client._after = voice_client._after, None
+        voice_client._finish()
+        after(RuntimeError("stream ended"))  # A live stream that failed
+        await settle(player)
+
+        assert player.current.title == "Song 1"
+        assert fake_ytdl.calls['video'] == 0
+        assert not any("resuming" in message for message in player.channel.messages)
+        player.close()
+
+    asyncio.run(run())
+
+def test_missing_duration_stays_unknown(downloader):
+    assert downloader._parse_audio_info({'url': "https://example.com/live", 'title': "Live"})[2] is None
+
+def test_disconnect_goes_idle_without_resuming(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        player.channel = RecordingChannel()
+        await player.submit('enqueue', [make_track(0), make_track(1)], player.channel)
+
+        await player.voice_client.disconnect()  # Kicked from the voice channel
+        await settle(player)
+
+        assert player.state == GuildPlayer.IDLE
+        assert player.current is None
+        assert len(player.queue) == 1  # Kept for the next play command
+        assert fake_ytdl.calls['video'] == 0
+        assert not any("Error" in message for message in player.channel.messages)
+        player.close()
+
+    asyncio.run(run())
+
+def test_song_played_to_the_end_moves_on(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        await player.submit('enqueue', [make_track(0, duration=1), make_track(1, duration=1)], None)
+        voice_client = player.voice_client
+        for _ in range(50):
+            voice_client.source.read()
+
+        voice_client._finish()
+        await settle(player)
+
+        assert player.current.title == "Song 1"
+        assert player.clock.offset == 0
+        assert fake_ytdl.calls['video'] == 0
+        player.close()
+
+    asyncio.run(run())
+
+def test_stale_track_end_is_ignored(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        await player.submit('enqueue', [make_track(0), make_track(1), make_track(2)], None)
+        stale = player._generation
+
+        assert await player.submit('skip')
+        player._post_event('track_end', None, stale)  # The skipped song's callback
+        await settle(player)
+
+        assert player.current.title == "Song 1"
+        assert len(player.queue) == 1
+        player.close()
+
+    asyncio.run(run())
+
+def test_skip_and_stop_change_state(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        assert not await player.submit('skip')
+
+        await player.submit('enqueue', [make_track(0), make_track(1)], None)
+        assert player.state == GuildPlayer.PLAYING
+        assert await player.submit('pause')
+        assert player.state == GuildPlayer.PAUSED
+        assert await player.submit('resume')
+
+        assert await player.submit('stop')
+        await settle(player)
+        assert player.state == GuildPlayer.IDLE
+        assert player.queue.is_empty()
+        assert player.voice_client.songs_started == 1
+        player.close()
+
+    asyncio.run(run())
+
+def test_queue_edits_go_through_the_inbox(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        await player.submit('enqueue', [make_track(index) for index in range(5)], None)
+
+        assert (await player.submit('remove', 1)).title == "Song 2"
+        assert await player.submit('remove', 4) is None
+        assert (await player.submit('move', 0, 2)).title == "Song 1"
+        assert await player.submit('move', 0, 3) is None
+        assert [track.title for track in player.queue] == ["Song 3", "Song 4", "Song 1"]
+
+        assert await player.submit('shuffle') == 3
+        assert sorted(track.title for track in player.queue) == ["Song 1", "Song 3", "Song 4"]
+        player.close()
+
+    asyncio.run(run())
+
+def test_settings_apply_from_the_next_song(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        await player.submit('enqueue', [make_track(0), make_track(1)], None)
+
+        await player.submit('set_normalize', False)
+        await player.submit('set_profile', "low-cpu")
+
+        assert (player.normalize, player.profile) == (False, "low-cpu")
+        player.close()
+
+    asyncio.run(run())
+
+def test_closed_player_rejects_commands(downloader, fake_ytdl, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        player.close()
+
+        with pytest.raises(RuntimeError):
+            await player.submit('skip')
+
+    asyncio.run(run())
+
+def test_close_cancels_the_command_being_handled(downloader, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        started = asyncio.Event()
+
+        async def block():
+            started.set()
+            await asyncio.Event().wait()
+
+        player._on_block = block
+        caller = asyncio.create_task(player.submit('block'))
+        await started.wait()
+        player.close()
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, 1)
+
+    asyncio.run(run())
+
+def test_cancelled_shared_task_does_not_end_the_player(downloader, monkeypatch):
+    async def run():
+        player = await make_player(downloader, monkeypatch)
+        shared = asyncio.get_running_loop().create_future()
+
+        async def wait_for_shared():
+            return await shared
+
+        player._on_wait = wait_for_shared
+        caller = asyncio.create_task(player.submit('wait'))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        shared.cancel()
+
+        with pytest.raises(RuntimeError):
+            await caller
+        assert await player.submit('skip') is False  # Still handling commands
+        player.close()
+
+    asyncio.run(run())
+
+def test_events_posted_to_a_full_inbox_are_kept(downloader, monkeypatch):
+    async def run():
+        guild = FakeGuild(1)
+        player = GuildPlayer(guild, downloader, Prefetcher(downloader), IdleScheduler(None, 300), "ffmpeg")
+        handled = []
+
+        async def note(value):
+            handled.append(value)
+
+        player._on_note = note
+        for value in range(player._inbox.maxsize):
+            player._post_event('note', value)
+        player._post_event('note', "overflow")
+        assert len(player._pending_events) == 1
+
+        player.start()
+        await settle(player)
+        assert handled[-1] == "overflow"
+        assert not player._pending_events
+        player.close()
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+# Tests for queueing whole playlists from one flat extraction
+import asyncio
+
+import pytest
+
+from utils.youtube import is_playlist_url
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PLfixture"
+
+@pytest.mark.parametrize("url, expected", [
+    (PLAYLIST, True),
+    ("youtube.com/playlist?list=PLfixture", True),
+    ("https://music.youtube.com/playlist?list=PLfixture", True),
+    ("https://www.youtube.com/watch?v=aaaaaaaaaaa&list=PLfixture", False),
+    ("https://www.youtube.com/watch?v=aaaaaaaaaaa", False),
+    ("https://example.com/playlist?list=PLfixture", False),
+    ("https://notyoutube.com/playlist?list=PLfixture", False),
+    ("song [official video]", False),
+    ("[live] song", False),
+    ("song [live", False),
+    ("youtube.com song [live", False),
+])
+def test_is_playlist_url(url, expected):
+    assert is_playlist_url(url) is expected
+
+def test_playlist_is_one_extraction_with_unresolved_tracks(downloader, fake_ytdl):
+    title, tracks = asyncio.run(downloader.get_playlist_tracks(PLAYLIST, requester="user", guild_id=1))
+
+    assert fake_ytdl.calls == {'playlist': 1}
+    assert title == "Fixture playlist PLfixture"
+    assert len(tracks) == 25
+    assert len({track.video_id for track in tracks}) == 25
+    track = tracks[0]
+    assert track.requester == "user" and track.duration == 180 and track.title
+    assert not track.is_resolved()
+
+def test_playlist_entries_without_ids_are_skipped(downloader, fake_ytdl):
+    fake_ytdl.fixtures[PLAYLIST] = {
+        'title': "Mixed",
+        'entries': [
+            {'id': 'aaaaaaaaaaa', 'title': "Kept", 'duration': 'unknown'},
+            {'title': "Deleted video"},
+            None,
+            {'id': 'bbbbbbbbbbb', 'title': "Also kept", 'duration': 200.0,
+             'url': "https://www.youtube.com/watch?v=bbbbbbbbbbb"},
+        ],
+    }
+    title, tracks = asyncio.run(downloader.get_playlist_tracks(PLAYLIST))
+
+    assert title == "Mixed"
+    assert [track.video_id for track in tracks] == ['aaaaaaaaaaa', 'bbbbbbbbbbb']
+    assert tracks[0].duration is None
+    assert tracks[0].url == "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+    assert tracks[1].duration == 200.0
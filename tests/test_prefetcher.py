@@ -0,0 +1,60 @@
+# Tests for background resolution of upcoming queue entries
+import asyncio
+import time
+
+from benchmarks.fakes import video_info
+from utils.prefetcher import Prefetcher
+from utils.queue_manager import QueueManager
+from utils.track import Track
+
+URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+def expiring_url(seconds):
+    return f"https://rr1---sn-fixture.googlevideo.com/videoplayback?id=aaaaaaaaaaa&expire={int(time.time() + seconds)}"
+
+def prefetch(downloader, *tracks, margin=1800):
+    async def run():
+        queue = QueueManager()
+        queue.extend(tracks)
+        prefetcher = Prefetcher(downloader, depth=3, refresh_margin=margin)
+        prefetcher.schedule(1, queue)
+        await asyncio.gather(*prefetcher._tasks.values())
+
+    asyncio.run(run())
+
+def test_expiring_url_is_re_resolved_past_the_metadata_cache(downloader, fake_ytdl):
+    # The cache still serves this URL: it expires in 15 minutes, after the 5 minute margin
+    stale = (expiring_url(900), "Song", 180)
+    downloader._cache_audio_info("aaaaaaaaaaa", "aaaaaaaaaaa", stale)
+    track = Track(URL, video_id="aaaaaaaaaaa", stream_url=stale[0], expires_at=time.time() + 900)
+
+    prefetch(downloader, track)
+
+    assert fake_ytdl.calls['video'] == 1
+    assert not track.needs_refresh(1800)
+
+def test_unresolved_track_served_an_expiring_url_is_forced(downloader, fake_ytdl):
+    downloader._cache_audio_info("aaaaaaaaaaa", "aaaaaaaaaaa", (expiring_url(900), "Song", 180))
+    track = Track(URL, video_id="aaaaaaaaaaa")
+
+    prefetch(downloader, track)
+
+    assert fake_ytdl.calls['video'] == 1
+    assert not track.needs_refresh(1800)
+
+def test_fresh_tracks_are_left_alone(downloader, fake_ytdl):
+    info = video_info("aaaaaaaaaaa")
+    track = Track(URL, video_id="aaaaaaaaaaa", stream_url=info['url'], expires_at=time.time() + 6 * 3600)
+
+    prefetch(downloader, track)
+
+    assert fake_ytdl.calls['video'] == 0
+
+def test_unresolved_tracks_use_the_cache(downloader, fake_ytdl):
+    downloader._cache_audio_info("aaaaaaaaaaa", "aaaaaaaaaaa", (expiring_url(6 * 3600), "Song", 180))
+    track = Track(URL, video_id="aaaaaaaaaaa")
+
+    prefetch(downloader, track)
+
+    assert fake_ytdl.calls['video'] == 0
+    assert track.title == "Song"
@@ -0,0 +1,89 @@
+# Tests for the guild queue
+import random
+
+import pytest
+
+from utils.queue_manager import QueueManager
+
+def filled(size):
+    queue = QueueManager()
+    queue.extend(range(size))
+    return queue
+
+def test_get_next_is_fifo_and_empties():
+    queue = filled(3)
+    queue.add(3)
+    assert [queue.get_next() for _ in range(4)] == [0, 1, 2, 3]
+    assert queue.get_next() is None
+    assert queue.is_empty() and len(queue) == 0 and queue.peek() is None
+
+def test_positions_follow_the_head_after_songs_are_taken():
+    queue = filled(10)
+    queue.get_next()
+    queue.get_next()
+    assert queue.peek() == 2
+    assert queue.view(0, 3) == [2, 3, 4]
+    assert queue.remove(0) == 2
+    assert queue.remove(-1) == 9
+    queue.insert(1, 'x')
+    assert queue.get_queue() == [3, 'x', 4, 5, 6, 7, 8]
+    assert list(queue) == queue.get_queue()
+
+def test_compaction_keeps_order_and_releases_taken_items():
+    size = QueueManager.COMPACT_THRESHOLD * 3
+    queue = filled(size)
+    for expected in range(size - 5):
+        assert queue.get_next() == expected
+    assert queue.get_queue() == list(range(size - 5, size))
+    # Everything taken was either compacted away or cleared to None
+    assert sum(item is not None for item in queue._queue) == 5
+
+def test_insert_clamps_to_bounds():
+    queue = filled(3)
+    queue.insert(100, 'end')
+    queue.insert(-100, 'start')
+    queue.insert(-1, 'before last')
+    assert queue.get_queue() == ['start', 0, 1, 2, 'before last', 'end']
+
+@pytest.mark.parametrize("index", [3, -4, 100])
+def test_remove_out_of_range_raises(index):
+    queue = filled(4)
+    queue.get_next()
+    with pytest.raises(IndexError):
+        queue.remove(index)
+    assert queue.get_queue() == [1, 2, 3]
+
+def test_move():
+    queue = filled(5)
+    assert queue.move(0, 3) == 0
+    assert queue.get_queue() == [1, 2, 3, 0, 4]
+    assert queue.move(4, 0) == 4
+    assert queue.get_queue() == [4, 1, 2, 3, 0]
+
+def test_shuffle_keeps_items_and_works_in_place():
+    random.seed(0)
+    queue = filled(50)
+    queue.get_next()
+    storage = queue._queue
+    queue.shuffle()
+    assert queue._queue is storage
+    assert sorted(queue.get_queue()) == list(range(1, 50))
+    assert queue.get_queue() != list(range(1, 50))
+
+def test_view_and_page():
+    queue = filled(25)
+    assert queue.view(20, 10) == [20, 21, 22, 23, 24]
+    assert queue.view(30, 10) == []
+    assert queue.view(0, 0) == []
+    assert queue.page(3) == ([20, 21, 22, 23, 24], 3, 3)
+    assert queue.page(99) == ([20, 21, 22, 23, 24], 3, 3)
+    assert queue.page(0)[1] == 1
+    assert QueueManager().page(1) == ([], 1, 1)
+
+def test_clear():
+    queue = filled(5)
+    queue.get_next()
+    queue.clear()
+    assert queue.is_empty()
+    queue.add('a')
+    assert queue.get_queue() == ['a']
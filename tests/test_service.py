@@ -0,0 +1,31 @@
+# Tests for the bot service's socket protocol
+import threading
+
+import pytest
+
+from service import BotServiceClient, BotServiceServer
+
+class BrokenController:
+    def status(self):
+        return {'running': True, 'status': "Running", 'error': None, 'workers': []}
+
+    def metrics(self):
+        raise KeyError("music")
+
+@pytest.fixture
+def client(tmp_path):
+    path = str(tmp_path / "bot.sock")
+    server = BotServiceServer(BrokenController(), path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield BotServiceClient(path, timeout=2)
+    server.shutdown()
+    server.server_close()
+
+def test_results_are_passed_through(client):
+    assert client.status()['status'] == "Running"
+
+def test_controller_failures_raise_in_the_client(client):
+    with pytest.raises(RuntimeError, match="metrics failed"):
+        client.metrics()
+    assert client.is_available()  # The service keeps answering
@@ -0,0 +1,236 @@
+# On-disk cache of downloaded audio files
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class AudioCache:
+    """
+    Size-bounded directory of downloaded tracks, one Opus/WebM file per video ID
+
+    Files are downloaded into a staging directory and moved into place with
+    os.replace, so a file in the cache directory is always complete. When the
+    byte budget is exceeded the least frequently played file is evicted, with
+    the least recently played one losing ties.
+    """
+
+    STAGING_DIR = '.incoming'
+    MAX_TRACKED_REQUESTS = 10000
+
+    def __init__(self, directory, max_bytes):
+        """
+        Initialize the cache and index the files already on disk
+
+        Args:
+            directory (str): Directory holding the cached files
+            max_bytes (int): Total size budget for cached files
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.staging_directory = os.path.join(directory, self.STAGING_DIR)
+        self._lock = threading.Lock()
+        self._entries = {}  # video_id -> {'path', 'size', 'hits', 'last_access'}
+        self._downloading = set()
+        self.requests = Counter()  # video_id -> times requested, used to pick what to cache
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Anything left in staging is from an interrupted download
+        shutil.rmtree(self.staging_directory, ignore_errors=True)
+        os.makedirs(self.staging_directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Index files left by a previous run"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            video_id = os.path.splitext(name)[0]
+            self._entries[video_id] = {
+                'path': path,
+                'size': stat.st_size,
+                'hits': 0,
+                'last_access': stat.st_mtime,
+            }
+        self._evict()
+        logger.info(f"Audio cache has {len(self._entries)} files ({self.total_bytes() / 1e6:.1f} MB)")
+
+    def total_bytes(self):
+        """
+        Get the size of all cached files
+
+        Returns:
+            int: Total size in bytes
+        """
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def get(self, video_id):
+        """
+        Get the local file for a video and count it as played
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            str: Path to the cached file, or None if the video isn't cached
+        """
+        with self._lock:
+            entry = self._entries.get(video_id) if video_id else None
+            if entry is None or not os.path.exists(entry['path']):
+                if entry is not None:
+                    del self._entries[video_id]
+                self.misses += 1
+                return None
+            entry['hits'] += 1
+            entry['last_access'] = time.time()
+            self.hits += 1
+            return entry['path']
+
+    def peek(self, video_id):
+        """
+        Get the local file for a video without counting it as played
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            str: Path to the cached file, or None if the video isn't cached
+        """
+        entry = self._entries.get(video_id) if video_id else None
+        return entry['path'] if entry is not None else None
+
+    def __contains__(self, video_id):
+        return video_id in self._entries
+
+    def record_request(self, video_id):
+        """
+        Count a request for a video, making it a candidate for caching
+
+        Args:
+            video_id (str): YouTube video ID
+        """
+        if video_id:
+            self.requests[video_id] += 1
+            # Keep the popularity table bounded by forgetting the long tail
+            if len(self.requests) > self.MAX_TRACKED_REQUESTS:
+                self.requests = Counter(dict(self.requests.most_common(self.MAX_TRACKED_REQUESTS // 2)))
+
+    def popular(self, min_requests, limit):
+        """
+        Get frequently requested videos that aren't cached yet
+
+        Args:
+            min_requests (int): Minimum number of requests
+            limit (int): Maximum number of video IDs to return
+
+        Returns:
+            list: Video IDs, most requested first
+        """
+        return [
+            video_id for video_id, count in self.requests.most_common()
+            if count >= min_requests and video_id not in self._entries
+        ][:limit]
+
+    def begin_download(self, video_id):
+        """
+        Claim a video for downloading so it isn't fetched twice at once
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            bool: True if the caller should download it
+        """
+        with self._lock:
+            if video_id in self._entries or video_id in self._downloading:
+                return False
+            self._downloading.add(video_id)
+            return True
+
+    def finish_download(self, video_id, staged_path):
+        """
+        Atomically move a completed download into the cache and enforce the budget
+
+        Must be called after begin_download, also when the download failed
+        (with staged_path None).
+
+        Args:
+            video_id (str): YouTube video ID
+            staged_path (str): Path of the downloaded file in the staging directory, or None
+
+        Returns:
+            str: Path of the cached file, or None
+        """
+        try:
+            if not staged_path or not os.path.exists(staged_path):
+                return None
+
+            extension = os.path.splitext(staged_path)[1]
+            path = os.path.join(self.directory, f"{video_id}{extension}")
+            os.replace(staged_path, path)
+            size = os.path.getsize(path)
+
+            with self._lock:
+                self._entries[video_id] = {
+                    'path': path,
+                    'size': size,
+                    'hits': 0,
+                    'last_access': time.time(),
+                }
+                self._evict(keep=video_id)
+            logger.info(f"Cached audio for {video_id} ({size / 1e6:.1f} MB)")
+            return path if video_id in self._entries else None
+        finally:
+            with self._lock:
+                self._downloading.discard(video_id)
+
+    def _evict(self, keep=None):
+        """Remove the least valuable files until the cache fits its byte budget"""
+        total = self.total_bytes()
+        while total > self.max_bytes and self._entries:
+            candidates = [video_id for video_id in self._entries if video_id != keep]
+            if not candidates:
+                # A single file larger than the whole budget isn't worth keeping
+                candidates = [keep]
+            victim = min(
+                candidates,
+                key=lambda video_id: (self._entries[video_id]['hits'], self._entries[video_id]['last_access'])
+            )
+            entry = self._entries.pop(victim)
+            total -= entry['size']
+            self.evictions += 1
+            try:
+                # Safe even if ffmpeg is still reading it: the open handle stays valid
+                os.remove(entry['path'])
+            except OSError as e:
+                logger.warning(f"Failed to remove cached audio {entry['path']}: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            dict: File count, bytes used, hit/miss and eviction counters
+        """
+        return {
+            'files': len(self._entries),
+            'bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'downloading': len(self._downloading),
+        }
@@ -0,0 +1,223 @@
+# Audio processing stage applied to decoded PCM before it is sent to Discord
+import logging
+import re
+import subprocess
+import discord
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, the legacy PCMVolumeTransformer is used without it
+    np = None
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Set once the missing-NumPy fallback has been reported
+_warned_fallback = False
+
+# Integrated loudness line from ffmpeg's ebur128 summary, e.g. "    I:         -9.3 LUFS"
+_INTEGRATED_LOUDNESS_RE = re.compile(r'I:\s+(-?\d+(?:\.\d+)?) LUFS')
+# True peak line from the same summary with peak=true, e.g. "    Peak:       -0.6 dBFS"
+_TRUE_PEAK_RE = re.compile(r'Peak:\s+(-?(?:\d+(?:\.\d+)?|inf)) dBFS')
+
+# Level where the soft limiter starts bending peaks: -1 dBFS
+LIMITER_THRESHOLD = 32767 * 10 ** (-1 / 20)
+
+def soft_limit(samples, threshold=LIMITER_THRESHOLD):
+    """
+    Bend samples above the threshold smoothly towards full scale instead of clipping them
+
+    Samples below the threshold are untouched. Above it, a tanh knee maps
+    any level into the remaining headroom, so the output never exceeds
+    16-bit full scale and loud peaks are rounded off rather than squared.
+
+    Args:
+        samples (numpy.ndarray): float32 samples on the 16-bit scale, modified in place
+
+    Returns:
+        numpy.ndarray: The same array
+    """
+    magnitude = np.abs(samples)
+    over = magnitude > threshold
+    headroom = 32767 - threshold
+    limited = threshold + headroom * np.tanh((magnitude[over] - threshold) / headroom)
+    samples[over] = np.copysign(limited, samples[over])
+    return samples
+
+class GainProcessor(discord.AudioSource):
+    """
+    Applies volume and a precomputed per-track loudness gain to whole 20 ms frames with NumPy
+
+    Volume changes are ramped linearly over a few frames so they don't click.
+    Frames pushed above -1 dBFS by the gain go through soft_limit() rather
+    than being clipped. loudness_gain() already keeps boosts below the
+    measured true peak, so the limiter only acts on passages louder than the
+    analysed part of the track.
+    """
+
+    def __init__(self, original, volume=1.0, gain_db=0.0, ramp_frames=10):
+        """
+        Wrap a PCM audio source
+
+        Args:
+            original (discord.AudioSource): 16-bit 48 kHz stereo PCM source
+            volume (float): Initial volume between 0 and 1
+            gain_db (float): Loudness correction for the track in decibels
+            ramp_frames (int): Frames over which a volume change is spread
+        """
+        if original.is_opus():
+            raise discord.ClientException("GainProcessor requires a PCM source")
+        self.original = original
+        self.track_gain = 10 ** (gain_db / 20)
+        self.ramp_frames = max(1, ramp_frames)
+        self._volume = volume
+        self._current = volume * self.track_gain
+        self._step = 0.0
+
+    @property
+    def volume(self):
+        """The volume between 0 and 1, excluding the track's loudness gain"""
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(value, 0.0)
+        self._step = (self._volume * self.track_gain - self._current) / self.ramp_frames
+
+    def read(self):
+        data = self.original.read()
+        if not data:
+            return data
+
+        target = self._volume * self.track_gain
+        if self._step == 0.0 and self._current == 1.0:
+            return data
+
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        if self._step != 0.0:
+            # Ramp from the current gain towards the target across this frame
+            end = self._current + self._step
+            if (self._step > 0 and end >= target) or (self._step < 0 and end <= target):
+                end = target
+                self._step = 0.0
+            ramp = np.linspace(self._current, end, len(samples) // 2, endpoint=False, dtype=np.float32)
+            samples *= np.repeat(ramp, 2)
+            self._current = end
+        else:
+            samples *= self._current
+
+        if self._current > 1.0 or self._step > 0.0:
+            # Only a boost can push samples past full scale
+            if np.abs(samples).max() > LIMITER_THRESHOLD:
+                soft_limit(samples)
+        return samples.astype(np.int16).tobytes()
+
+    def cleanup(self):
+        # Unset if __init__ rejected the source
+        original = getattr(self, 'original', None)
+        if original is not None:
+            original.cleanup()
+
+def create_processor(source, volume, gain_db=None, backend='numpy'):
+    """
+    Wrap a PCM source in the configured processing stage
+
+    Uses GainProcessor for the 'numpy' backend when NumPy is installed,
+    otherwise discord.py's PCMVolumeTransformer with the loudness gain folded
+    into the volume.
+
+    Args:
+        source (discord.AudioSource): PCM source to wrap
+        volume (float): Volume between 0 and 1
+        gain_db (float): Precomputed loudness gain, or None for no correction
+        backend (str): 'numpy' or 'legacy'
+
+    Returns:
+        discord.AudioSource: Source with a settable volume attribute
+    """
+    global _warned_fallback
+    if backend == 'numpy':
+        if np is not None:
+            return GainProcessor(source, volume=volume, gain_db=gain_db or 0.0)
+        if not _warned_fallback:
+            _warned_fallback = True
+            logger.warning(
+                "AUDIO_PROCESSING is 'numpy' but NumPy is not installed, using PCMVolumeTransformer: "
+                "volume changes won't be ramped and loudness gain only applies at the initial volume"
+            )
+    return discord.PCMVolumeTransformer(source, volume=volume * 10 ** ((gain_db or 0.0) / 20))
+
+def measure_loudness(source, ffmpeg_path, seconds=60, before_options=(), timeout=None):
+    """
+    Measure the integrated loudness and true peak of the start of a track with ffmpeg's ebur128 filter
+
+    Blocking; run it on a worker thread.
+
+    Args:
+        source (str): Stream URL or local file
+        ffmpeg_path (str): ffmpeg executable
+        seconds (int): Amount of audio to analyse
+        before_options (tuple): Extra ffmpeg input options
+        timeout (float): Seconds before ffmpeg is killed, by default three times
+            the analysed duration since network reads can be slower than real time
+
+    Returns:
+        tuple: (integrated loudness in LUFS, true peak in dBTP or None), or
+            None if the loudness could not be measured
+    """
+    command = [
+        ffmpeg_path, '-hide_banner', '-nostats', *before_options,
+        '-t', str(seconds), '-i', source,
+        '-vn', '-af', 'ebur128=framelog=quiet:peak=true', '-f', 'null', '-',
+    ]
+    try:
+        result = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            timeout=timeout or seconds * 3, check=False
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Loudness analysis failed: {e}")
+        return None
+
+    return parse_ebur128_summary(result.stderr.decode('utf-8', 'replace'))
+
+def parse_ebur128_summary(output):
+    """
+    Pick the integrated loudness and true peak out of ffmpeg's ebur128 log
+
+    Args:
+        output (str): ffmpeg's stderr
+
+    Returns:
+        tuple: (loudness in LUFS, true peak in dBTP or None), or None without a loudness
+    """
+    loudness = _INTEGRATED_LOUDNESS_RE.findall(output)
+    if not loudness:
+        return None
+    peaks = _TRUE_PEAK_RE.findall(output)
+    # The summary comes last, after any per-segment lines
+    return float(loudness[-1]), float(peaks[-1]) if peaks else None
+
+def loudness_gain(loudness, target=-14.0, max_gain=12.0, true_peak=None, ceiling=-1.0):
+    """
+    Convert a measured loudness into a ReplayGain-style correction
+
+    A boost is capped so the measured true peak stays at or below the
+    ceiling, like ReplayGain's clipping prevention: a quiet track with loud
+    transients is raised less than its loudness alone would ask for. Cuts
+    are never limited by the peak.
+
+    Args:
+        loudness (float): Integrated loudness in LUFS
+        target (float): Target loudness in LUFS
+        max_gain (float): Largest boost or cut in dB
+        true_peak (float): Measured true peak in dBTP, None if unknown
+        ceiling (float): Highest true peak a boost may produce, in dBTP
+
+    Returns:
+        float: Gain in dB
+    """
+    gain = max(-max_gain, min(max_gain, target - loudness))
+    if true_peak is not None and gain > 0:
+        gain = max(0.0, min(gain, ceiling - true_peak))
+    return gain
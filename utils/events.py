@@ -0,0 +1,138 @@
+# Server-sent events for the web interface
+import json
+import logging
+import queue
+import threading
+import time
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+def format_sse(event, data):
+    """
+    Encode one server-sent event
+
+    Args:
+        event (str): Event name
+        data (dict): JSON-serializable payload
+
+    Returns:
+        str: The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class EventBroadcaster:
+    """
+    Fans state changes out to every connected dashboard
+
+    Publishing an event whose payload equals the last one sent is a no-op, so
+    callers can publish whenever something might have changed. New
+    subscribers first receive the latest payload of every event. Each
+    subscriber has a small bounded queue; one that falls behind loses its
+    oldest events rather than holding memory or slowing the publisher.
+    """
+
+    def __init__(self, queue_size=16):
+        """
+        Initialize the broadcaster
+
+        Args:
+            queue_size (int): Events buffered per subscriber
+        """
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._latest = {}  # Event name -> last published payload
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event, data):
+        """
+        Send an event to every subscriber if its payload changed
+
+        Safe to call from any thread.
+
+        Args:
+            event (str): Event name
+            data (dict): JSON-serializable payload
+        """
+        with self._lock:
+            if self._latest.get(event) == data:
+                return
+            self._latest[event] = data
+            subscribers = list(self._subscribers)
+            self.published += 1
+
+        for subscriber in subscribers:
+            self._offer(subscriber, (event, data))
+
+    def _offer(self, subscriber, item):
+        """Queue an event for one subscriber, dropping its oldest event if it is full"""
+        while True:
+            try:
+                subscriber.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def subscribe(self):
+        """
+        Register a new subscriber, primed with the latest payload of every event
+
+        Returns:
+            queue.Queue: Queue of (event, data) tuples
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            for item in self._latest.items():
+                subscriber.put_nowait(item)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        """Get the number of connected subscribers"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, heartbeat=15):
+        """
+        Generate a text/event-stream response body for one client
+
+        Playback events get the server's current time added, so the client
+        can correct for clock differences when interpolating progress.
+
+        Args:
+            heartbeat (float): Seconds between keep-alive comments while idle
+
+        Yields:
+            str: Encoded events
+        """
+        subscriber = self.subscribe()
+        try:
+            # Reconnect quickly if the connection drops
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == 'playback':
+                    data = dict(data, server_time=time.time())
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(subscriber)
+
+# Shared by the bot and the web server in the same process
+broadcaster = EventBroadcaster()
@@ -0,0 +1,223 @@
+# Dedicated executor for blocking yt-dlp extractions
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import EXTRACTION_WAIT_SECONDS
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class _Job:
+    """A pending extraction"""
+
+    __slots__ = ('func', 'args', 'guild_id', 'priority', 'future', 'enqueued_at')
+
+    def __init__(self, func, args, guild_id, priority, future):
+        self.func = func
+        self.args = args
+        self.guild_id = guild_id
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class ExtractionScheduler:
+    """
+    Runs blocking extraction work on its own bounded thread pool
+
+    Jobs are started in priority order, so playback-critical resolves jump ahead
+    of prefetching and display-only lookups. Each guild may only occupy a
+    limited number of workers at once, so one busy guild cannot starve the rest.
+    All bookkeeping happens on the event loop thread.
+    """
+
+    PRIORITY_PLAYBACK = 0  # Something is waiting to start playing
+    PRIORITY_PREFETCH = 1  # Resolving upcoming queue entries in the background
+    PRIORITY_DISPLAY = 2   # Titles for queue listings and other display-only lookups
+    PRIORITY_BACKGROUND = 3  # Audio cache downloads and other work nobody is waiting for
+
+    LANE_NAMES = {
+        PRIORITY_PLAYBACK: 'playback',
+        PRIORITY_PREFETCH: 'prefetch',
+        PRIORITY_DISPLAY: 'display',
+        PRIORITY_BACKGROUND: 'background',
+    }
+
+    def __init__(self, workers=4, per_guild_limit=2, name="extraction"):
+        """
+        Initialize the scheduler
+
+        Args:
+            workers (int): Number of extraction threads
+            per_guild_limit (int): Maximum concurrent extractions for a single guild
+            name (str): Pool name for thread names and metrics
+        """
+        self.workers = workers
+        self.per_guild_limit = per_guild_limit
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lanes = {priority: deque() for priority in sorted(self.LANE_NAMES)}
+        self._active = 0
+        self._active_by_guild = {}
+        self._closed = False
+
+        # Statistics, per lane: [jobs started, total wait, max wait]
+        self._waits = {priority: [0, 0.0, 0.0] for priority in self.LANE_NAMES}
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, func, *args, guild_id=None, priority=PRIORITY_DISPLAY):
+        """
+        Run a blocking function on the extraction pool
+
+        Args:
+            func (callable): Blocking function to run
+            *args: Arguments for func
+            guild_id (int): Guild the work is for, used for the per-guild cap
+            priority (int): One of the PRIORITY_* constants
+
+        Returns:
+            The return value of func
+
+        Raises:
+            RuntimeError: If the scheduler was shut down, also for jobs still
+                waiting for a worker when it happens
+        """
+        if self._closed:
+            raise RuntimeError("Extraction scheduler is shut down")
+        loop = asyncio.get_running_loop()
+        job = _Job(func, args, guild_id, priority, loop.create_future())
+        self._lanes[priority].append(job)
+        self._dispatch()
+        return await job.future
+
+    def _dispatch(self):
+        """Start pending jobs while workers are free"""
+        while self._active < self.workers and not self._closed:
+            job = self._take_next()
+            if job is None:
+                return
+            self._start(job)
+
+    def _take_next(self):
+        """Remove and return the highest-priority job whose guild is under its cap"""
+        for lane in self._lanes.values():
+            skipped = []
+            job = None
+            while lane:
+                candidate = lane.popleft()
+                if candidate.future.done():
+                    # The caller gave up before the job started
+                    continue
+                if (candidate.guild_id is not None and
+                        self._active_by_guild.get(candidate.guild_id, 0) >= self.per_guild_limit):
+                    skipped.append(candidate)
+                    continue
+                job = candidate
+                break
+
+            # Put capped jobs back at the front in their original order
+            lane.extendleft(reversed(skipped))
+            if job is not None:
+                return job
+        return None
+
+    def _start(self, job):
+        """Hand a job to the thread pool"""
+        waited = time.monotonic() - job.enqueued_at
+        wait_stats = self._waits[job.priority]
+        wait_stats[0] += 1
+        wait_stats[1] += waited
+        wait_stats[2] = max(wait_stats[2], waited)
+        EXTRACTION_WAIT_SECONDS.observe(waited, pool=self.name, lane=self.LANE_NAMES[job.priority])
+
+        self._active += 1
+        if job.guild_id is not None:
+            self._active_by_guild[job.guild_id] = self._active_by_guild.get(job.guild_id, 0) + 1
+
+        loop = job.future.get_loop()
+        executor_future = loop.run_in_executor(self._executor, job.func, *job.args)
+        executor_future.add_done_callback(functools.partial(self._finished, job))
+
+    def _finished(self, job, executor_future):
+        """Release the job's worker and pass its outcome to the caller"""
+        self._active -= 1
+        if job.guild_id is not None:
+            remaining = self._active_by_guild.get(job.guild_id, 1) - 1
+            if remaining > 0:
+                self._active_by_guild[job.guild_id] = remaining
+            else:
+                self._active_by_guild.pop(job.guild_id, None)
+
+        if executor_future.cancelled():
+            job.future.cancel()
+        elif executor_future.exception() is not None:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(executor_future.exception())
+        else:
+            self.completed += 1
+            if not job.future.done():
+                job.future.set_result(executor_future.result())
+
+        self._dispatch()
+
+    def stats(self):
+        """
+        Get queue depth, saturation and wait-time statistics
+
+        Returns:
+            dict: Scheduler statistics
+        """
+        lanes = {}
+        for priority, name in self.LANE_NAMES.items():
+            started, total_wait, max_wait = self._waits[priority]
+            lanes[name] = {
+                'pending': len(self._lanes[priority]),
+                'started': started,
+                'avg_wait_ms': total_wait / started * 1000 if started else 0.0,
+                'max_wait_ms': max_wait * 1000,
+            }
+        return {
+            'workers': self.workers,
+            'active': self._active,
+            'active_guilds': len(self._active_by_guild),
+            'completed': self.completed,
+            'failed': self.failed,
+            'lanes': lanes,
+        }
+
+    def shutdown(self):
+        """
+        Stop the worker threads once running jobs finish
+
+        Jobs still waiting for a worker fail with RuntimeError, so their
+        callers don't wait forever for a worker that will never come.
+        """
+        self._closed = True
+        pending = [job for lane in self._lanes.values() for job in lane]
+        for lane in self._lanes.values():
+            lane.clear()
+        for job in pending:
+            _fail(job.future, RuntimeError("Extraction scheduler was shut down"))
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _fail(future, exception):
+    """Set an exception on a pending future from any thread"""
+    loop = future.get_loop()
+    if loop.is_closed():
+        return
+    try:
+        on_loop = asyncio.get_running_loop() is loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        _set_exception(future, exception)
+    else:
+        loop.call_soon_threadsafe(_set_exception, future, exception)
+
+def _set_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
@@ -0,0 +1,125 @@
+# Shared timer for disconnecting idle voice clients
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class IdleScheduler:
+    """
+    Disconnect deadlines for every guild, driven by a single task
+
+    Deadlines live in a heap; cancelling or re-arming a guild only replaces
+    its entry in a dict, and outdated heap entries are skipped when they come
+    up. Thousands of idle guilds cost one heap entry each instead of one
+    sleeping coroutine each.
+    """
+
+    def __init__(self, callback, timeout):
+        """
+        Initialize the scheduler
+
+        Args:
+            callback (callable): Coroutine function called with the guild ID when its deadline passes
+            timeout (float): Seconds a guild may stay idle
+        """
+        self.callback = callback
+        self.timeout = timeout
+        self._heap = []  # (deadline, sequence, guild_id)
+        self._deadlines = {}  # guild_id -> current deadline
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running_callbacks = set()  # Strong references until each callback finishes
+
+        # Statistics
+        self.fired = 0
+
+    def start(self):
+        """Start the timer task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop the timer task and forget all deadlines"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._heap.clear()
+        self._deadlines.clear()
+
+    def arm(self, guild_id, timeout=None):
+        """
+        Start or restart a guild's idle countdown
+
+        Args:
+            guild_id (int): Guild ID
+            timeout (float): Seconds until the callback runs, defaults to the scheduler's timeout
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        self._deadlines[guild_id] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), guild_id))
+
+        # Only the earliest deadline changes how long the task sleeps
+        if self._heap[0][2] == guild_id and self._heap[0][0] == deadline:
+            self._wakeup.set()
+        self._compact()
+
+    def cancel(self, guild_id):
+        """
+        Stop a guild's idle countdown
+
+        Args:
+            guild_id (int): Guild ID
+        """
+        if self._deadlines.pop(guild_id, None) is not None:
+            self._compact()
+
+    def is_armed(self, guild_id):
+        """Check if a guild has a pending deadline"""
+        return guild_id in self._deadlines
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def _compact(self):
+        """Rebuild the heap once outdated entries outnumber live ones"""
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._deadlines):
+            self._heap = [
+                entry for entry in self._heap
+                if self._deadlines.get(entry[2]) == entry[0]
+            ]
+            heapq.heapify(self._heap)
+
+    async def _run(self):
+        """Sleep until the earliest deadline, then fire every deadline that has passed"""
+        while True:
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.monotonic() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, guild_id = heapq.heappop(self._heap)
+                if self._deadlines.get(guild_id) != deadline:
+                    continue  # Cancelled or re-armed since
+                del self._deadlines[guild_id]
+                self.fired += 1
+                task = asyncio.create_task(self._fire(guild_id))
+                self._running_callbacks.add(task)
+                task.add_done_callback(self._running_callbacks.discard)
+
+    async def _fire(self, guild_id):
+        """Run the callback for one guild, keeping errors away from the timer task"""
+        try:
+            await self.callback(guild_id)
+        except Exception as e:
+            logger.error(f"Idle callback failed for guild {guild_id}: {e}")
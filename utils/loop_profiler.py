@@ -0,0 +1,249 @@
+# Opt-in profiler for callbacks that block the bot's event loop
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# asyncio's own Handle._run, restored when profiling stops
+_original_run = asyncio.events.Handle._run
+# Profiler currently installed, if any
+_active = None
+
+def active_profiler():
+    """
+    Get the profiler running in this process
+
+    Returns:
+        LoopProfiler: The profiler, or None if profiling is off
+    """
+    return _active
+
+def _profiled_run(handle):
+    """Replacement for Handle._run that times callbacks of the profiled loop"""
+    profiler = _active
+    if profiler is None or handle._loop is not profiler.loop:
+        return _original_run(handle)
+    return profiler._run_handle(handle)
+
+class LoopProfiler:
+    """
+    Finds the coroutines and callbacks that block the event loop
+
+    Every callback the loop runs, including each step of a task, is timed by
+    wrapping asyncio's Handle._run. A watchdog thread takes the loop thread's
+    stack while a callback is still running past the threshold. The report
+    therefore shows where the loop was stuck, not where the coroutine next
+    awaited. The same thread measures loop lag by scheduling no-op callbacks
+    and timing how long they wait.
+    """
+
+    def __init__(self, threshold=0.05, lag_interval=0.5, stack_depth=15, history=600):
+        """
+        Initialize the profiler
+
+        Args:
+            threshold (float): Seconds a callback may run before it counts as slow
+            lag_interval (float): Seconds between loop lag samples
+            stack_depth (int): Innermost frames kept per slow callback
+            history (int): Lag samples kept for percentiles
+        """
+        self.threshold = threshold
+        self.lag_interval = lag_interval
+        self.stack_depth = stack_depth
+        self.loop = None
+        self.started_at = None
+        self._loop_thread_id = None
+        self._current = None  # [handle, started, stack] of the running callback
+        self._offenders = {}  # Description -> stats dict
+        self._lag = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._watchdog = None
+
+        # Statistics
+        self.callbacks = 0
+        self.slow_callbacks = 0
+
+    def start(self):
+        """Start profiling the running event loop"""
+        global _active
+        if _active is not None:
+            # Left over from a bot that was stopped and started again
+            _active.stop()
+
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self._stopping.clear()
+        _active = self
+        asyncio.events.Handle._run = _profiled_run
+
+        self._watchdog = threading.Thread(target=self._watch, daemon=True, name="loop-profiler")
+        self._watchdog.start()
+        logger.info(f"Loop profiler started, reporting callbacks over {self.threshold * 1000:.0f} ms")
+
+    def stop(self):
+        """Stop profiling and restore asyncio's callback runner"""
+        global _active
+        if _active is self:
+            asyncio.events.Handle._run = _original_run
+            _active = None
+        self._stopping.set()
+
+    def _run_handle(self, handle):
+        """Run one callback, timing it"""
+        started = time.perf_counter()
+        current = self._current = [handle, started, None]
+        try:
+            return _original_run(handle)
+        finally:
+            duration = time.perf_counter() - started
+            self._current = None
+            self.callbacks += 1
+            if duration >= self.threshold:
+                self._record(handle, duration, current[2])
+
+    def _watch(self):
+        """Sample the stack of long-running callbacks and measure loop lag"""
+        interval = max(self.threshold / 2, 0.005)
+        next_lag_sample = time.perf_counter()
+        while not self._stopping.wait(interval):
+            if self.loop.is_closed():
+                self.stop()
+                return
+
+            current = self._current
+            if current is not None and current[2] is None and time.perf_counter() - current[1] >= self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    current[2] = self._format_stack(frame)
+
+            now = time.perf_counter()
+            if now >= next_lag_sample:
+                next_lag_sample = now + self.lag_interval
+                try:
+                    self.loop.call_soon_threadsafe(self._record_lag, now)
+                except RuntimeError:
+                    return  # The loop was closed
+
+    def _record_lag(self, scheduled_at):
+        self._lag.append(time.perf_counter() - scheduled_at)
+
+    def _format_stack(self, frame):
+        """Frames of the callback's own code, outermost first, as 'file:line in function' strings"""
+        summary = traceback.extract_stack(frame)
+        # Drop the event loop and profiler frames the callback runs under
+        for index in range(len(summary) - 1, -1, -1):
+            if summary[index].name == '_run' and summary[index].filename == asyncio.events.__file__:
+                summary = summary[index + 1:]
+                break
+        return [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in summary[-self.stack_depth:]]
+
+    @staticmethod
+    def describe(handle):
+        """
+        Name the code a callback runs, so repeated runs of it are grouped
+
+        Args:
+            handle (asyncio.Handle): The callback
+
+        Returns:
+            str: The task's coroutine for task steps, otherwise the callback's name
+        """
+        callback = handle._callback
+        owner = getattr(callback, '__self__', None)
+        if isinstance(owner, asyncio.Task):
+            coro = owner.get_coro()
+            return f"coroutine {getattr(coro, '__qualname__', repr(coro))}"
+        name = getattr(callback, '__qualname__', None)
+        if name is None:
+            return repr(callback)
+        module = getattr(callback, '__module__', None)
+        return f"{module}.{name}" if module else name
+
+    def _record(self, handle, duration, stack):
+        """Add a slow callback to its offender's statistics"""
+        description = self.describe(handle)
+        if stack is None:
+            # Finished before the watchdog looked: fall back to where the task is suspended now
+            owner = getattr(handle._callback, '__self__', None)
+            if isinstance(owner, asyncio.Task):
+                frames = owner.get_stack(limit=self.stack_depth)
+                stack = [f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name} (next await)"
+                         for frame in frames]
+
+        with self._lock:
+            self.slow_callbacks += 1
+            stats = self._offenders.get(description)
+            if stats is None:
+                stats = self._offenders[description] = {
+                    'callback': description, 'count': 0, 'total': 0.0, 'max': 0.0, 'stack': None,
+                }
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['last_seen'] = time.time()
+            if duration >= stats['max']:
+                stats['max'] = duration
+                stats['stack'] = stack or stats['stack']
+            elif stats['stack'] is None:
+                stats['stack'] = stack
+
+        logger.warning(f"Event loop blocked for {duration * 1000:.0f} ms by {description}")
+
+    def reset(self):
+        """Forget every recorded offender and lag sample"""
+        with self._lock:
+            self._offenders.clear()
+            self._lag.clear()
+            self.callbacks = 0
+            self.slow_callbacks = 0
+
+    def report(self, limit=10):
+        """
+        Summarize loop lag and the worst offenders
+
+        Args:
+            limit (int): Number of offenders to include
+
+        Returns:
+            dict: Threshold, lag percentiles in ms and the offenders with the
+                most total blocking time, each with its worst stack
+        """
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda stats: stats['total'], reverse=True)[:limit]
+            offenders = [
+                {
+                    'callback': stats['callback'],
+                    'count': stats['count'],
+                    'total_ms': stats['total'] * 1000,
+                    'max_ms': stats['max'] * 1000,
+                    'last_seen': stats['last_seen'],
+                    'stack': stats['stack'] or [],
+                }
+                for stats in offenders
+            ]
+            lag = sorted(self._lag)
+
+        def percentile(fraction):
+            return lag[min(len(lag) - 1, int(len(lag) * fraction))] * 1000 if lag else 0.0
+
+        return {
+            'enabled': True,
+            'threshold_ms': self.threshold * 1000,
+            'since': self.started_at,
+            'callbacks': self.callbacks,
+            'slow_callbacks': self.slow_callbacks,
+            'lag_ms': {
+                'p50': percentile(0.5),
+                'p99': percentile(0.99),
+                'max': lag[-1] * 1000 if lag else 0.0,
+                'samples': len(lag),
+            },
+            'offenders': offenders,
+        }
@@ -0,0 +1,146 @@
+# Persistent video metadata store backed by SQLite
+import logging
+import sqlite3
+import threading
+import time
+from utils.cache import TTLCache
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class MetadataStore:
+    """
+    Keeps video titles, durations and thumbnails across restarts
+
+    Stream URLs expire within hours, but a video's title and duration don't, so
+    they are stored on disk and the most recently seen ones are kept in a
+    bounded LRU in memory. Lookups are served from memory only; writes go to
+    SQLite and are meant to happen on worker threads, never on the event loop.
+    Entries not seen for ttl seconds are deleted at startup and then at most
+    once per PRUNE_INTERVAL by a write.
+    """
+
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path, ttl=30 * 86400, memory_size=20000):
+        """
+        Open (and create if needed) the store
+
+        Args:
+            path (str): Path to the SQLite database file
+            ttl (float): Seconds after which an entry that hasn't been seen again is dropped
+            memory_size (int): Maximum number of videos kept in memory
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # video_id -> dict, each entry expiring ttl after it was last seen
+        self._memory = TTLCache(max_size=memory_size, default_ttl=None)
+        self._pruned_at = 0.0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            "video_id TEXT PRIMARY KEY, "
+            "title TEXT NOT NULL, "
+            "duration REAL, "
+            "thumbnail TEXT, "
+            "last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_last_seen ON videos (last_seen)")
+
+    def warm(self, limit=10000):
+        """
+        Drop expired entries and load the most recently seen ones into memory
+
+        Args:
+            limit (int): Maximum number of entries to load, capped at the memory size
+
+        Returns:
+            int: Number of entries loaded
+        """
+        with self._lock:
+            self._prune(time.time())
+            rows = self._conn.execute(
+                "SELECT video_id, title, duration, thumbnail, last_seen FROM videos "
+                "ORDER BY last_seen DESC LIMIT ?",
+                (min(limit, self._memory.max_size),)
+            ).fetchall()
+            # Oldest first, so the most recently seen videos are the last to be evicted
+            for video_id, title, duration, thumbnail, last_seen in reversed(rows):
+                self._memory.set(video_id, {
+                    'title': title,
+                    'duration': duration,
+                    'thumbnail': thumbnail,
+                    'last_seen': last_seen,
+                }, expires_at=last_seen + self.ttl)
+
+        logger.info(f"Loaded {len(rows)} videos from metadata store {self.path}")
+        return len(rows)
+
+    def get(self, video_id):
+        """
+        Get stored metadata for a video without touching the disk
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            dict: title, duration, thumbnail and last_seen, or None if unknown, expired
+                or no longer in memory
+        """
+        return self._memory.get(video_id)
+
+    def put(self, video_id, title, duration=None, thumbnail=None):
+        """
+        Store metadata for a video, refreshing its last-seen time
+
+        Args:
+            video_id (str): YouTube video ID
+            title (str): Video title
+            duration (float): Duration in seconds
+            thumbnail (str): Thumbnail URL
+        """
+        now = time.time()
+        # Fields a lookup didn't return (a flat playlist entry has no
+        # thumbnail, a live stream no duration) keep their known value
+        known = self._memory.get(video_id) or {}
+        entry = {
+            'title': title or known.get('title'),
+            'duration': duration if duration is not None else known.get('duration'),
+            'thumbnail': thumbnail or known.get('thumbnail'),
+            'last_seen': now,
+        }
+        self._memory.set(video_id, entry, expires_at=now + self.ttl)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO videos (video_id, title, duration, thumbnail, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(video_id) DO UPDATE SET title=COALESCE(excluded.title, title), "
+                    "duration=COALESCE(excluded.duration, duration), "
+                    "thumbnail=COALESCE(excluded.thumbnail, thumbnail), "
+                    "last_seen=excluded.last_seen",
+                    (video_id, entry['title'], entry['duration'], entry['thumbnail'], now)
+                )
+                if now - self._pruned_at >= self.PRUNE_INTERVAL:
+                    self._prune(now)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store metadata for {video_id}: {e}")
+
+    def _prune(self, now):
+        """Delete entries not seen for ttl seconds; call with the lock held"""
+        self._pruned_at = now
+        deleted = self._conn.execute("DELETE FROM videos WHERE last_seen < ?", (now - self.ttl,)).rowcount
+        if deleted:
+            logger.info(f"Dropped {deleted} expired videos from metadata store {self.path}")
+
+    def __len__(self):
+        return len(self._memory)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,321 @@
+# Prometheus metrics for extraction, queues and playback
+import asyncio
+import bisect
+import logging
+import threading
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class _Metric:
+    """Base of the metric types: a name, help text and one value per label combination"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initialize the metric
+
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            labelnames (tuple): Names of the labels every sample carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # Label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+class Counter(_Metric):
+    """A value that only goes up"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Add to the counter"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + '_total', self._labels(key), value) for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    """A value that goes up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        """Set the gauge"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        """
+        Initialize the histogram
+
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            labelnames (tuple): Names of the labels every sample carries
+            buckets (tuple): Ascending upper bounds; +Inf is added automatically
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        samples = []
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', dict(labels, le=_format_value(bound)), cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """
+    The metrics of this process
+
+    Metrics updated on hot paths are recorded as they happen. Everything that
+    other objects already count (cache hits, queue lengths, pool usage) is
+    read by collectors only when the metrics are scraped, so it costs nothing
+    in between.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics = []
+        self._collectors = {}  # Name -> function returning metric families
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Create and register a Counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        """Create and register a Gauge"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        """Create and register a Histogram"""
+        return self._register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def add_collector(self, name, collector):
+        """
+        Register a function that reports metrics at scrape time
+
+        Args:
+            name (str): Collector name; a collector of the same name is replaced
+            collector (callable): Returns a list of families, see family()
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def remove_collector(self, name):
+        """Unregister a collector"""
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def collect(self, loop=None, timeout=5):
+        """
+        Gather every metric
+
+        Args:
+            loop (asyncio.AbstractEventLoop): Event loop owning the state the
+                collectors read, such as the bot's players. While it runs, the
+                collectors run on it instead of the calling thread
+            timeout (float): Seconds to wait for the collectors on loop
+
+        Returns:
+            list: Families as (name, kind, documentation, samples) tuples,
+                where samples are (sample name, labels dict, value) tuples
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors.items())
+
+        families = [family(metric.name, metric.kind, metric.documentation, metric.samples()) for metric in metrics]
+        if loop is None or not loop.is_running() or _running_loop() is loop:
+            families.extend(_run_collectors(collectors))
+            return families
+
+        async def run():
+            return _run_collectors(collectors)
+
+        try:
+            families.extend(asyncio.run_coroutine_threadsafe(run(), loop).result(timeout))
+        except Exception as e:
+            logger.error(f"Metrics collectors didn't finish on their event loop: {e!r}")
+        return families
+
+def _run_collectors(collectors):
+    """Call (name, collector) pairs, keeping one's failure from hiding the rest"""
+    families = []
+    for name, collector in collectors:
+        try:
+            families.extend(collector())
+        except Exception as e:
+            logger.error(f"Metrics collector '{name}' failed: {e}")
+    return families
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def family(name, kind, documentation, samples):
+    """
+    Build a metric family for a collector
+
+    Args:
+        name (str): Metric name
+        kind (str): 'counter', 'gauge' or 'histogram'
+        documentation (str): Help text
+        samples (list): (sample name, labels dict, value) tuples
+
+    Returns:
+        tuple: The family
+    """
+    return (name, kind, documentation, list(samples))
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render(groups):
+    """
+    Format metric families in the Prometheus text exposition format
+
+    Args:
+        groups (list): (families, extra labels dict) pairs, e.g. one per shard
+            worker; families of the same name are merged under one header
+
+    Returns:
+        str: The exposition text
+    """
+    merged = {}
+    for families, extra_labels in groups:
+        for name, kind, documentation, samples in families:
+            entry = merged.setdefault(name, (kind, documentation, []))
+            for sample_name, labels, value in samples:
+                entry[2].append((sample_name, dict(extra_labels, **labels), value))
+
+    lines = []
+    for name, (kind, documentation, samples) in merged.items():
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{sample_name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task
+
+    Anything that blocks the loop delays every guild's audio, and shows up
+    here as lag.
+    """
+
+    def __init__(self, interval=0.5):
+        """
+        Initialize the monitor
+
+        Args:
+            interval (float): Seconds between samples
+        """
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task = None
+
+    def start(self):
+        """Start sampling on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - started - self.interval)
+            LOOP_LAG.observe(self.last_lag)
+
+# Metrics of this process
+registry = MetricsRegistry()
+
+EXTRACTION_SECONDS = registry.histogram(
+    "jopertube_extraction_seconds", "Time yt-dlp takes to extract info, by profile", ["kind"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+)
+EXTRACTION_FAILURES = registry.counter(
+    "jopertube_extraction_failures", "Extractions that raised an error, by profile", ["kind"]
+)
+EXTRACTION_WAIT_SECONDS = registry.histogram(
+    "jopertube_extraction_wait_seconds", "Time extraction jobs wait for a worker, by pool and lane", ["pool", "lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+INTER_TRACK_GAP = registry.histogram(
+    "jopertube_inter_track_gap_seconds", "Silence between the end of a song and the start of the next",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+LOOP_LAG = registry.histogram(
+    "jopertube_event_loop_lag_seconds", "How late the event loop runs a task that is due",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
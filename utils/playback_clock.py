@@ -0,0 +1,60 @@
+# Position tracking for the song a guild is playing
+
+# discord.py's player reads one 20 ms frame at a time, PCM or Opus
+FRAME_SECONDS = 0.02
+
+class PlaybackClock:
+    """
+    Tracks how far into a track playback has got from the frames actually played
+
+    Used to resume a track at the right offset after its stream fails. The
+    clock only advances when the audio source hands a frame to discord.py,
+    so network stalls, ffmpeg reconnects and pauses don't count.
+    """
+
+    __slots__ = ('offset', 'source', 'frames')
+
+    def __init__(self, offset=0.0, source=None):
+        """
+        Start the clock
+
+        Args:
+            offset (float): Position in seconds playback started at
+            source (str): Stream URL or local file being played
+        """
+        self.offset = offset
+        self.source = source
+        self.frames = 0
+
+    def attach(self, audio_source):
+        """
+        Count the frames an audio source delivers
+
+        Wraps the source's read() in place, so attributes such as its volume
+        stay reachable through the voice client.
+
+        Args:
+            audio_source (discord.AudioSource): Source about to be played
+
+        Returns:
+            discord.AudioSource: The same source
+        """
+        read = audio_source.read
+
+        def counting_read():
+            data = read()
+            if data:
+                self.frames += 1
+            return data
+
+        audio_source.read = counting_read
+        return audio_source
+
+    def elapsed(self):
+        """
+        Get the current position in the track
+
+        Returns:
+            float: Seconds from the start of the track
+        """
+        return self.offset + self.frames * FRAME_SECONDS
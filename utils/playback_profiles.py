@@ -0,0 +1,214 @@
+# ffmpeg discovery and named playback profiles
+import logging
+import os
+import shutil
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Result of find_ffmpeg, looked up once per process
+_ffmpeg_path = None
+
+def find_ffmpeg(configured=None):
+    """
+    Locate the ffmpeg executable, caching the result
+
+    Args:
+        configured (str): Explicit path or command name, tried before PATH
+
+    Returns:
+        str: Path to ffmpeg, or "ffmpeg" if nothing was found
+    """
+    global _ffmpeg_path
+    if _ffmpeg_path is not None:
+        return _ffmpeg_path
+
+    candidates = [configured] if configured else []
+    candidates.append("ffmpeg")
+    for candidate in candidates:
+        path = shutil.which(candidate)
+        if path:
+            _ffmpeg_path = path
+            logger.info(f"Using ffmpeg at {path}")
+            return path
+        if configured and candidate == configured:
+            logger.warning(f"Configured ffmpeg '{configured}' not found, searching PATH")
+
+    # Let discord.py report the missing executable when playback starts
+    logger.error("ffmpeg not found on PATH, playback will fail until it is installed")
+    _ffmpeg_path = "ffmpeg"
+    return _ffmpeg_path
+
+class PlaybackProfile:
+    """
+    A named set of ffmpeg options for playback
+
+    Profiles trade CPU for quality: how much of the input is probed, how many
+    threads ffmpeg may use, whether loudness is normalized live when no
+    precomputed gain is known, and when Opus is copied instead of re-encoded.
+    """
+
+    # Passthrough modes
+    PASSTHROUGH_NEVER = 'never'    # Always decode to PCM
+    PASSTHROUGH_AUTO = 'auto'      # Copy Opus when volume is 100% and normalization is off
+    PASSTHROUGH_ALWAYS = 'always'  # Copy Opus whenever the input is Opus, ignoring volume
+
+    def __init__(self, name, description, probesize, analyzeduration, threads,
+                 live_normalize=True, passthrough=PASSTHROUGH_AUTO):
+        """
+        Initialize a profile
+
+        Args:
+            name (str): Name used in commands and configuration
+            description (str): One line shown to users
+            probesize (str): ffmpeg -probesize for the input
+            analyzeduration (int): ffmpeg -analyzeduration in microseconds
+            threads (int): ffmpeg -threads for decoding and encoding
+            live_normalize (bool): Use the dynaudnorm filter for tracks without a measured gain
+            passthrough (str): One of the PASSTHROUGH_* modes
+        """
+        self.name = name
+        self.description = description
+        self.probesize = probesize
+        self.analyzeduration = analyzeduration
+        self.threads = threads
+        self.live_normalize = live_normalize
+        self.passthrough = passthrough
+
+    def before_options(self, local=False):
+        """
+        Build the ffmpeg input options
+
+        Args:
+            local (bool): True for a file from the audio cache, False for a stream URL
+
+        Returns:
+            str: Options placed before -i
+        """
+        options = [
+            f"-probesize {self.probesize}",
+            f"-analyzeduration {self.analyzeduration}",
+            "-loglevel panic",
+        ]
+        if not local:
+            # Reconnect options only apply to network inputs
+            options.insert(0, "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5")
+        return " ".join(options)
+
+    def options(self, normalize=False):
+        """
+        Build the ffmpeg output options
+
+        Args:
+            normalize (bool): Apply live loudness normalization if the profile allows it
+
+        Returns:
+            str: Options placed after -i
+        """
+        options = f"-vn -threads {self.threads}"
+        if normalize and self.live_normalize:
+            options += " -af dynaudnorm=f=200"
+        return options
+
+    def use_passthrough(self, codec, volume, normalize):
+        """
+        Decide whether the input can be copied to Discord without decoding
+
+        Args:
+            codec (str): Codec of the input, see stream_codec
+            volume (float): Guild volume between 0 and 1
+            normalize (bool): Whether loudness normalization is on
+
+        Returns:
+            bool: True to use FFmpegOpusAudio with codec="copy"
+        """
+        if codec != 'opus' or self.passthrough == self.PASSTHROUGH_NEVER:
+            return False
+        if self.passthrough == self.PASSTHROUGH_ALWAYS:
+            return True
+        return volume == 1.0 and not normalize
+
+PROFILES = {
+    profile.name: profile for profile in (
+        PlaybackProfile(
+            'standard', "Balanced defaults",
+            probesize='1M', analyzeduration=0, threads=1,
+        ),
+        PlaybackProfile(
+            'low-cpu', "Minimal probing, single thread, no live normalization",
+            probesize='32k', analyzeduration=0, threads=1, live_normalize=False,
+        ),
+        PlaybackProfile(
+            'high-quality', "Full input probing, live normalization, no Opus passthrough",
+            probesize='5M', analyzeduration=5000000, threads=2,
+            passthrough=PlaybackProfile.PASSTHROUGH_NEVER,
+        ),
+        PlaybackProfile(
+            'passthrough', "Copy YouTube's Opus audio untouched, ignoring volume and normalization",
+            probesize='32k', analyzeduration=0, threads=1, live_normalize=False,
+            passthrough=PlaybackProfile.PASSTHROUGH_ALWAYS,
+        ),
+    )
+}
+
+def get_profile(name):
+    """
+    Get a playback profile by name, falling back to 'standard'
+
+    Args:
+        name (str): Profile name
+
+    Returns:
+        PlaybackProfile: The profile
+    """
+    profile = PROFILES.get(name)
+    if profile is None:
+        logger.warning(f"Unknown playback profile '{name}', using 'standard'")
+        profile = PROFILES['standard']
+    return profile
+
+def source_process(audio_source):
+    """
+    Find the ffmpeg process behind an audio source
+
+    Args:
+        audio_source (discord.AudioSource): Source, possibly wrapped by a volume stage
+
+    Returns:
+        subprocess.Popen: The ffmpeg process, or None
+    """
+    # Unwrap PCMVolumeTransformer / GainProcessor
+    while hasattr(audio_source, 'original'):
+        audio_source = audio_source.original
+    return getattr(audio_source, '_process', None)
+
+def process_usage(pid):
+    """
+    Read CPU time and memory use of a process from /proc
+
+    Args:
+        pid (int): Process ID
+
+    Returns:
+        dict: cpu_seconds, cpu_percent (average since the process started) and
+            rss_bytes, or None if the process is gone or /proc is unavailable
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    ticks = os.sysconf('SC_CLK_TCK')
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    # Fields after the command name start at field 3 (state)
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+    elapsed = uptime - int(fields[19]) / ticks
+    return {
+        'cpu_seconds': cpu_seconds,
+        'cpu_percent': cpu_seconds / elapsed * 100 if elapsed > 0 else 0.0,
+        'rss_bytes': int(fields[21]) * page_size,
+    }
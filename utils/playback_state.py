@@ -0,0 +1,211 @@
+# Per-guild playback state shared by the bot, its commands and the web interface
+import logging
+import threading
+import time
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class PlaybackSnapshot:
+    """
+    View of what one guild is playing
+
+    Snapshots are never changed after creation; the registry replaces them
+    instead. Any thread can hold on to one and read it while the bot moves on
+    to the next song.
+    """
+
+    __slots__ = ('guild_id', 'guild_name', 'url', 'title', 'start_time', 'duration', 'paused_at', 'version')
+
+    def __init__(self, guild_id, guild_name=None, url=None, title=None, start_time=None,
+                 duration=None, paused_at=None, version=0):
+        """
+        Initialize a snapshot
+
+        Args:
+            guild_id (int): Guild ID
+            guild_name (str): Guild name
+            url (str): YouTube URL of the song
+            title (str): Song title
+            start_time (float): Unix time the song would have started at if never paused
+            duration (int): Duration in seconds
+            paused_at (float): Unix time playback was paused at, None while playing
+            version (int): Registry version that produced this snapshot
+        """
+        self.guild_id = guild_id
+        self.guild_name = guild_name
+        self.url = url
+        self.title = title
+        self.start_time = start_time
+        self.duration = duration
+        self.paused_at = paused_at
+        self.version = version
+
+    def replace(self, version, **fields):
+        """
+        Create a copy with some fields changed
+
+        Args:
+            version (int): Version of the new snapshot
+            **fields: Fields to change
+
+        Returns:
+            PlaybackSnapshot: The new snapshot
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(fields, version=version)
+        return PlaybackSnapshot(**values)
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def elapsed(self, now=None):
+        """
+        Get the current position in the song
+
+        Args:
+            now (float): Unix time to measure at, defaults to the current time
+
+        Returns:
+            float: Seconds played, capped at the duration
+        """
+        if self.start_time is None:
+            return 0.0
+        now = self.paused_at or now or time.time()
+        elapsed = max(0.0, now - self.start_time)
+        return min(elapsed, self.duration) if self.duration else elapsed
+
+    def to_dict(self):
+        """
+        Convert to the playback info format used by the web interface
+
+        Returns:
+            dict: currently_playing, title, start_time, duration, guild_name, paused_at
+        """
+        return {
+            'currently_playing': self.url,
+            'title': self.title,
+            'start_time': self.start_time,
+            'duration': self.duration,
+            'guild_name': self.guild_name,
+            'paused_at': self.paused_at,
+        }
+
+# Playback info shown when nothing is playing
+EMPTY_PLAYBACK = PlaybackSnapshot(None).to_dict()
+
+class PlaybackRegistry:
+    """
+    Versioned playback state of every guild
+
+    Writers build a new guild map under a lock and publish it together with
+    the version in one assignment (copy-on-write), so readers never lock:
+    they grab the current (version, map) pair and read snapshots from it.
+    Every change bumps the version, letting readers skip work when nothing
+    changed since they last looked.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._current = (0, {})  # (version, guild_id -> PlaybackSnapshot), replaced on every write
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def get(self, guild_id):
+        """
+        Get a guild's playback state
+
+        Args:
+            guild_id (int): Guild ID
+
+        Returns:
+            PlaybackSnapshot: The state, or None if the guild isn't playing
+        """
+        return self._current[1].get(guild_id)
+
+    def snapshot(self):
+        """
+        Get every guild's playback state
+
+        Returns:
+            tuple: (version, dict of guild_id -> PlaybackSnapshot); the dict must not be modified
+        """
+        return self._current
+
+    def changed_since(self, version):
+        """Check if anything changed after the given version"""
+        return self.version != version
+
+    def latest(self):
+        """
+        Get the state of the guild that started a song most recently
+
+        Returns:
+            PlaybackSnapshot: The state, or None if no guild is playing
+        """
+        states = self._current[1].values()
+        return max(states, key=lambda state: state.start_time or 0, default=None)
+
+    def update(self, guild_id, **fields):
+        """
+        Change a guild's playback state
+
+        Args:
+            guild_id (int): Guild ID
+            **fields: PlaybackSnapshot fields to change
+
+        Returns:
+            PlaybackSnapshot: The new state
+        """
+        with self._lock:
+            version, states = self._current
+            current = states.get(guild_id) or PlaybackSnapshot(guild_id)
+            state = current.replace(version + 1, **fields)
+            states = dict(states)
+            states[guild_id] = state
+            self._current = (version + 1, states)
+        self._notify()
+        return state
+
+    def clear(self, guild_id):
+        """
+        Forget a guild's playback state when it stops playing
+
+        Args:
+            guild_id (int): Guild ID
+        """
+        with self._lock:
+            version, states = self._current
+            if guild_id not in states:
+                return
+            states = dict(states)
+            del states[guild_id]
+            self._current = (version + 1, states)
+        self._notify()
+
+    def add_listener(self, listener):
+        """
+        Call a function after every change
+
+        Listeners run on the thread that made the change, so they must be quick.
+
+        Args:
+            listener (callable): Function taking no arguments
+        """
+        self._listeners.append(listener)
+
+    def _notify(self):
+        """Run the change listeners, keeping their errors away from the writer"""
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Playback listener failed: {e}")
+
+# Playback state of the bot running in this process
+registry = PlaybackRegistry()
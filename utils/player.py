@@ -0,0 +1,634 @@
+# Per-guild playback actor
+import asyncio
+import logging
+import time
+import traceback
+import discord
+import config
+from utils.queue_manager import QueueManager
+from utils.extraction_scheduler import ExtractionScheduler
+from utils.playback_clock import PlaybackClock
+from utils.audio_processing import create_processor
+from utils.playback_profiles import get_profile
+from utils.youtube import stream_codec
+from utils.playback_state import registry
+from utils.metrics import INTER_TRACK_GAP
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+def format_duration(seconds):
+    """Format a duration in seconds as m:ss or h:mm:ss"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+class GuildPlayer:
+    """
+    Owns one guild's queue and playback, driven by a single task
+
+    Commands from the cog and track-end events from discord.py's player
+    thread go through a bounded inbox and are handled one at a time, so
+    playback state only ever changes in one place. Each started song gets a
+    new generation number; track-end events from an older generation (a
+    skipped or stopped song) are ignored, so a stop can never advance the
+    queue twice.
+    """
+
+    IDLE = 'idle'            # Nothing playing, the idle-disconnect timer is running
+    RESOLVING = 'resolving'  # Fetching the stream URL of the song about to start
+    PLAYING = 'playing'
+    PAUSED = 'paused'
+
+    def __init__(self, guild, downloader, prefetcher, idle, ffmpeg_path):
+        """
+        Initialize the player; call start() from the event loop before submitting commands
+
+        Args:
+            guild (discord.Guild): Guild the player belongs to
+            downloader (YouTubeDownloader): Shared downloader
+            prefetcher (Prefetcher): Shared prefetcher
+            idle (IdleScheduler): Shared idle-disconnect timer
+            ffmpeg_path (str): ffmpeg executable
+        """
+        self.guild = guild
+        self.downloader = downloader
+        self.prefetcher = prefetcher
+        self.idle = idle
+        self.ffmpeg_path = ffmpeg_path
+
+        self.queue = QueueManager()
+        self.state = self.IDLE
+        self.current = None  # Track being played
+        self.clock = None  # PlaybackClock of the current track
+        self.channel = None  # Text channel for announcements, from the latest command
+
+        # Settings, read when a song starts
+        self.volume = config.DEFAULT_VOLUME
+        self.normalize = True
+        self.profile = config.FFMPEG_PROFILE
+        self.active_profile = None  # Profile the current song was started with
+
+        self._generation = 0
+        self._track_ended_at = None  # When the previous song ended, for the inter-track gap
+        self._resume_attempts = 0
+        self._expiry_watcher = None
+        self._inbox = asyncio.Queue(maxsize=config.PLAYER_INBOX_SIZE)
+        self._pending_events = set()  # Strong references to events waiting for room in the inbox
+        self._handling = None  # Future of the command being handled
+        self._task = None
+        self._closed = False
+
+    @property
+    def guild_id(self):
+        return self.guild.id
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    def is_active(self):
+        """Check if a song is playing, paused or about to start"""
+        return self.state != self.IDLE
+
+    def is_disposable(self):
+        """Check if the player holds nothing worth keeping"""
+        return self.state == self.IDLE and self.queue.is_empty() and self._inbox.empty()
+
+    def start(self):
+        """Start the player's task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"player-{self.guild_id}")
+
+    def close(self):
+        """Stop the player's task and cancel the command being handled and those never handled"""
+        self._closed = True
+        self._cancel_expiry_watch()
+        self.prefetcher.cancel(self.guild_id)
+        self.idle.cancel(self.guild_id)
+        registry.clear(self.guild_id)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._handling is not None and not self._handling.done():
+            self._handling.cancel()
+        for task in self._pending_events:
+            task.cancel()
+        while not self._inbox.empty():
+            _, _, future = self._inbox.get_nowait()
+            if future is not None and not future.done():
+                future.cancel()
+
+    async def submit(self, command, *args):
+        """
+        Send a command to the player and wait for its result
+
+        Args:
+            command (str): Command name, one of the _on_* handlers
+            *args: Arguments for the handler
+
+        Returns:
+            The handler's return value
+        """
+        if self._closed:
+            raise RuntimeError(f"Player for guild {self.guild_id} is closed")
+        future = asyncio.get_running_loop().create_future()
+        await self._inbox.put((command, args, future))
+        return await future
+
+    def _post_event(self, command, *args):
+        """Queue an event nobody waits for; never drops it, even when the inbox is full"""
+        if self._closed:
+            return
+        try:
+            self._inbox.put_nowait((command, args, None))
+        except asyncio.QueueFull:
+            task = asyncio.create_task(self._inbox.put((command, args, None)))
+            self._pending_events.add(task)
+            task.add_done_callback(self._pending_events.discard)
+
+    async def _run(self):
+        """Handle commands and events one at a time"""
+        while True:
+            command, args, future = await self._inbox.get()
+            if future is not None and future.done():
+                continue  # The caller gave up waiting
+            self._handling = future
+            try:
+                result = await getattr(self, f"_on_{command}")(*args)
+            except (Exception, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError):
+                    if asyncio.current_task().cancelling():
+                        raise  # The player itself is being stopped
+                    # A shared task the handler awaited was cancelled; that
+                    # must not end the player, nor cancel the caller
+                    e = RuntimeError(f"Player command '{command}' was interrupted")
+                logger.error(f"Player command '{command}' failed in guild {self.guild_id}: {e}")
+                logger.error(traceback.format_exc())
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                self._handling = None
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def _send(self, message):
+        """Post a message to the guild's music channel, ignoring failures"""
+        if self.channel is None:
+            return
+        try:
+            await self.channel.send(message)
+        except Exception as e:
+            logger.error(f"Couldn't send message in guild {self.guild_id}: {e}")
+
+    # Command handlers
+
+    async def _on_enqueue(self, tracks, channel):
+        """
+        Add tracks to the queue and start playing if idle
+
+        Returns:
+            tuple: (number of tracks added, whether playback started, queue length)
+        """
+        self.channel = channel
+        room = max(config.QUEUE_MAX_LENGTH - len(self.queue), 0)
+        added = tracks[:room]
+        self.queue.extend(added)
+
+        if self.state == self.IDLE and added:
+            await self._play_next()
+            return len(added), True, len(self.queue)
+
+        if added:
+            self.prefetcher.schedule(self.guild_id, self.queue)
+        return len(added), False, len(self.queue)
+
+    async def _on_skip(self):
+        """Skip the current song; returns False if nothing was playing"""
+        if self.state not in (self.PLAYING, self.PAUSED):
+            return False
+        self._stop_current()
+        await self._play_next()
+        return True
+
+    async def _on_pause(self):
+        """Pause the current song; returns False if nothing was playing"""
+        voice_client = self.voice_client
+        if self.state != self.PLAYING or voice_client is None or not voice_client.is_playing():
+            return False
+        voice_client.pause()
+        self.state = self.PAUSED
+        registry.update(self.guild_id, paused_at=time.time())
+        return True
+
+    async def _on_resume(self):
+        """Resume the paused song; returns False if nothing was paused"""
+        voice_client = self.voice_client
+        if self.state != self.PAUSED or voice_client is None:
+            return False
+        voice_client.resume()
+        self.state = self.PLAYING
+        registry.update(self.guild_id, start_time=time.time() - self.clock.elapsed(), paused_at=None)
+        return True
+
+    async def _on_stop(self):
+        """Stop playback and clear the queue; returns False if nothing was playing"""
+        if self.state not in (self.PLAYING, self.PAUSED):
+            return False
+        self.prefetcher.cancel(self.guild_id)
+        self.queue.clear()
+        self._stop_current()
+        self._go_idle()
+        return True
+
+    async def _on_leave(self):
+        """Stop everything and disconnect; returns False if not connected"""
+        voice_client = self.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            return False
+        self.prefetcher.cancel(self.guild_id)
+        self.queue.clear()
+        self._stop_current()
+        self._go_idle()
+        self.idle.cancel(self.guild_id)
+        await voice_client.disconnect()
+        return True
+
+    async def _on_idle_timeout(self):
+        """Disconnect if still idle; returns True if the player can be discarded"""
+        if self.state != self.IDLE or not self.queue.is_empty():
+            return False
+        voice_client = self.voice_client
+        if voice_client is not None and voice_client.is_connected() and not voice_client.is_playing():
+            logger.info(f"Leaving voice in guild {self.guild_id} after {config.VOICE_TIMEOUT}s idle")
+            await voice_client.disconnect()
+        return True
+
+    async def _on_set_volume(self, volume):
+        """
+        Change the volume
+
+        Returns:
+            bool: False if the current song can't change volume (Opus passthrough)
+        """
+        self.volume = volume
+        source = self.voice_client.source if self.voice_client is not None else None
+        if source is None:
+            return True
+        if hasattr(source, "volume"):
+            source.volume = volume
+            return True
+        return False
+
+    async def _on_set_normalize(self, enabled):
+        """Turn loudness normalization on or off from the next song"""
+        self.normalize = enabled
+        return True
+
+    async def _on_set_profile(self, name):
+        """Switch the playback profile from the next song"""
+        self.profile = name
+        return True
+
+    async def _on_shuffle(self):
+        """Shuffle the queue; returns the number of songs shuffled"""
+        if self.queue.is_empty():
+            return 0
+        self.queue.shuffle()
+        self._restart_prefetch()
+        return len(self.queue)
+
+    async def _on_remove(self, index):
+        """
+        Remove a song from the queue
+
+        Args:
+            index (int): 0-based queue position
+
+        Returns:
+            Track: The removed track, None if the position is out of range
+        """
+        if not 0 <= index < len(self.queue):
+            return None
+        track = self.queue.remove(index)
+        self._restart_prefetch()
+        return track
+
+    async def _on_move(self, index, new_index):
+        """
+        Move a song to another position in the queue
+
+        Args:
+            index (int): 0-based position of the song
+            new_index (int): 0-based position to move it to
+
+        Returns:
+            Track: The moved track, None if a position is out of range
+        """
+        size = len(self.queue)
+        if not 0 <= index < size or not 0 <= new_index < size:
+            return None
+        track = self.queue.move(index, new_index)
+        self._restart_prefetch()
+        return track
+
+    async def _on_track_end(self, error, generation, ended_at=None):
+        """Resume a song whose stream failed, otherwise move on to the next one"""
+        if generation != self._generation:
+            return  # A song that was skipped or stopped on purpose
+        self._track_ended_at = ended_at
+
+        clock, self.clock = self.clock, None
+        self._cancel_expiry_watch()
+        voice_client = self.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            # Disconnected or kicked from voice: the stream didn't fail, so
+            # there is nothing to resume or report. Keep the queue for the
+            # next play command, like _play_next does
+            logger.info(f"Playback in guild {self.guild_id} ended by leaving voice")
+            self._go_idle()
+            return
+        if self.current is not None and clock is not None:
+            if await self._resume_failed_stream(clock, error):
+                return
+
+        if error:
+            error_message = str(error) or "Empty error message, likely an FFmpeg issue"
+            logger.error(f"Error playing audio: {error_message}")
+            await self._send(f"⚠️ Error playing audio: {error_message}")
+
+        await self._play_next()
+
+    # Playback
+
+    def _go_idle(self):
+        """Switch to idle and start the disconnect countdown"""
+        self.current = None
+        self.clock = None
+        self.state = self.IDLE
+        self._track_ended_at = None
+        self.idle.arm(self.guild_id)
+        registry.clear(self.guild_id)
+
+    def _restart_prefetch(self):
+        """Drop in-flight prefetches after the head of the queue was rearranged"""
+        self.prefetcher.cancel(self.guild_id)
+        if self.is_active():
+            self.prefetcher.schedule(self.guild_id, self.queue)
+
+    def _stop_current(self):
+        """Stop the playing song without its track-end event advancing the queue"""
+        self._generation += 1
+        self._track_ended_at = None
+        self._cancel_expiry_watch()
+        self.clock = None
+        voice_client = self.voice_client
+        if voice_client is not None and (voice_client.is_playing() or voice_client.is_paused()):
+            voice_client.stop()
+
+    async def _play_next(self):
+        """Start the next song that can be played, or go idle"""
+        voice_client = self.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            # Keep the queue; the next play command reconnects
+            self._go_idle()
+            return
+
+        while not self.queue.is_empty():
+            if await self._start(self.queue.get_next()):
+                return
+        self._go_idle()
+
+    async def _start(self, track, start_at=0):
+        """
+        Start playing a track
+
+        Args:
+            track (Track): Track to play
+            start_at (float): Position in seconds to start from, when resuming a failed stream
+
+        Returns:
+            bool: True if playback started
+        """
+        self.idle.cancel(self.guild_id)
+        if not start_at:
+            self._resume_attempts = 0
+        self.current = track
+        self.state = self.RESOLVING
+        voice_client = self.voice_client
+
+        try:
+            self.downloader.record_request(track.video_id)
+
+            # Play from the local audio cache when possible, otherwise only hit
+            # YouTube again if the stream URL is missing or about to expire
+            local_path = await self.downloader.get_cached_audio(track.video_id)
+            if local_path is None and track.needs_refresh(config.STREAM_URL_EXPIRY_MARGIN):
+                await self.downloader.refresh_track(
+                    track, guild_id=self.guild_id, priority=ExtractionScheduler.PRIORITY_PLAYBACK
+                )
+            title = track.display_title
+            duration = track.duration or config.UNKNOWN_DURATION_DISPLAY
+
+            audio_source, source = self._create_source(track, local_path, start_at)
+            clock = PlaybackClock(offset=start_at, source=source)
+            audio_source = clock.attach(audio_source)
+
+            # Update playback information for the web interface and commands
+            registry.update(
+                self.guild_id,
+                url=track.url,
+                title=title,
+                start_time=time.time() - start_at,
+                duration=duration,
+                guild_name=self.guild.name,
+                paused_at=None
+            )
+
+            # Track-end events carry the generation of the song they belong to
+            self._generation += 1
+            generation = self._generation
+            loop = asyncio.get_running_loop()
+
+            def after(error):
+                loop.call_soon_threadsafe(self._post_event, 'track_end', error, generation, time.monotonic())
+
+            # Play the audio with Opus error handling
+            try:
+                voice_client.play(audio_source, after=after)
+                logger.info(f"Started playing: {title} (Duration: {duration}s)")
+            except discord.opus.OpusNotLoaded:
+                # Handle Opus not loaded error
+                logger.warning("Opus library not loaded - using fallback mode")
+                await self._send("⚠️ Voice encoding library (Opus) not available - using fallback mode")
+
+                # Try to use the player without Opus encoder by forcing the voice client to proceed
+                try:
+                    voice_client._connected = True
+                    voice_client.encoder = None
+                    voice_client._player = None
+
+                    # Try to play again
+                    voice_client.play(audio_source, after=after)
+                    logger.info("Fallback player activated successfully")
+                except Exception as fallback_error:
+                    # If fallback fails too, notify user
+                    logger.error(f"Fallback playback failed: {fallback_error}")
+                    await self._send("❌ Fallback playback mode failed. Voice features are unavailable.")
+                    raise RuntimeError("Voice playback unavailable - Opus library missing and fallback failed")
+
+            self.state = self.PLAYING
+            self.clock = clock
+            if self._track_ended_at is not None:
+                INTER_TRACK_GAP.observe(time.monotonic() - self._track_ended_at)
+                self._track_ended_at = None
+            self._watch_stream_expiry(track)
+
+            # Announce after playback has started so the message doesn't delay the audio
+            if start_at:
+                await self._send(f"🔁 Stream interrupted, resuming **{title}** at {format_duration(start_at)}")
+            else:
+                await self._send(f"🎵 Now playing: **{title}**")
+
+            # Resolve the upcoming songs while this one plays
+            self.prefetcher.schedule(self.guild_id, self.queue)
+            return True
+
+        except Exception as e:
+            error_message = str(e)
+
+            # Log detailed error information
+            logger.error(f"Error playing song: {error_message}")
+            logger.error(traceback.format_exc())
+
+            # Provide user-friendly error message
+            if "opus" in error_message.lower():
+                await self._send("❌ Voice encoding error: Opus library not available. Please contact the bot administrator.")
+            elif "executable" in error_message.lower():
+                await self._send("❌ FFmpeg error: Could not access FFmpeg. Please contact the bot administrator.")
+            elif "403" in error_message or "forbidden" in error_message.lower():
+                await self._send("❌ YouTube error: This video is forbidden or age-restricted. Check cookie file.")
+            elif "not available" in error_message.lower():
+                await self._send("❌ YouTube error: This video is not available in your region or has been removed.")
+            else:
+                await self._send(f"❌ Error playing song: {error_message}")
+            return False
+
+    def _create_source(self, track, local_path, start_at):
+        """
+        Build the ffmpeg audio source for a track from the player's settings
+
+        Returns:
+            tuple: (discord.AudioSource, stream URL or file being played)
+        """
+        # ffmpeg options come from the guild's playback profile
+        profile = get_profile(self.profile)
+        before_options = profile.before_options(local=local_path is not None)
+        if start_at:
+            before_options += f" -ss {start_at:.2f}"
+        source = local_path or track.stream_url
+        self.active_profile = profile.name
+
+        if config.OPUS_PASSTHROUGH and profile.use_passthrough(stream_codec(source), self.volume, self.normalize):
+            # Nothing to change in the audio: remux YouTube's Opus frames
+            # straight to Discord instead of decoding and re-encoding them
+            logger.debug(f"Using Opus passthrough for {track.display_title}")
+            audio_source = discord.FFmpegOpusAudio(
+                source,
+                codec="copy",
+                executable=self.ffmpeg_path,
+                before_options=before_options,
+                options=profile.options()
+            )
+            return audio_source, source
+
+        # A loudness gain measured ahead of time replaces ffmpeg's live
+        # normalization filter; dynaudnorm is only the fallback
+        use_gain = self.normalize and track.gain_db is not None
+        audio_source = discord.FFmpegPCMAudio(
+            source,
+            executable=self.ffmpeg_path,
+            before_options=before_options,
+            options=profile.options(normalize=self.normalize and not use_gain)
+        )
+
+        # Add processing stage for volume control and loudness gain
+        audio_source = create_processor(
+            audio_source, self.volume,
+            gain_db=track.gain_db if use_gain else None,
+            backend=config.AUDIO_PROCESSING
+        )
+        return audio_source, source
+
+    async def _resume_failed_stream(self, clock, error):
+        """
+        Restart the current song at the position its stream stopped at
+
+        Returns:
+            bool: True if playback resumed, False if the song should be skipped
+        """
+        track = self.current
+        if not track.duration:
+            return False  # No way to tell an early end or where to resume, e.g. a live stream
+        elapsed = clock.elapsed()
+        if error is None and elapsed >= track.duration - config.STREAM_RESUME_TOLERANCE:
+            return False  # Finished normally
+
+        if self._resume_attempts >= config.STREAM_RESUME_ATTEMPTS:
+            logger.warning(f"Giving up on {track!r} after {self._resume_attempts} resumes")
+            return False
+        self._resume_attempts += 1
+
+        logger.warning(
+            f"Stream of {track!r} stopped at {elapsed:.0f}s of {track.duration}s "
+            f"in guild {self.guild_id}, resuming"
+        )
+        try:
+            # Force a new URL only if the one that failed is still the track's;
+            # a renewed URL from the expiry watcher is used as is
+            await self.downloader.refresh_track(
+                track, guild_id=self.guild_id, priority=ExtractionScheduler.PRIORITY_PLAYBACK,
+                force=clock.source == track.stream_url
+            )
+        except Exception as e:
+            logger.error(f"Could not re-resolve {track.url}: {e}")
+            return False
+
+        voice_client = self.voice_client
+        if voice_client is None or not voice_client.is_connected():
+            return False  # Left voice while re-resolving
+        return await self._start(track, start_at=elapsed)
+
+    def _watch_stream_expiry(self, track):
+        """Renew the playing song's stream URL before it expires if the song outlasts it"""
+        self._cancel_expiry_watch()
+        clock = self.clock
+        if track.expires_at is None or not track.duration or clock is None or clock.source != track.stream_url:
+            return
+
+        refresh_at = track.expires_at - config.STREAM_URL_EXPIRY_MARGIN
+        if refresh_at > time.time() + track.duration - clock.elapsed():
+            return  # The song ends before its URL expires
+
+        self._expiry_watcher = asyncio.create_task(self._refresh_before_expiry(track, refresh_at))
+
+    def _cancel_expiry_watch(self):
+        """Cancel the stream renewal of the current song"""
+        if self._expiry_watcher is not None:
+            self._expiry_watcher.cancel()
+            self._expiry_watcher = None
+
+    async def _refresh_before_expiry(self, track, refresh_at):
+        """Re-resolve the playing track so a resume after expiry has a fresh URL at hand"""
+        await asyncio.sleep(max(0, refresh_at - time.time()))
+        try:
+            await self.downloader.refresh_track(
+                track, guild_id=self.guild_id, priority=ExtractionScheduler.PRIORITY_PREFETCH
+            )
+            logger.debug(f"Renewed stream URL of playing {track!r} in guild {self.guild_id}")
+        except Exception as e:
+            logger.warning(f"Failed to renew stream URL of {track.url}: {e}")
@@ -0,0 +1,120 @@
+# Background resolution of upcoming queue entries
+import asyncio
+import logging
+from utils.extraction_scheduler import ExtractionScheduler
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class Prefetcher:
+    """
+    Resolves the next few tracks of each guild's queue while the current one plays
+
+    Runs at most one task per guild. Scheduling a guild that already has a task
+    running makes that task take another pass once it finishes, so work in
+    flight is never thrown away just because the queue changed.
+    """
+
+    def __init__(self, downloader, depth=3, refresh_margin=1800):
+        """
+        Initialize the prefetcher
+
+        Args:
+            downloader (YouTubeDownloader): Downloader used to resolve tracks
+            depth (int): Number of upcoming tracks to keep resolved
+            refresh_margin (float): Re-resolve stream URLs expiring within this many seconds
+        """
+        self.downloader = downloader
+        self.depth = depth
+        self.refresh_margin = refresh_margin
+        self._tasks = {}  # guild_id -> asyncio.Task
+        self._dirty = set()  # Guilds whose queue changed while their task was running
+
+    def schedule(self, guild_id, queue):
+        """
+        Make sure the head of a guild's queue gets resolved
+
+        Args:
+            guild_id (int): Guild the queue belongs to
+            queue (QueueManager): The guild's queue
+        """
+        task = self._tasks.get(guild_id)
+        if task and not task.done():
+            self._dirty.add(guild_id)
+            return
+
+        self._tasks[guild_id] = asyncio.create_task(self._run(guild_id, queue))
+
+    def cancel(self, guild_id):
+        """
+        Stop prefetching for a guild, e.g. after a skip or when its queue is cleared
+
+        Args:
+            guild_id (int): Guild to stop prefetching for
+        """
+        self._dirty.discard(guild_id)
+        task = self._tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
+
+    def cancel_all(self):
+        """Stop prefetching for every guild"""
+        for guild_id in list(self._tasks):
+            self.cancel(guild_id)
+
+    async def _refresh(self, track, guild_id):
+        """
+        Resolve a track so its stream URL stays valid for the refresh margin
+
+        The metadata cache keeps serving a URL until STREAM_URL_EXPIRY_MARGIN
+        before it expires, which is well inside the refresh margin. A URL
+        that is merely close to expiring therefore has to be re-resolved
+        with force, or the cache would hand back the same one.
+
+        Args:
+            track (Track): Track to resolve
+            guild_id (int): Guild the track is queued in
+        """
+        forced = track.is_resolved()
+        await self.downloader.refresh_track(
+            track, guild_id=guild_id, priority=ExtractionScheduler.PRIORITY_PREFETCH, force=forced
+        )
+        if not forced and track.needs_refresh(self.refresh_margin):
+            # The cache had the track, but with a URL that is already close to expiring
+            await self.downloader.refresh_track(
+                track, guild_id=guild_id, priority=ExtractionScheduler.PRIORITY_PREFETCH, force=True
+            )
+
+    async def _run(self, guild_id, queue):
+        """Resolve upcoming tracks until a pass completes with no queue changes"""
+        try:
+            while True:
+                self._dirty.discard(guild_id)
+
+                tracks = queue.view(0, self.depth)
+                for track in tracks:
+                    try:
+                        if track.needs_refresh(self.refresh_margin):
+                            await self._refresh(track, guild_id)
+                            logger.debug(f"Prefetched {track!r} for guild {guild_id}")
+                    except Exception as e:
+                        logger.warning(f"Failed to prefetch {track.url}: {e}")
+
+                # Measure loudness ahead of time so playback needs no live
+                # normalization. This is slow, so only once every upcoming
+                # track has its stream URL.
+                for track in tracks:
+                    if track.gain_db is None and track.is_resolved():
+                        try:
+                            await self.downloader.analyze_loudness(track, guild_id=guild_id)
+                        except Exception as e:
+                            logger.warning(f"Failed to analyze loudness of {track.url}: {e}")
+
+                if guild_id not in self._dirty:
+                    break
+        except asyncio.CancelledError:
+            logger.debug(f"Prefetch cancelled for guild {guild_id}")
+            raise
+        finally:
+            if self._tasks.get(guild_id) is asyncio.current_task():
+                del self._tasks[guild_id]
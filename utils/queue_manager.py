@@ -1,80 +1,219 @@
 # Queue manager for handling music queues
 import logging
+import random
+from itertools import islice
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
 class QueueManager:
-    """Manages a queue of songs for a guild"""
-    
+    """
+    Manages a queue of songs for a guild
+
+    Backed by a list plus the position of its head. Popping the next song
+    only advances the head, and the consumed slots are dropped in one go once
+    there are at least COMPACT_THRESHOLD of them and they make up half the
+    list, so it is O(1) amortized regardless of queue length. Positions map
+    straight to list indexes: lookups and views are O(1) per item, and
+    insert, remove and move are a single memmove.
+    """
+
+    # Consumed slots kept before the list is compacted
+    COMPACT_THRESHOLD = 1024
+
     def __init__(self):
         """Initialize an empty queue"""
         self._queue = []
-        self._current_index = 0
-    
+        self._head = 0  # Index of the next item in _queue
+
+    def _compact(self):
+        """Drop the slots of items already taken from the head"""
+        if self._head:
+            del self._queue[:self._head]
+            self._head = 0
+
     def add(self, item):
         """
         Add an item to the queue
-        
+
         Args:
-            item: The item to add (typically a YouTube URL)
+            item: The item to add (typically a Track)
         """
         self._queue.append(item)
-        logger.debug(f"Added item to queue. Queue size: {len(self._queue)}")
-    
+        logger.debug(f"Added item to queue. Queue size: {len(self)}")
+
+    def extend(self, items):
+        """
+        Add several items to the end of the queue in one operation
+
+        Args:
+            items: Iterable of items to add
+        """
+        self._queue.extend(items)
+        logger.debug(f"Added items to queue. Queue size: {len(self)}")
+
     def get_next(self):
         """
         Get the next item in the queue
-        
+
         Returns:
             The next item in the queue, or None if the queue is empty
         """
         if self.is_empty():
             return None
-        
-        item = self._queue.pop(0)
-        logger.debug(f"Retrieved next item from queue. Remaining: {len(self._queue)}")
+
+        item = self._queue[self._head]
+        self._queue[self._head] = None  # Don't keep the item alive until compaction
+        self._head += 1
+        if self._head == len(self._queue):
+            self._queue.clear()
+            self._head = 0
+        elif self._head >= self.COMPACT_THRESHOLD and self._head * 2 >= len(self._queue):
+            self._compact()
+        logger.debug(f"Retrieved next item from queue. Remaining: {len(self)}")
         return item
-    
+
     def peek(self):
         """
         Look at the next item in the queue without removing it
-        
+
         Returns:
             The next item in the queue, or None if the queue is empty
         """
         if self.is_empty():
             return None
-        return self._queue[0]
-    
+        return self._queue[self._head]
+
+    def insert(self, index, item):
+        """
+        Insert an item at a position in the queue
+
+        Args:
+            index (int): Zero-based position, clamped to the queue bounds
+            item: The item to insert
+        """
+        size = len(self._queue) - self._head
+        if index < 0:
+            index = max(index + size, 0)
+        elif index > size:
+            index = size
+        self._queue.insert(self._head + index, item)
+        logger.debug(f"Inserted item at position {index}. Queue size: {size + 1}")
+
+    def remove(self, index):
+        """
+        Remove the item at a position in the queue
+
+        Args:
+            index (int): Zero-based position
+
+        Returns:
+            The removed item
+
+        Raises:
+            IndexError: If the position is out of range
+        """
+        if index < 0:
+            index += len(self._queue) - self._head
+            if index < 0:
+                raise IndexError("queue index out of range")
+        # Past the end is also past the end of the list, so pop raises for it
+        item = self._queue.pop(self._head + index)
+        logger.debug(f"Removed item at position {index}. Remaining: {len(self._queue) - self._head}")
+        return item
+
+    def move(self, from_index, to_index):
+        """
+        Move an item to another position in the queue
+
+        Args:
+            from_index (int): Zero-based current position
+            to_index (int): Zero-based target position
+
+        Returns:
+            The moved item
+
+        Raises:
+            IndexError: If from_index is out of range
+        """
+        item = self.remove(from_index)
+        self.insert(to_index, item)
+        return item
+
+    def shuffle(self):
+        """Shuffle the queue in place"""
+        self._compact()
+        random.shuffle(self._queue)
+        logger.debug("Queue shuffled")
+
     def clear(self):
         """Clear the queue"""
-        self._queue = []
+        self._queue.clear()
+        self._head = 0
         logger.debug("Queue cleared")
-    
+
     def is_empty(self):
         """
         Check if the queue is empty
-        
+
         Returns:
             bool: True if the queue is empty, False otherwise
         """
-        return len(self._queue) == 0
-    
+        return self._head == len(self._queue)
+
     def size(self):
         """
         Get the size of the queue
-        
+
         Returns:
             int: The number of items in the queue
         """
-        return len(self._queue)
-    
+        return len(self)
+
+    def view(self, start=0, count=10):
+        """
+        Get a slice of the queue without copying the rest of it
+
+        Args:
+            start (int): Zero-based position of the first item
+            count (int): Maximum number of items to return
+
+        Returns:
+            list: Up to count items starting at start
+        """
+        if count <= 0:
+            return []
+        start = self._head + max(start, 0)
+        return self._queue[start:start + count]
+
+    def page(self, page, page_size=10):
+        """
+        Get one page of the queue
+
+        Args:
+            page (int): One-based page number, clamped to the valid range
+            page_size (int): Number of items per page
+
+        Returns:
+            tuple: (items, page, total_pages)
+        """
+        total_pages = max(1, -(-len(self) // page_size))
+        page = min(max(1, page), total_pages)
+        return self.view((page - 1) * page_size, page_size), page, total_pages
+
+    def __len__(self):
+        return len(self._queue) - self._head
+
+    def __iter__(self):
+        return islice(self._queue, self._head, None)
+
     def get_queue(self):
         """
         Get a copy of the current queue
-        
+
+        Prefer view() or page() for display, which don't copy the whole queue.
+
         Returns:
             list: A copy of the queue
         """
-        return self._queue.copy()
+        return self._queue[self._head:]
@@ -0,0 +1,69 @@
+# Track record stored in guild queues
+import time
+
+class Track:
+    """
+    A queued song together with its resolved stream information
+
+    Uses __slots__ to keep per-entry memory small, since guild queues can hold
+    thousands of tracks.
+    """
+
+    __slots__ = ('video_id', 'url', 'title', 'duration', 'requester', 'stream_url', 'expires_at', 'gain_db')
+
+    def __init__(self, url, video_id=None, title=None, duration=None, requester=None,
+                 stream_url=None, expires_at=None, gain_db=None):
+        """
+        Initialize a track
+
+        Args:
+            url (str): YouTube URL used to (re-)resolve the track
+            video_id (str): Canonical YouTube video ID
+            title (str): Video title
+            duration (int): Duration in seconds
+            requester (str): Display name of the user who queued the track
+            stream_url (str): Direct audio stream URL
+            expires_at (float): Unix time at which stream_url stops working
+            gain_db (float): Precomputed loudness correction, None until measured
+        """
+        self.url = url
+        self.video_id = video_id
+        self.title = title
+        self.duration = duration
+        self.requester = requester
+        self.stream_url = stream_url
+        self.expires_at = expires_at
+        self.gain_db = gain_db
+
+    @property
+    def display_title(self):
+        """The title if known, otherwise the URL"""
+        return self.title or self.url
+
+    def is_resolved(self):
+        """
+        Check if the track has a stream URL
+
+        Returns:
+            bool: True if a stream URL has been resolved
+        """
+        return self.stream_url is not None
+
+    def needs_refresh(self, margin=0):
+        """
+        Check if the stream URL is missing or expires within the given margin
+
+        Args:
+            margin (float): Seconds of validity the stream URL must still have
+
+        Returns:
+            bool: True if the track must be resolved again before playing
+        """
+        if self.stream_url is None:
+            return True
+        if self.expires_at is None:
+            return False
+        return time.time() + margin >= self.expires_at
+
+    def __repr__(self):
+        return f"<Track {self.video_id or self.url} {self.title!r}>"
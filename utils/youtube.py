@@ -2,11 +2,157 @@
 import asyncio
 import os
 import logging
-import yt_dlp
+import re
+import sqlite3
+import time
+import unicodedata
+from urllib.parse import urlparse, parse_qs
+import config
+from utils.cache import TTLCache
+from utils.track import Track
+from utils.extraction_scheduler import ExtractionScheduler
+from utils.metadata_store import MetadataStore
+from utils.audio_cache import AudioCache
+from utils.audio_processing import measure_loudness, loudness_gain
+from utils.playback_profiles import find_ffmpeg
+from utils.ytdl_pool import YoutubeDLPool
+from utils.metrics import EXTRACTION_SECONDS, EXTRACTION_FAILURES
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# YouTube video IDs are always 11 characters from this alphabet
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+# Some stream URLs encode the expiry as a path segment instead of a query parameter
+_EXPIRE_PATH_RE = re.compile(r'/expire/(\d+)')
+
+def extract_video_id(url):
+    """
+    Get the canonical YouTube video ID from a URL or bare ID
+
+    Args:
+        url (str): YouTube URL (watch, youtu.be, shorts, embed, music) or video ID
+
+    Returns:
+        str: The 11-character video ID, or None if it cannot be determined
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if _VIDEO_ID_RE.match(url):
+        return url
+
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = (parsed.hostname or '').lower()
+
+    if host.endswith('youtu.be'):
+        candidate = parsed.path.lstrip('/').split('/')[0]
+    elif host.endswith('youtube.com') or host.endswith('youtube-nocookie.com'):
+        candidate = parse_qs(parsed.query).get('v', [None])[0]
+        if not candidate:
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+                candidate = parts[1]
+    else:
+        return None
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+def is_playlist_url(url):
+    """
+    Check if a URL points at a YouTube playlist rather than a single video
+
+    Watch URLs that merely carry a list= parameter count as a single video.
+
+    Args:
+        url (str): URL given by the user
+
+    Returns:
+        bool: True for playlist URLs
+    """
+    url = url.strip()
+    if 'youtube.com' not in url.lower():
+        return False  # A search query
+    try:
+        parsed = urlparse(url if '://' in url else f"https://{url}")
+        host = (parsed.hostname or '').lower()
+    except ValueError:
+        return False  # Not a URL after all, e.g. brackets in the query
+    if host != 'youtube.com' and not host.endswith('.youtube.com'):
+        return False
+    params = parse_qs(parsed.query)
+    return 'list' in params and 'v' not in params
+
+def normalize_query(query):
+    """
+    Fold a search query so trivially different spellings share a cache entry
+
+    Case, punctuation and runs of whitespace are ignored.
+
+    Args:
+        query (str): Search query as typed by the user
+
+    Returns:
+        str: The normalized query
+    """
+    folded = unicodedata.normalize('NFKC', query).casefold()
+    words = ''.join(
+        ' ' if unicodedata.category(char)[0] in 'PSZ' else char for char in folded
+    ).split()
+    # Queries made only of punctuation still need a usable key
+    return ' '.join(words) or ' '.join(folded.split())
+
+def stream_codec(source):
+    """
+    Guess the audio codec of a stream URL or cached audio file without probing it
+
+    YouTube stream URLs carry the container in their mime parameter, and
+    YouTube only serves Opus audio in WebM.
+
+    Args:
+        source (str): googlevideo stream URL or local file path
+
+    Returns:
+        str: 'opus', 'aac', or None if unknown
+    """
+    if not source:
+        return None
+    if '://' not in source:
+        extension = os.path.splitext(source)[1].lower()
+        return 'opus' if extension in ('.webm', '.opus') else None
+
+    mime = parse_qs(urlparse(source).query).get('mime', [''])[0]
+    if mime == 'audio/webm':
+        return 'opus'
+    if mime == 'audio/mp4':
+        return 'aac'
+    return None
+
+def parse_stream_expiry(stream_url):
+    """
+    Get the expiry time YouTube encodes in a googlevideo stream URL
+
+    Args:
+        stream_url (str): Direct stream URL returned by yt-dlp
+
+    Returns:
+        float: Unix time at which the URL stops working, or None if unknown
+    """
+    if not stream_url:
+        return None
+    try:
+        expire = parse_qs(urlparse(stream_url).query).get('expire')
+        if expire:
+            return float(expire[0])
+        match = _EXPIRE_PATH_RE.search(stream_url)
+        if match:
+            return float(match.group(1))
+    except ValueError:
+        pass
+    return None
+
 class YouTubeDownloader:
     """
     Handles downloading audio from YouTube videos
@@ -22,6 +168,12 @@ class YouTubeDownloader:
         """
         self.cookie_file = cookie_file
         self._check_cookie_file()
+
+        # Resolved (stream_url, title, duration) keyed by video ID
+        self.metadata_cache = TTLCache(
+            max_size=config.METADATA_CACHE_SIZE,
+            default_ttl=config.METADATA_CACHE_TTL
+        )
         
         # Set up common yt-dlp options
         self.ytdl_format_options = {
@@ -51,6 +203,106 @@ class YouTubeDownloader:
                 'preferredquality': '192',
             }],
         })
+        
+        # Options for search queries
+        self.ytdl_search_options = dict(self.ytdl_format_options)
+        self.ytdl_search_options.update({
+            'default_search': 'ytsearch',
+            'quiet': True,
+        })
+        
+        # Options for enumerating playlists in a single request, without resolving entries
+        self.ytdl_playlist_options = dict(self.ytdl_format_options)
+        self.ytdl_playlist_options.update({
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'skip_download': True,
+            'playlistend': config.PLAYLIST_MAX_TRACKS,
+        })
+        
+        profiles = {
+            'stream': self.ytdl_stream_options,
+            'search': self.ytdl_search_options,
+            'playlist': self.ytdl_playlist_options,
+        }
+        
+        # Downloaded audio for popular tracks (optional)
+        self.audio_cache = None
+        if config.AUDIO_CACHE_DIR:
+            try:
+                self.audio_cache = AudioCache(config.AUDIO_CACHE_DIR, config.AUDIO_CACHE_MAX_BYTES)
+            except OSError as e:
+                logger.warning(f"Audio cache disabled, could not use {config.AUDIO_CACHE_DIR}: {e}")
+        
+        if self.audio_cache is not None:
+            # Keep YouTube's Opus/WebM audio as-is, it is already compact
+            self.ytdl_download_options = dict(self.ytdl_format_options)
+            self.ytdl_download_options.update({
+                'format': 'bestaudio[acodec=opus]/bestaudio[ext=webm]/bestaudio/best',
+                'outtmpl': os.path.join(self.audio_cache.staging_directory, '%(id)s.%(ext)s'),
+                'max_filesize': config.AUDIO_CACHE_MAX_FILE_BYTES,
+                'noprogress': True,
+            })
+            profiles['download'] = self.ytdl_download_options
+        
+        # Long-lived yt-dlp instances, so each lookup skips option parsing,
+        # cookie loading and extractor setup
+        self.ytdl_pool = YoutubeDLPool(
+            profiles,
+            self.cookie_file,
+            size=config.YTDL_POOL_SIZE
+        )
+        self.ytdl_pool.warm(config.YTDL_POOL_WARM)
+        
+        # Titles and durations that survive restarts (optional)
+        self.metadata_store = None
+        if config.METADATA_DB_PATH:
+            try:
+                self.metadata_store = MetadataStore(
+                    config.METADATA_DB_PATH,
+                    ttl=config.METADATA_DB_TTL,
+                    memory_size=config.METADATA_DB_MEMORY_SIZE
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Metadata store disabled, could not open {config.METADATA_DB_PATH}: {e}")
+        
+        # Normalized search query -> video ID
+        self.search_cache = TTLCache(
+            max_size=config.SEARCH_CACHE_SIZE,
+            default_ttl=config.SEARCH_CACHE_TTL
+        )
+        
+        # Results of forced re-resolves, so a stream failing in many guilds at
+        # once (or failing again right away) doesn't trigger repeated extractions
+        self.recent_refreshes = TTLCache(
+            max_size=config.METADATA_CACHE_SIZE,
+            default_ttl=config.STREAM_REFRESH_COOLDOWN
+        )
+        
+        # Video ID -> loudness gain in dB, or False if it couldn't be measured
+        self.loudness_cache = TTLCache(max_size=config.METADATA_CACHE_SIZE * 4, default_ttl=None)
+        
+        # In-flight lookups keyed by (profile, key), shared by concurrent callers
+        self._inflight = {}
+        self.coalesced = 0  # Lookups that joined an in-flight extraction
+        
+        # Extractions run on their own pool instead of the loop's default executor
+        self.scheduler = ExtractionScheduler(
+            workers=config.EXTRACTION_WORKERS,
+            per_guild_limit=config.EXTRACTION_GUILD_LIMIT
+        )
+        
+        # Loudness analyses read a minute of audio each, so they get a small
+        # pool of their own and can never hold the workers playback needs
+        self.analysis_scheduler = ExtractionScheduler(
+            workers=config.LOUDNESS_WORKERS,
+            per_guild_limit=1,
+            name="analysis"
+        )
+        
+        # Audio cache downloads hold a worker for a whole track, so they get
+        # one thread of their own and never delay playback extractions
+        self.download_scheduler = ExtractionScheduler(workers=1, per_guild_limit=1, name="download")
     
     def _check_cookie_file(self):
         """Check if the cookie file exists and is not empty"""
@@ -64,23 +316,109 @@ class YouTubeDownloader:
             logger.warning(f"Cookie file is empty: {self.cookie_file}")
             logger.warning("Age-restricted videos may not play")
     
-    async def get_audio_info(self, url):
+    async def get_audio_info(self, url, guild_id=None, priority=ExtractionScheduler.PRIORITY_DISPLAY,
+                             force=False):
         """
         Get the audio stream URL, title, and duration for a YouTube video
         
         Args:
             url (str): YouTube URL or video ID
+            guild_id (int): Guild the lookup is for, used for fair scheduling
+            priority (int): ExtractionScheduler priority of the lookup
+            force (bool): Bypass the metadata cache because its stream URL stopped
+                working. At most one forced extraction per video runs within
+                STREAM_REFRESH_COOLDOWN, later callers share its result.
         
         Returns:
             tuple: (stream_url, title, duration)
         """
-        # Run yt-dlp in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        info = await loop.run_in_executor(None, self._extract_info, url, self.ytdl_stream_options)
+        cache_key = extract_video_id(url) or url.strip()
+        if force:
+            recent = self.recent_refreshes.get(cache_key)
+            if recent is not None:
+                return recent
+            self.metadata_cache.pop(cache_key)
+        else:
+            cached = self.metadata_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        result = await self._single_flight(
+            ('stream', cache_key),
+            lambda: self._fetch_audio_info(url, cache_key, guild_id, priority)
+        )
+        if force:
+            self.recent_refreshes.set(cache_key, result)
+        return result
+
+    async def _single_flight(self, key, factory):
+        """
+        Run a lookup once no matter how many callers ask for it at the same time
+
+        Concurrent callers with the same key await one shared task. The task is
+        forgotten as soon as it finishes, so errors reach every waiter but are
+        not cached.
+
+        Args:
+            key (tuple): (profile, normalized key) identifying the lookup
+            factory (callable): Returns the coroutine that performs the lookup
+
+        Returns:
+            The lookup's result
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._single_flight_done(key, t))
+        else:
+            self.coalesced += 1
+
+        # Shield so one waiter giving up doesn't cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    def _single_flight_done(self, key, task):
+        """Forget a finished lookup and mark its exception as retrieved"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_audio_info(self, url, cache_key, guild_id, priority):
+        """
+        Extract audio info with yt-dlp and cache it
+
+        Args:
+            url (str): YouTube URL or video ID
+            cache_key (str): Metadata cache key for the URL
+            guild_id (int): Guild the lookup is for
+            priority (int): ExtractionScheduler priority of the lookup
+
+        Returns:
+            tuple: (stream_url, title, duration)
+        """
+        # Run yt-dlp on the extraction pool to avoid blocking
+        info = await self.scheduler.run(
+            self._extract_info, url, 'stream', guild_id=guild_id, priority=priority
+        )
         
         if not info:
             raise Exception("Could not retrieve video information")
         
+        result = self._parse_audio_info(info)
+        self._cache_audio_info(cache_key, info.get('id'), result)
+        return result
+
+    def _parse_audio_info(self, info):
+        """
+        Pick the stream URL, title and duration out of a yt-dlp info dict
+
+        Args:
+            info (dict): yt-dlp info dict for a single video
+
+        Returns:
+            tuple: (stream_url, title, duration)
+        """
         # Get the direct audio URL
         stream_url = info.get('url')
         if not stream_url:
@@ -100,33 +438,176 @@ class YouTubeDownloader:
         # Duration is in seconds
         duration = info.get('duration')
         if not duration or not isinstance(duration, (int, float)):
-            # Default to a 3-minute duration if not available
-            duration = 180
-            logger.warning(f"Could not determine duration for {title}, using default of 3 minutes")
-        
+            # Unknown, e.g. a live stream; only displays fall back to a default
+            duration = None
+            logger.warning(f"Could not determine duration for {title}")
+
         return stream_url, title, duration
+
+    def warm_metadata_store(self):
+        """
+        Load recently seen videos from the persistent store into memory
+
+        Returns:
+            int: Number of videos loaded
+        """
+        if self.metadata_store is None:
+            return 0
+        return self.metadata_store.warm(config.METADATA_DB_WARM_LIMIT)
+
+    def get_display_info(self, url):
+        """
+        Get a video's title and duration from memory or the persistent store, without yt-dlp
+
+        Args:
+            url (str): YouTube URL or video ID
+
+        Returns:
+            tuple: (title, duration), or None if the video hasn't been seen before
+        """
+        video_id = extract_video_id(url)
+        cached = self.metadata_cache.get(video_id or url.strip())
+        if cached is not None:
+            return cached[1], cached[2]
+
+        if video_id and self.metadata_store is not None:
+            stored = self.metadata_store.get(video_id)
+            if stored is not None:
+                return stored['title'], stored['duration']
+        return None
+
+    async def resolve_track(self, url, requester=None, guild_id=None,
+                            priority=ExtractionScheduler.PRIORITY_DISPLAY, lazy=False):
+        """
+        Resolve a URL into a playable track
+
+        Args:
+            url (str): YouTube URL or video ID
+            requester (str): Display name of the user who requested the track
+            guild_id (int): Guild the track is for
+            priority (int): ExtractionScheduler priority of the lookup
+            lazy (bool): If the title and duration are already known, skip resolving
+                the stream URL and leave that to the prefetcher
+
+        Returns:
+            Track: The resolved track
+        """
+        track = Track(url, video_id=extract_video_id(url), requester=requester)
+        if lazy:
+            known = self.get_display_info(url)
+            if known is not None:
+                track.title, track.duration = known
+                return track
+
+        await self.refresh_track(track, guild_id=guild_id, priority=priority)
+        return track
+
+    async def refresh_track(self, track, guild_id=None, priority=ExtractionScheduler.PRIORITY_DISPLAY,
+                            force=False):
+        """
+        Fill in or renew the stream URL, title and duration of a track in place
+
+        Args:
+            track (Track): Track to resolve
+            guild_id (int): Guild the track is for
+            priority (int): ExtractionScheduler priority of the lookup
+            force (bool): Re-resolve even if a cached stream URL hasn't expired yet
+
+        Returns:
+            Track: The same track
+        """
+        stream_url, title, duration = await self.get_audio_info(
+            track.url, guild_id=guild_id, priority=priority, force=force
+        )
+        track.stream_url = stream_url
+        track.title = title
+        track.duration = duration
+        track.expires_at = parse_stream_expiry(stream_url)
+        return track
+
+    def _cache_audio_info(self, cache_key, video_id, result):
+        """
+        Store resolved audio info until shortly before its stream URL expires
+
+        Args:
+            cache_key (str): Key the lookup was made with
+            video_id (str): Video ID reported by yt-dlp, if any
+            result (tuple): (stream_url, title, duration)
+        """
+        expires_at = parse_stream_expiry(result[0])
+        if expires_at is not None:
+            expires_at -= config.STREAM_URL_EXPIRY_MARGIN
+
+        self.metadata_cache.set(cache_key, result, expires_at=expires_at)
+        if video_id and video_id != cache_key:
+            self.metadata_cache.set(video_id, result, expires_at=expires_at)
+
+    def cache_stats(self):
+        """
+        Get hit/miss counters for the metadata and search caches
+
+        Returns:
+            dict: Metadata cache statistics, the number of coalesced lookups and
+                search cache statistics under 'search', and audio cache statistics
+                under 'audio' when it is enabled
+        """
+        stats = self.metadata_cache.stats()
+        stats['coalesced'] = self.coalesced
+        stats['search'] = self.search_cache.stats()
+        if self.audio_cache is not None:
+            stats['audio'] = self.audio_cache.stats()
+        return stats
+    
+    def close(self):
+        """Stop the extraction pools and release pooled yt-dlp instances"""
+        self.scheduler.shutdown()
+        self.analysis_scheduler.shutdown()
+        self.download_scheduler.shutdown()
+        self.ytdl_pool.close()
+        if self.metadata_store is not None:
+            self.metadata_store.close()
     
-    async def search_video(self, query):
+    async def search_video(self, query, guild_id=None, priority=ExtractionScheduler.PRIORITY_PLAYBACK):
         """
         Search YouTube for a video
         
         Args:
             query (str): Search query
+            guild_id (int): Guild the search is for, used for fair scheduling
+            priority (int): ExtractionScheduler priority of the search
         
         Returns:
             str: URL of the first search result
         """
-        # Set search options
-        search_options = dict(self.ytdl_format_options)
-        search_options.update({
-            'default_search': 'ytsearch',
-            'quiet': True,
-        })
-        
-        # Run yt-dlp in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        info = await loop.run_in_executor(
-            None, self._extract_info, f"ytsearch1:{query}", search_options
+        key = normalize_query(query)
+        video_id = self.search_cache.get(key)
+        if video_id is not None:
+            return f"https://www.youtube.com/watch?v={video_id}"
+
+        return await self._single_flight(
+            ('search', key),
+            lambda: self._fetch_search(query, key, guild_id, priority)
+        )
+
+    async def _fetch_search(self, query, key, guild_id, priority):
+        """
+        Run a search with yt-dlp and cache the result
+
+        The search extraction already contains the video's stream URL, so it is
+        fed into the metadata cache and the following play needs no extraction.
+
+        Args:
+            query (str): Search query
+            key (str): Normalized query
+            guild_id (int): Guild the search is for
+            priority (int): ExtractionScheduler priority of the search
+
+        Returns:
+            str: URL of the first search result
+        """
+        # Run yt-dlp on the extraction pool to avoid blocking
+        info = await self.scheduler.run(
+            self._extract_info, f"ytsearch1:{query}", 'search', guild_id=guild_id, priority=priority
         )
         
         if not info or 'entries' not in info or not info['entries']:
@@ -134,22 +615,221 @@ class YouTubeDownloader:
         
         # Return URL of the first result
         video = info['entries'][0]
+        video_id = video.get('id')
+        if video_id:
+            self.search_cache.set(key, video_id)
+            try:
+                self._cache_audio_info(video_id, video_id, self._parse_audio_info(video))
+            except Exception as e:
+                logger.debug(f"Search result for '{query}' has no usable stream: {e}")
         return video.get('webpage_url', video.get('url'))
     
-    def _extract_info(self, url, options):
+    async def get_playlist_tracks(self, url, requester=None, guild_id=None,
+                                  priority=ExtractionScheduler.PRIORITY_PLAYBACK):
         """
-        Extract information from a YouTube URL using yt-dlp
+        Enumerate a playlist with one flat extraction
+
+        The returned tracks carry a title and, where YouTube provides one, a
+        duration, but no stream URL. They get resolved when they near the front
+        of the queue.
+
+        Args:
+            url (str): YouTube playlist URL
+            requester (str): Display name of the user who requested the playlist
+            guild_id (int): Guild the playlist is for
+            priority (int): ExtractionScheduler priority of the lookup
+
+        Returns:
+            tuple: (playlist title, list of Track)
+        """
+        info = await self.scheduler.run(
+            self._extract_info, url, 'playlist', guild_id=guild_id, priority=priority
+        )
+        if not info:
+            raise Exception("Could not retrieve playlist information")
+
+        tracks = []
+        for entry in info.get('entries') or []:
+            video_id = entry.get('id') if entry else None
+            if not video_id:
+                continue
+            duration = entry.get('duration')
+            tracks.append(Track(
+                entry.get('url') or f"https://www.youtube.com/watch?v={video_id}",
+                video_id=video_id,
+                title=entry.get('title'),
+                duration=duration if isinstance(duration, (int, float)) else None,
+                requester=requester
+            ))
+
+        return info.get('title', 'Unknown Playlist'), tracks
+
+    async def analyze_loudness(self, track, guild_id=None, priority=ExtractionScheduler.PRIORITY_BACKGROUND):
+        """
+        Measure a track's loudness once and store the ReplayGain-style correction on it
+
+        Args:
+            track (Track): A resolved track
+            guild_id (int): Guild the track is for
+            priority (int): Priority of the analysis on the analysis pool
+
+        Returns:
+            float: Gain in dB, or None if it could not be measured
+        """
+        if not config.LOUDNESS_ANALYSIS or track.gain_db is not None:
+            return track.gain_db
+
+        key = track.video_id or track.url
+        cached = self.loudness_cache.get(key)
+        if cached is None:
+            cached = await self._single_flight(
+                ('loudness', key),
+                lambda: self._fetch_loudness(track, key, guild_id, priority)
+            )
+        if cached is not False:
+            track.gain_db = cached
+        return track.gain_db
+
+    async def _fetch_loudness(self, track, key, guild_id, priority):
+        """Run the loudness analysis on the analysis pool and cache the gain"""
+        local_path = self.audio_cache.peek(track.video_id) if self.audio_cache is not None else None
+        source = local_path or track.stream_url
+        if not source:
+            return False
+
+        before_options = () if local_path else ('-reconnect', '1', '-reconnect_streamed', '1')
+        measured = await self.analysis_scheduler.run(
+            measure_loudness, source, find_ffmpeg(config.FFMPEG_PATH), config.LOUDNESS_ANALYSIS_SECONDS,
+            before_options, config.LOUDNESS_ANALYSIS_TIMEOUT, guild_id=guild_id, priority=priority
+        )
+        if measured is None:
+            # Don't retry a track that can't be measured on every prefetch pass
+            self.loudness_cache.set(key, False, ttl=3600)
+            return False
+
+        loudness, true_peak = measured
+        gain = loudness_gain(
+            loudness, target=config.LOUDNESS_TARGET,
+            true_peak=true_peak, ceiling=config.LOUDNESS_TRUE_PEAK_CEILING
+        )
+        self.loudness_cache.set(key, gain)
+        logger.debug(f"Measured {loudness:.1f} LUFS, peak {true_peak} dBTP for {track!r}, gain {gain:+.1f} dB")
+        return gain
+
+    async def get_cached_audio(self, video_id):
+        """
+        Get the local audio file for a video, if the audio cache has one
+
+        The cache checks the file is still on disk, which happens off the
+        event loop.
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            str: Path to the cached file, or None
+        """
+        if self.audio_cache is None or not video_id:
+            return None
+        return await asyncio.to_thread(self.audio_cache.get, video_id)
+
+    def record_request(self, video_id):
+        """
+        Count a play request towards the audio cache's popularity ranking
+
+        Args:
+            video_id (str): YouTube video ID
+        """
+        if self.audio_cache is not None:
+            self.audio_cache.record_request(video_id)
+
+    async def cache_audio(self, video_id):
+        """
+        Download a video's audio into the audio cache unless it is cached or downloading already
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            str: Path to the cached file, or None if nothing was downloaded
+        """
+        if self.audio_cache is None or video_id in self.audio_cache:
+            return None
+        return await self.download_scheduler.run(
+            self._download_audio, video_id, priority=ExtractionScheduler.PRIORITY_BACKGROUND
+        )
+
+    def _download_audio(self, video_id):
+        """
+        Download a video's audio into the staging directory and hand it to the audio cache
+
+        Args:
+            video_id (str): YouTube video ID
+
+        Returns:
+            str: Path to the cached file, or None
+        """
+        # Claimed here rather than by the caller, so a download that never starts can't leak the claim
+        if not self.audio_cache.begin_download(video_id):
+            return None
+        
+        staged_path = None
+        try:
+            with self.ytdl_pool.checkout('download') as ytdl:
+                info = ytdl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=True)
+                if info:
+                    downloads = info.get('requested_downloads') or []
+                    if downloads and downloads[0].get('filepath'):
+                        staged_path = downloads[0]['filepath']
+                    else:
+                        staged_path = ytdl.prepare_filename(info)
+        except Exception as e:
+            logger.warning(f"Failed to cache audio for {video_id}: {e}")
+        finally:
+            path = self.audio_cache.finish_download(video_id, staged_path)
+        return path
+
+    def _extract_info(self, url, profile):
+        """
+        Extract information from a YouTube URL using a pooled yt-dlp instance
         
         Args:
             url (str): YouTube URL or search query
-            options (dict): yt-dlp options
+            profile (str): Options profile name ('stream', 'search' or 'playlist')
         
         Returns:
             dict: Video information
         """
-        with yt_dlp.YoutubeDL(options) as ytdl:
+        with self.ytdl_pool.checkout(profile) as ytdl:
+            started = time.perf_counter()
             try:
-                return ytdl.extract_info(url, download=False)
+                info = ytdl.extract_info(url, download=False)
             except Exception as e:
+                EXTRACTION_FAILURES.inc(kind=profile)
                 logger.error(f"Error extracting info: {e}")
                 return None
+            finally:
+                EXTRACTION_SECONDS.observe(time.perf_counter() - started, kind=profile)
+        
+        # Persist titles from this worker thread rather than from the event loop
+        if info and self.metadata_store is not None:
+            self._remember(info)
+        return info
+    
+    def _remember(self, info):
+        """
+        Save the metadata of an extracted video, or of every entry of a search result
+        
+        Args:
+            info (dict): yt-dlp info dict
+        """
+        for entry in info.get('entries') or [info]:
+            if not entry or not entry.get('id') or not entry.get('title'):
+                continue
+            duration = entry.get('duration')
+            self.metadata_store.put(
+                entry['id'],
+                entry['title'],
+                duration if isinstance(duration, (int, float)) else None,
+                entry.get('thumbnail')
+            )
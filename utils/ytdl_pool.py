@@ -0,0 +1,194 @@
+# Pool of long-lived yt-dlp instances
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import yt_dlp
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+class YoutubeDLPool:
+    """
+    Bounded pool of pre-warmed yt_dlp.YoutubeDL instances, one set per options profile
+
+    Each instance is checked out by a single worker thread at a time. All
+    instances are replaced when the cookie file changes on disk, so a newly
+    uploaded cookies.txt takes effect without restarting the bot.
+    """
+
+    def __init__(self, profiles, cookie_file, size=4):
+        """
+        Initialize the pool
+
+        Args:
+            profiles (dict): Profile name -> yt-dlp options
+            cookie_file (str): Path to the cookie file the options refer to
+            size (int): Maximum number of instances per profile
+        """
+        self.profiles = profiles
+        self.cookie_file = cookie_file
+        self.size = size
+
+        self._lock = threading.Lock()
+        self._slots = {name: threading.BoundedSemaphore(size) for name in profiles}
+        self._idle = {name: [] for name in profiles}  # Stack of (generation, instance)
+        self._generation = 0
+        self._cookie_signature = self._read_cookie_signature()
+
+        # Statistics
+        self.created = {name: 0 for name in profiles}
+        self.reloads = 0
+        self.cold_start_times = []  # Seconds spent constructing each instance
+
+    def _read_cookie_signature(self):
+        """Get (mtime, size) of the cookie file, or None if it doesn't exist"""
+        try:
+            stat = os.stat(self.cookie_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _check_cookie_file(self):
+        """Retire every pooled instance if the cookie file changed since they were created"""
+        signature = self._read_cookie_signature()
+        if signature == self._cookie_signature:
+            return
+
+        with self._lock:
+            if signature == self._cookie_signature:
+                return
+            self._cookie_signature = signature
+            self._generation += 1
+            self.reloads += 1
+            retired = [ytdl for idle in self._idle.values() for _, ytdl in idle]
+            for idle in self._idle.values():
+                idle.clear()
+
+        logger.info(f"Cookie file changed, reloading {len(retired)} pooled yt-dlp instances")
+        for ytdl in retired:
+            self._discard(ytdl)
+
+    def _create(self, profile):
+        """Construct and warm up a new instance for a profile"""
+        started = time.perf_counter()
+        ytdl = yt_dlp.YoutubeDL(dict(self.profiles[profile]))
+        # Load the cookie jar and the YouTube extractor now rather than on first use
+        try:
+            ytdl.cookiejar
+            ytdl.get_info_extractor('Youtube')
+        except Exception as e:
+            # A broken cookie file shouldn't stop the bot; extractions report it instead
+            logger.warning(f"Could not warm up yt-dlp instance for profile '{profile}': {e}")
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.created[profile] += 1
+            self.cold_start_times.append(elapsed)
+            del self.cold_start_times[:-100]
+
+        logger.debug(f"Created yt-dlp instance for profile '{profile}' in {elapsed * 1000:.1f} ms")
+        return ytdl
+
+    def _discard(self, ytdl):
+        """Close an instance without writing its stale cookie jar over the new file"""
+        try:
+            ytdl.params['cookiefile'] = None
+            ytdl.close()
+        except Exception as e:
+            logger.debug(f"Error closing yt-dlp instance: {e}")
+
+    @contextmanager
+    def checkout(self, profile):
+        """
+        Borrow an instance for the duration of a with block
+
+        Blocks the calling thread while all instances of the profile are in use.
+
+        Args:
+            profile (str): Options profile name
+
+        Yields:
+            yt_dlp.YoutubeDL: An instance no other thread is using
+        """
+        self._check_cookie_file()
+        slots = self._slots[profile]
+        slots.acquire()
+        try:
+            with self._lock:
+                generation = self._generation
+                idle = self._idle[profile]
+                ytdl = idle.pop()[1] if idle else None
+
+            if ytdl is None:
+                ytdl = self._create(profile)
+
+            try:
+                yield ytdl
+            finally:
+                with self._lock:
+                    if generation == self._generation:
+                        self._idle[profile].append((generation, ytdl))
+                        ytdl = None
+                if ytdl is not None:
+                    self._discard(ytdl)
+        finally:
+            slots.release()
+
+    def warm(self, count=1):
+        """
+        Pre-create instances for every profile and report the cold-start cost
+
+        Args:
+            count (int): Number of instances to create per profile
+
+        Returns:
+            dict: Profile name -> list of construction times in seconds
+        """
+        timings = {}
+        for profile in self.profiles:
+            timings[profile] = []
+            for _ in range(min(count, self.size)):
+                started = time.perf_counter()
+                ytdl = self._create(profile)
+                timings[profile].append(time.perf_counter() - started)
+                with self._lock:
+                    self._idle[profile].append((self._generation, ytdl))
+
+            average = sum(timings[profile]) / len(timings[profile]) if timings[profile] else 0
+            logger.info(
+                f"Warmed {len(timings[profile])} yt-dlp instance(s) for profile '{profile}', "
+                f"cold start {average * 1000:.1f} ms each"
+            )
+        return timings
+
+    def stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Instances created and idle per profile, cookie reloads and cold-start timings
+        """
+        with self._lock:
+            times = list(self.cold_start_times)
+            idle = {name: len(instances) for name, instances in self._idle.items()}
+        return {
+            'created': dict(self.created),
+            'idle': idle,
+            'reloads': self.reloads,
+            'cold_start_avg_ms': sum(times) / len(times) * 1000 if times else 0.0,
+            'cold_start_max_ms': max(times) * 1000 if times else 0.0,
+        }
+
+    def close(self):
+        """Close every idle instance, saving the cookie jar as yt-dlp normally does"""
+        with self._lock:
+            instances = [ytdl for idle in self._idle.values() for _, ytdl in idle]
+            for idle in self._idle.values():
+                idle.clear()
+        for ytdl in instances:
+            try:
+                ytdl.close()
+            except Exception as e:
+                logger.debug(f"Error closing yt-dlp instance: {e}")